@@ -1,9 +1,11 @@
 from django.contrib import admin
-from .models import RoadSegments, TrafficReadings, Sensors, SensorReadings, Cars
+from .models import RoadSegments, TrafficReadings, Sensors, SensorReadings, Cars, SegmentCurrentState, SensorApiKeys
 
 # To access the models in the Django admin page
 admin.site.register(RoadSegments)
 admin.site.register(TrafficReadings)
 admin.site.register(Sensors)
 admin.site.register(SensorReadings)
-admin.site.register(Cars)
\ No newline at end of file
+admin.site.register(Cars)
+admin.site.register(SegmentCurrentState)
+admin.site.register(SensorApiKeys)
\ No newline at end of file
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TrafficApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "traffic_api"
+    
+    def ready(self):
+        # Connect the signal handlers that keep the derived tables in sync with the readings
+        from . import signals
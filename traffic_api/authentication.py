@@ -0,0 +1,105 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from django.contrib.auth.models import AnonymousUser
+from django.utils import timezone
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from traffic_monitoring_api.settings import API_KEY_CACHE_SIZE, API_KEY_CACHE_TTL
+from .models import SensorApiKeys
+
+API_KEY_HEADER = 'X-API-KEY'
+
+
+## API KEYS ------------------------------------------------------------------------------------------------------
+# The keys are random, so a plain SHA-256 is enough to store them (and it keeps the lookup a single indexed query)
+def hash_api_key(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+# Create a new key for a sensor, optionally revoking its previous keys (rotation). Returns the key, which is not stored.
+def create_api_key(sensor, revoke_existing=False):
+    if revoke_existing:
+        revoke_api_keys(sensor.api_keys.filter(revoked_at__isnull=True))
+    
+    key = secrets.token_urlsafe(32)
+    SensorApiKeys.objects.create(sensor=sensor, key_prefix=key[:8], key_hash=hash_api_key(key))
+    return key
+
+# Revoked one by one, so the signal handlers drop them from the cache
+def revoke_api_keys(api_keys):
+    for api_key in api_keys:
+        api_key.revoked_at = timezone.now()
+        api_key.save(update_fields=['revoked_at'])
+
+
+
+## KEY CACHE -----------------------------------------------------------------------------------------------------
+# In-process LRU cache of the key lookups (key hash -> sensor, or None for an unknown or revoked key), so a request with a
+# known key is authenticated without a database query. Writes to the keys of this process invalidate their entries, and
+# the ones made by other processes are picked up once the entries are older than the TTL.
+class ApiKeyCache:
+    def __init__(self, max_size=API_KEY_CACHE_SIZE, ttl=API_KEY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key_hash):
+        with self.lock:
+            entry = self.entries.get(key_hash)
+            if entry is None:
+                return False, None
+            sensor, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key_hash]
+                return False, None
+            self.entries.move_to_end(key_hash)
+            return True, sensor
+    
+    def set(self, key_hash, sensor):
+        with self.lock:
+            self.entries[key_hash] = (sensor, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key_hash)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self, key_hash=None):
+        with self.lock:
+            if key_hash is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key_hash, None)
+
+api_key_cache = ApiKeyCache()
+
+def get_sensor_for_key(key):
+    key_hash = hash_api_key(key)
+    found, sensor = api_key_cache.get(key_hash)
+    if not found:
+        api_key = SensorApiKeys.objects.select_related('sensor').filter(key_hash=key_hash, revoked_at__isnull=True).first()
+        sensor = api_key.sensor if api_key else None
+        api_key_cache.set(key_hash, sensor)
+    return sensor
+
+
+
+## AUTHENTICATION ------------------------------------------------------------------------------------------------
+# Authenticate a sensor by the key in the X-API-KEY header. The sensor is available as request.auth and request.sensor,
+# and the request has no user (requests without the header are left to the other authentication classes).
+class SensorApiKeyAuthentication(BaseAuthentication):
+    def authenticate(self, request):
+        key = request.headers.get(API_KEY_HEADER)
+        if not key:
+            return None
+        
+        sensor = get_sensor_for_key(key)
+        if sensor is None:
+            raise AuthenticationFailed('Invalid or revoked API key.')
+        
+        request.sensor = sensor
+        return (AnonymousUser(), sensor)
+    
+    def authenticate_header(self, request):
+        return API_KEY_HEADER
\ No newline at end of file
@@ -0,0 +1,179 @@
+import statistics
+import time
+from datetime import timedelta
+import django
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .caching import bump_versions
+from .models import RoadSegments, TrafficReadings, Sensors, Cars, SensorReadings
+from .urls import urlpatterns
+
+
+## BENCHMARK REQUESTS ----------------------------------------------------------------------------------------------
+# Ids, plate and area used to fill in the URLs, taken from the first rows of the current data
+class BenchmarkSample:
+    def __init__(self):
+        self.road_segment = RoadSegments.objects.order_by('id').first()
+        self.traffic_reading = TrafficReadings.objects.order_by('id').first()
+        self.sensor = Sensors.objects.order_by('id').first()
+        self.sensor_reading = SensorReadings.objects.order_by('id').first()
+        self.car = Cars.objects.order_by('id').first()
+        if None in (self.road_segment, self.traffic_reading, self.sensor, self.sensor_reading, self.car):
+            raise ValueError('The benchmark needs at least one row in every table (see generate_synthetic_data).')
+    
+    def get_bbox(self, margin=0.02):
+        segment = self.road_segment
+        return f'{segment.long_start - margin},{segment.lat_start - margin},{segment.long_start + margin},{segment.lat_start + margin}'
+    
+    # The first road segments, for the endpoints that take a list of ids
+    def get_road_segment_ids(self, limit=5):
+        return list(RoadSegments.objects.order_by('id').values_list('id', flat=True)[:limit])
+    
+    # Passes at different times, since a repeated pass is not written again
+    def get_sensor_reading_row(self, index=0):
+        return {'car_license_plate': self.car.car_license_plate, 'timestamp': (timezone.now() - timedelta(milliseconds=index)).isoformat(),
+                'road_segment_id': self.road_segment.id, 'sensor_uuid': self.sensor.id}
+
+# Arguments of the URLs that have any, by URL name
+URL_KWARGS = {
+    'individual-traffic-reading': lambda sample: {'pk': sample.traffic_reading.id},
+    'individual-road-segment': lambda sample: {'pk': sample.road_segment.id},
+    'road-segment-history': lambda sample: {'pk': sample.road_segment.id},
+    'road-segment-travel-times': lambda sample: {'pk': sample.road_segment.id},
+    'road-segment-stats': lambda sample: {'pk': sample.road_segment.id},
+    'individual-sensor': lambda sample: {'pk': sample.sensor.id},
+    'individual-sensor-readings': lambda sample: {'pk': sample.sensor_reading.id},
+    'individual-car': lambda sample: {'car_license_plate': sample.car.car_license_plate},
+    'car-trajectory': lambda sample: {'car_license_plate': sample.car.car_license_plate},
+    'export': lambda sample: {'resource': 'traffic-readings', 'file_format': 'ndjson'},
+}
+
+# The create endpoints are measured with a POST (rolled back afterwards), the rest with a GET
+CREATE_PAYLOADS = {
+    'create-traffic-reading': lambda sample: {'speed': 42.0, 'road_segment_id': sample.road_segment.id},
+    'create-road-segment': lambda sample: {'long_start': 104.0, 'lat_start': 30.6, 'long_end': 104.01, 'lat_end': 30.61, 'length': 1000},
+    'create-sensor-reading': lambda sample: sample.get_sensor_reading_row(),
+    'bulk-create-sensor-readings': lambda sample: [sample.get_sensor_reading_row(index) for index in range(100)],
+}
+
+# Query strings of the URLs that need one
+URL_PARAMS = {
+    'road-segments-stats': lambda sample: {'ids': ','.join(str(segment_id) for segment_id in sample.get_road_segment_ids()), 'combined': 'true'},
+    'nearest-road-segments': lambda sample: {'lon': sample.road_segment.long_start, 'lat': sample.road_segment.lat_start, 'limit': 5},
+}
+
+# Query strings measured on top of the plain URLs
+EXTRA_QUERIES = [
+    ('all-traffic-readings', lambda sample: {'intensity': 'high', 'page_size': 1000}),
+    ('all-road-segments', lambda sample: {'bbox': sample.get_bbox()}),
+    ('all-road-segments', lambda sample: {'fields': 'id,long_start,lat_start,long_end,lat_end,intensity', 'page_size': 1000}),
+    ('all-road-segments', lambda sample: {'expand': 'traffic_readings', 'expand_limit': 5}),
+    ('road-segment-history', lambda sample: {'bucket': '1h'}),
+    ('road-segment-stats', lambda sample: {'bucket': '1d', 'percentiles': '50,85,99'}),
+    ('all-cars', lambda sample: {'search': sample.car.car_license_plate[1:4]}),
+    ('individual-car', lambda sample: {'hours': 48}),
+]
+
+# One request per URL of traffic_api/urls.py, plus the EXTRA_QUERIES. A URL with arguments that are missing from
+# URL_KWARGS fails here, so every new endpoint has to be added to the benchmark.
+def get_benchmark_requests(sample):
+    requests = []
+    for pattern in urlpatterns:
+        kwargs = URL_KWARGS.get(pattern.name, lambda sample: {})(sample)
+        path = reverse(pattern.name, kwargs=kwargs)
+        if pattern.name in CREATE_PAYLOADS:
+            requests.append({'name': pattern.name, 'method': 'POST', 'path': path, 'params': None, 'data': CREATE_PAYLOADS[pattern.name](sample)})
+        else:
+            params = URL_PARAMS[pattern.name](sample) if pattern.name in URL_PARAMS else None
+            requests.append({'name': pattern.name, 'method': 'GET', 'path': path, 'params': params, 'data': None})
+    
+    for name, get_params in EXTRA_QUERIES:
+        path = reverse(name, kwargs=URL_KWARGS.get(name, lambda sample: {})(sample))
+        requests.append({'name': name, 'method': 'GET', 'path': path, 'params': get_params(sample), 'data': None})
+    return requests
+
+
+
+## MEASUREMENTS ----------------------------------------------------------------------------------------------------
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE SAVEPOINT')
+
+# Number of queries that read or write data, without the transaction statements (which depend on the database backend
+# and on the rollback of the benchmark itself)
+def count_queries(captured_queries):
+    return len([query for query in captured_queries if not query['sql'].startswith(TRANSACTION_STATEMENTS)])
+
+# The host has to be allowed by ALLOWED_HOSTS (localhost is allowed while DEBUG is on)
+def get_benchmark_client(host='localhost'):
+    client = APIClient(HTTP_HOST=host)
+    client.force_authenticate(user=get_user_model()(username='benchmark', is_staff=True))
+    return client
+
+# Send the request once, reading streamed responses to the end. The writes are rolled back, so the data does not change between runs.
+def send_request(client, request):
+    with transaction.atomic():
+        if request['method'] == 'POST':
+            response = client.post(request['path'], request['data'], format='json')
+        else:
+            response = client.get(request['path'], request['params'])
+        if response.streaming:
+            b''.join(response.streaming_content)
+        transaction.set_rollback(True)
+    return response
+
+# Time every request repeat times (after one warm-up request). Unless warm_cache is set, the response cache is invalidated
+# before each request, so the timings and query counts are the ones of the database work.
+def run_benchmark(requests, repeat=10, warm_cache=False, host='localhost'):
+    client = get_benchmark_client(host)
+    results = []
+    for request in requests:
+        send_request(client, request)
+        timings = []
+        for _ in range(repeat):
+            if not warm_cache:
+                bump_versions()
+            with CaptureQueriesContext(connection) as queries:
+                start_time = time.perf_counter()
+                response = send_request(client, request)
+                timings.append((time.perf_counter() - start_time) * 1000)
+        
+        timings.sort()
+        results.append({
+            'name': request['name'], 'method': request['method'], 'path': request['path'], 'params': request['params'],
+            'status': response.status_code,
+            'queries': count_queries(queries.captured_queries),
+            'min_ms': round(timings[0], 3),
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+        })
+    return results
+
+def get_benchmark_report(results, repeat, warm_cache):
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'django': django.get_version(),
+        'repeat': repeat,
+        'warm_cache': warm_cache,
+        'rows': {model.__name__: model.objects.count() for model in [RoadSegments, TrafficReadings, Sensors, Cars, SensorReadings]},
+        'results': results,
+    }
+
+# Changes of the median time and the query count of every request that is in both reports
+def compare_reports(baseline, report):
+    key = lambda result: (result['name'], result['method'], str(result['params']))
+    baseline_results = {key(result): result for result in baseline['results']}
+    changes = []
+    for result in report['results']:
+        before = baseline_results.get(key(result))
+        if before is None:
+            continue
+        change = (result['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0.0
+        changes.append({'name': result['name'], 'method': result['method'], 'params': result['params'],
+                        'median_ms': (before['median_ms'], result['median_ms']), 'change_percent': round(change, 1),
+                        'queries': (before['queries'], result['queries'])})
+    return changes
\ No newline at end of file
@@ -0,0 +1,122 @@
+import hashlib
+import time
+from contextlib import nullcontext
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, urlencode
+from traffic_monitoring_api.settings import RESPONSE_CACHE_ALIAS, RESPONSE_CACHE_TIMEOUT, DATABASE_REPLICA_LAG_SECONDS
+from .routers import use_primary
+
+CACHE_PREFIX = 'traffic_api'
+CACHE_RESOURCES = ('traffic-readings', 'road-segments')
+CACHE_COUNTERS = ('hits', 'not_modified', 'misses')
+
+
+def get_response_cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+def get_version_key(resource):
+    return f'{CACHE_PREFIX}:version:{resource}'
+
+
+
+## VERSION COUNTERS ------------------------------------------------------------------------------------------------
+# The version of a resource is the time (in nanoseconds) of its last write. The cached responses are keyed by the versions
+# they were built from, so a write makes them unreachable, and a version lost by the cache backend restarts above every
+# version that was used before it.
+def get_versions(resources):
+    cache = get_response_cache()
+    keys = [get_version_key(resource) for resource in resources]
+    versions = cache.get_many(keys)
+    
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns())
+            versions[key] = cache.get(key) or time.time_ns()
+    return [versions[key] for key in keys]
+
+# Called by every write path (signals, data loader, rebuild commands). Inside a transaction the versions are bumped again
+# after the commit, so a response cached from the old rows in the meantime is not served afterwards.
+def bump_versions(*resources):
+    def bump():
+        now = time.time_ns()
+        get_response_cache().set_many({get_version_key(resource): now for resource in resources or CACHE_RESOURCES}, timeout=None)
+    
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+
+## HIT AND MISS COUNTERS -------------------------------------------------------------------------------------------
+def increment_counter(name):
+    cache = get_response_cache()
+    key = f'{CACHE_PREFIX}:counter:{name}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+def get_cache_stats():
+    cache = get_response_cache()
+    counters = cache.get_many([f'{CACHE_PREFIX}:counter:{name}' for name in CACHE_COUNTERS])
+    return {name: counters.get(f'{CACHE_PREFIX}:counter:{name}', 0) for name in CACHE_COUNTERS}
+
+
+
+## CACHED RESPONSES ------------------------------------------------------------------------------------------------
+# Mixin for the list views polled by the dashboards. A repeated request is answered from the cache (or with a 304 when the
+# client already has the response) without querying the database, until one of the cache_resources is written to.
+class CachedResponseMixin:
+    cache_resources = CACHE_RESOURCES
+    
+    def get(self, request, *args, **kwargs):
+        # Only the JSON responses are cached, the browsable API shows the user that is logged in
+        if request.accepted_renderer.format != 'json':
+            return super().get(request, *args, **kwargs)
+        
+        # One entry per endpoint and query string (in any parameter order), for the current versions of the resources
+        versions = get_versions(self.cache_resources)
+        query_string = urlencode(sorted(request.query_params.lists()), doseq=True)
+        identity = f'{request.build_absolute_uri(request.path)}?{query_string}|{request.accepted_media_type}'
+        digest = hashlib.md5(f'{identity}|{versions}'.encode()).hexdigest()
+        cache_key = f'{CACHE_PREFIX}:response:{digest}'
+        etag = f'"{digest}"'
+        last_modified = max(versions) // 1_000_000_000
+        
+        # Only the ETag is used as a validator: Last-Modified has a one second granularity, so a write in the same second
+        # as the response the client has would be answered with a 304
+        response = get_conditional_response(request, etag=etag)
+        if isinstance(response, HttpResponseNotModified):
+            increment_counter('not_modified')
+            return self.set_cache_headers(response, etag, last_modified, 'HIT')
+        
+        cached = get_response_cache().get(cache_key)
+        if cached is not None:
+            increment_counter('hits')
+            content, content_type = cached
+            return self.set_cache_headers(HttpResponse(content, content_type=content_type), etag, last_modified, 'HIT')
+        
+        increment_counter('misses')
+        # Right after a write the replicas may not have it yet, and their response would be cached (and its ETag kept by
+        # the clients) until the next write
+        recently_written = time.time_ns() - max(versions) < DATABASE_REPLICA_LAG_SECONDS * 1_000_000_000
+        with use_primary() if recently_written else nullcontext():
+            response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(lambda rendered: self.store_response(cache_key, rendered))
+            self.set_cache_headers(response, etag, last_modified, 'MISS')
+        return response
+    
+    def store_response(self, cache_key, response):
+        get_response_cache().set(cache_key, (response.content, response['Content-Type']), RESPONSE_CACHE_TIMEOUT)
+    
+    def set_cache_headers(self, response, etag, last_modified, status):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['X-Cache'] = status
+        patch_vary_headers(response, ['Accept'])
+        return response
\ No newline at end of file
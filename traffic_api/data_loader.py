@@ -0,0 +1,140 @@
+import csv
+import io
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import (RoadSegments, TrafficReadings, Sensors, SensorReadings, SegmentCurrentState, SegmentSpeedRollups, SensorApiKeys,
+                     SegmentTransitions, SegmentTravelTimes, CarTrajectoryStates, TrajectoryWatermarks)
+from .segment_state import rebuild_segment_states
+from .rollups import rebuild_rollups
+from .trajectories import rebuild_trajectories
+from .spatial import invalidate_segment_index
+from .caching import bump_versions
+from .streaming import get_intensity_hub
+from .traffic_api_helpers import resync_sequences
+
+
+def parse_float(value):
+    return float(value) if value not in ('', None) else None
+
+
+# How each CSV file maps onto the tables: the target model, the columns written and how a CSV row becomes a table row.
+# traffic_speed.csv has the road segments and the readings in the same rows, so it feeds both tables at once.
+# The CSV files have no reading times, so the readings are recorded at the time they are loaded.
+SEGMENT_COLUMNS = ['id', 'long_start', 'lat_start', 'long_end', 'lat_end', 'length']
+READING_COLUMNS = ['id', 'speed', 'road_segment_id_id', 'recorded_at']
+SENSOR_COLUMNS = ['id', 'name', 'uuid']
+
+SPLIT_SOURCES = [
+    ('road_segments.csv', [(RoadSegments, SEGMENT_COLUMNS, lambda row: (int(row['id']), *(parse_float(row[column]) for column in SEGMENT_COLUMNS[1:])))]),
+    ('traffic_readings.csv', [(TrafficReadings, READING_COLUMNS, lambda row: (int(row['id']), parse_float(row['speed']), int(row['road_segment_id']), timezone.now()))]),
+    ('sensors.csv', [(Sensors, SENSOR_COLUMNS, lambda row: (int(row['id']), row['name'], row['uuid']))]),
+]
+
+COMBINED_SOURCES = [
+    ('traffic_speed.csv', [
+        (RoadSegments, SEGMENT_COLUMNS, lambda row: (int(row['ID']), parse_float(row['Long_start']), parse_float(row['Lat_start']),
+                                                     parse_float(row['Long_end']), parse_float(row['Lat_end']), parse_float(row['Length']))),
+        (TrafficReadings, READING_COLUMNS, lambda row: (int(row['ID']), parse_float(row['Speed']), int(row['ID']), timezone.now())),
+    ]),
+    ('sensors.csv', [(Sensors, SENSOR_COLUMNS, lambda row: (int(row['id']), row['name'], row['uuid']))]),
+]
+
+
+# Read a CSV file in chunks of rows, so memory stays flat no matter the size of the file
+def read_csv_chunks(path, chunk_size):
+    with open(path, newline='', encoding='utf-8') as csv_file:
+        chunk = []
+        for row in csv.DictReader(csv_file):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+# Highest id already stored in each table, used to skip the rows loaded by a previous (interrupted) run
+def get_resume_ids(targets):
+    return {model: model.objects.aggregate(last_id=Max('id'))['last_id'] or 0 for model, _, _ in targets}
+
+
+def can_copy():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        return hasattr(cursor.cursor, 'copy_expert') or hasattr(cursor.cursor, 'copy')
+
+
+# Write the rows with COPY FROM STDIN on PostgreSQL (psycopg2 or psycopg 3), which is much faster than INSERT statements
+def copy_rows(model, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+    buffer.seek(0)
+    
+    column_names = ', '.join(connection.ops.quote_name(model._meta.get_field(column).column) for column in columns)
+    sql = f"COPY {connection.ops.quote_name(model._meta.db_table)} ({column_names}) FROM STDIN WITH (FORMAT csv, NULL '')"
+    with connection.cursor() as cursor:
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'):
+            raw_cursor.copy_expert(sql, buffer)
+        else:
+            with raw_cursor.copy(sql) as copy:
+                copy.write(buffer.read())
+
+# Fallback for the other backends (e.g. SQLite)
+def insert_rows(model, columns, rows, batch_size=1000):
+    model.objects.bulk_create([model(**dict(zip(columns, row))) for row in rows], batch_size=batch_size)
+
+
+# Empty the loaded tables and every table that depends on them (the models are listed in dependency order)
+LOADED_MODELS = [SegmentTransitions, SegmentTravelTimes, CarTrajectoryStates, TrajectoryWatermarks, SegmentCurrentState, SegmentSpeedRollups, SensorReadings, TrafficReadings, RoadSegments, SensorApiKeys, Sensors]
+
+def truncate_tables(models=LOADED_MODELS):
+    tables = [connection.ops.quote_name(model._meta.db_table) for model in models]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE")
+        else:
+            # Raw deletes in dependency order, so no signal handler runs once per deleted row
+            for table in tables:
+                cursor.execute(f'DELETE FROM {table}')
+
+
+# Load every CSV source in chunks, each chunk in its own transaction so an interrupted load can be resumed.
+# Calls progress(file_name, model, rows_loaded) after every chunk.
+def load_sources(data_dir, sources, chunk_size=10000, resume=False, use_copy=True, progress=None):
+    write_rows = copy_rows if use_copy and can_copy() else insert_rows
+    totals = {}
+    
+    for file_name, targets in sources:
+        resume_ids = get_resume_ids(targets) if resume else {}
+        
+        for chunk in read_csv_chunks(data_dir / file_name, chunk_size):
+            with transaction.atomic():
+                for model, columns, to_row in targets:
+                    rows = [to_row(row) for row in chunk]
+                    if resume:
+                        rows = [row for row in rows if row[0] > resume_ids[model]]
+                    if rows:
+                        write_rows(model, columns, rows)
+                    
+                    totals[model] = totals.get(model, 0) + len(rows)
+                    if progress:
+                        progress(file_name, model, totals[model])
+    
+    return totals
+
+
+# The rows are written with their own ids and without the signal handlers, so bring the sequences and the derived state up to date
+def refresh_derived_data():
+    resync_sequences(list(apps.get_app_config('traffic_api').get_models()))
+    rebuild_segment_states()
+    rebuild_rollups()
+    rebuild_trajectories()
+    invalidate_segment_index()
+    bump_versions()
+    get_intensity_hub().publish_resync()
\ No newline at end of file
@@ -0,0 +1,90 @@
+import hashlib
+import math
+import threading
+from datetime import timezone as dt_timezone
+from traffic_monitoring_api.settings import SENSOR_READINGS_DEDUP_CAPACITY, SENSOR_READINGS_DEDUP_ERROR_RATE
+from .models import SensorReadings
+
+# A pass of a car in front of a sensor is recorded once: the sensor readings are unique by (sensor, car, timestamp).
+# Each process keeps a Bloom filter of the passes it has written or found stored, so a new pass is written without looking
+# for it first, and only the passes the filter may have seen (the retries, and a small share of false positives) are
+# looked up, with one query per batch. The unique constraint still rejects the passes that the filter of this process
+# has not seen (written by another process, or before it started).
+
+
+def get_pass_key(sensor_id, license_plate, timestamp):
+    return f'{sensor_id}|{license_plate}|{timestamp.astimezone(dt_timezone.utc).isoformat()}'
+
+
+
+## BLOOM FILTER ----------------------------------------------------------------------------------------------------
+# Set of keys that can answer "maybe" for a key that was never added (with the given error rate once it holds capacity
+# keys), but never "no" for a key that was added
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    # The positions of a key come from the two halves of a single hash (double hashing)
+    def get_positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+    
+    def add(self, key):
+        for position in self.get_positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.get_positions(key))
+
+# Two generations of Bloom filters: once the current one holds capacity passes it replaces the previous one, so the error
+# rate stays bounded, and the latest capacity to twice capacity passes are remembered
+class RecentPassesFilter:
+    def __init__(self, capacity=SENSOR_READINGS_DEDUP_CAPACITY, error_rate=SENSOR_READINGS_DEDUP_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.clear()
+    
+    def add_many(self, keys):
+        with self.lock:
+            for key in keys:
+                if self.current.count >= self.capacity:
+                    self.previous, self.current = self.current, BloomFilter(self.capacity, self.error_rate)
+                self.current.add(key)
+    
+    def may_contain(self, key):
+        with self.lock:
+            return key in self.current or key in self.previous
+    
+    def clear(self):
+        self.current = BloomFilter(self.capacity, self.error_rate)
+        self.previous = BloomFilter(self.capacity, self.error_rate)
+
+recent_passes = RecentPassesFilter()
+
+
+
+## RECORDED PASSES -------------------------------------------------------------------------------------------------
+# Keys of the passes (key -> (sensor id, license plate, timestamp)) that are already stored. Only the passes the filter may
+# have seen are looked up, all in one query.
+def find_recorded_passes(passes):
+    candidates = {key: values for key, values in passes.items() if recent_passes.may_contain(key)}
+    if not candidates:
+        return set()
+    
+    sensor_ids, license_plates, timestamps = (set(column) for column in zip(*candidates.values()))
+    rows = (SensorReadings.objects.filter(sensor_uuid_id__in=sensor_ids, car_license_plate__car_license_plate__in=license_plates, timestamp__in=timestamps)
+            .values_list('sensor_uuid_id', 'car_license_plate__car_license_plate', 'timestamp'))
+    return {get_pass_key(*row) for row in rows} & candidates.keys()
+
+# The stored reading of a single pass (with its car), or None. Like above, it is only looked up if the filter may have seen the pass.
+def find_recorded_reading(sensor_id, license_plate, timestamp):
+    if not recent_passes.may_contain(get_pass_key(sensor_id, license_plate, timestamp)):
+        return None
+    return (SensorReadings.objects.select_related('car_license_plate')
+            .filter(sensor_uuid_id=sensor_id, car_license_plate__car_license_plate=license_plate, timestamp=timestamp).first())
\ No newline at end of file
@@ -0,0 +1,108 @@
+import csv
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.exceptions import ValidationError, NotFound
+from rest_framework.negotiation import BaseContentNegotiation
+from traffic_monitoring_api.settings import EXPORT_CHUNK_SIZE
+from .models import RoadSegments, TrafficReadings, SensorReadings
+from .traffic_api_helpers import parse_datetime_parameter, check_time_range
+
+
+# Resources that can be exported, with the columns written for each row and the columns the filters apply to
+EXPORT_RESOURCES = {
+    'road-segments': {
+        'model': RoadSegments,
+        'columns': ['id', 'long_start', 'lat_start', 'long_end', 'lat_end', 'length'],
+        'segment_column': 'id',
+        'time_column': None,
+    },
+    'traffic-readings': {
+        'model': TrafficReadings,
+        'columns': ['id', 'speed', 'road_segment_id', 'recorded_at'],
+        'segment_column': 'road_segment_id',
+        'time_column': 'recorded_at',
+    },
+    'sensor-readings': {
+        'model': SensorReadings,
+        'columns': ['id', 'road_segment_id', 'car_license_plate', 'timestamp', 'sensor_uuid'],
+        'segment_column': 'road_segment_id',
+        'time_column': 'timestamp',
+    },
+}
+
+
+# Build the queryset of an export from the query parameters (?road_segment=1,2,3&from=...&to=...).
+# It only selects plain column values, so rows are never turned into model instances or serializer objects.
+# The rows are read after the view returned, so the database to read them from is given (the replica of the request).
+def get_export_rows(resource, query_params, using=None):
+    if resource not in EXPORT_RESOURCES:
+        raise NotFound(f'Unknown export "{resource}", expected one of: {", ".join(EXPORT_RESOURCES)}.')
+    export = EXPORT_RESOURCES[resource]
+    queryset = export['model'].objects.using(using)
+    
+    road_segments = query_params.get('road_segment')
+    if road_segments:
+        try:
+            segment_ids = [int(segment_id) for segment_id in road_segments.split(',')]
+        except ValueError:
+            raise ValidationError({'road_segment': 'Expected a comma separated list of road segment ids.'})
+        queryset = queryset.filter(**{f"{export['segment_column']}__in": segment_ids})
+    
+    time_range = {}
+    for parameter, lookup in [('from', 'gte'), ('to', 'lt')]:
+        if parameter not in query_params:
+            continue
+        if export['time_column'] is None:
+            raise ValidationError({parameter: f'The "{resource}" export can not be filtered by time.'})
+        time_range[parameter] = parse_datetime_parameter(parameter, query_params[parameter])
+        queryset = queryset.filter(**{f"{export['time_column']}__{lookup}": time_range[parameter]})
+    check_time_range(time_range.get('from'), time_range.get('to'))
+    
+    rows = queryset.order_by('id').values_list(*export['columns']).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return export['columns'], rows
+
+
+
+# The streams below yield one string per chunk of rows instead of one per row, to keep the per-write overhead low
+def stream_ndjson(columns, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(dict(zip(columns, row))))
+        if len(lines) == EXPORT_CHUNK_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+# File-like object for csv.writer that hands back each line instead of storing it
+class Echo:
+    def write(self, value):
+        return value
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    lines = [writer.writerow(columns)]
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) == EXPORT_CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+EXPORT_FORMATS = {
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+    'csv': (stream_csv, 'text/csv'),
+}
+
+
+# The exports write their own content type, so the Accept header of the client (e.g. text/csv) must not be rejected by DRF.
+# Errors are rendered with the first renderer of the view (JSON).
+class ExportContentNegotiation(BaseContentNegotiation):
+    def select_parser(self, request, parsers):
+        return parsers[0]
+    
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
@@ -0,0 +1,68 @@
+import functools
+import hashlib
+import json
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from traffic_monitoring_api.settings import IDEMPOTENCY_CACHE_ALIAS, IDEMPOTENCY_KEY_TTL
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+CACHE_PREFIX = 'traffic_api:idempotency'
+# Seconds after which a request that never finished (its process stopped) no longer blocks the retries with its key
+IN_PROGRESS_TIMEOUT = 60
+
+
+def get_idempotency_cache():
+    return caches[IDEMPOTENCY_CACHE_ALIAS]
+
+# The keys are chosen by the clients, so they are scoped to the user or the sensor that sent them
+def get_cache_key(request, key):
+    sensor = getattr(request, 'sensor', None)
+    owner = f'sensor:{sensor.id}' if sensor is not None else f'user:{request.user.pk}'
+    return f'{CACHE_PREFIX}:{hashlib.sha256(f"{owner}|{key}".encode()).hexdigest()}'
+
+def get_fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# Decorator for the post method of the endpoints the sensors retry. A request sent again with the same Idempotency-Key
+# header gets the response of the first one from the cache (for IDEMPOTENCY_KEY_TTL seconds), without running the view
+# again. A retry that arrives while the first request is still running gets a 409, and a key reused for another payload a 422.
+def idempotent(post):
+    @functools.wraps(post)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return post(view, request, *args, **kwargs)
+        if len(key) > 255:
+            raise ValidationError({IDEMPOTENCY_HEADER: 'Expected a key of at most 255 characters.'})
+        
+        cache = get_idempotency_cache()
+        cache_key = get_cache_key(request, key)
+        fingerprint = get_fingerprint(request.data)
+        if not cache.add(cache_key, {'fingerprint': fingerprint}, IN_PROGRESS_TIMEOUT):
+            return get_stored_response(cache.get(cache_key), fingerprint)
+        
+        try:
+            response = post(view, request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        
+        # The server errors are not kept, so the request can be retried
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+        else:
+            cache.set(cache_key, {'fingerprint': fingerprint, 'status': response.status_code, 'data': response.data}, IDEMPOTENCY_KEY_TTL)
+        return response
+    return wrapper
+
+def get_stored_response(stored, fingerprint):
+    if stored is not None and stored['fingerprint'] != fingerprint:
+        return Response({'detail': f'This {IDEMPOTENCY_HEADER} was already used for another request.'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    if stored is None or 'status' not in stored:
+        return Response({'detail': f'A request with this {IDEMPOTENCY_HEADER} is still being processed, try again later.'},
+                        status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+    return Response(stored['data'], status=stored['status'], headers={'Idempotent-Replayed': 'true'})
\ No newline at end of file
@@ -0,0 +1,92 @@
+from django.db import connection, transaction
+from .models import RoadSegments, Sensors, Cars, SensorReadings
+from .deduplication import get_pass_key, find_recorded_passes, recent_passes
+
+
+# Insert a batch of validated sensor reading rows with a fixed number of queries, regardless of the batch size:
+# one lookup per related table, one INSERT for the missing cars and one INSERT for the readings.
+# The rows are (index, validated_data) pairs. It returns the ids of the created readings, and the errors keyed by that index.
+# The passes that are already stored (or repeated in the batch) are left out, so they are neither created nor errors (see deduplication.py).
+def bulk_create_sensor_readings(rows, batch_size=1000):
+    errors = {}
+    if not rows:
+        return [], errors
+    
+    # Check that every referenced road segment and sensor exists (one query each)
+    segment_ids = set(RoadSegments.objects.filter(id__in={row['road_segment_id'] for _, row in rows}).values_list('id', flat=True))
+    sensor_ids = set(Sensors.objects.filter(id__in={row['sensor_uuid'] for _, row in rows}).values_list('id', flat=True))
+    
+    valid_rows = []
+    for index, row in rows:
+        row_errors = {}
+        if row['road_segment_id'] not in segment_ids:
+            row_errors['road_segment_id'] = [f'Invalid pk "{row["road_segment_id"]}" - object does not exist.']
+        if row['sensor_uuid'] not in sensor_ids:
+            row_errors['sensor_uuid'] = [f'Invalid pk "{row["sensor_uuid"]}" - object does not exist.']
+        
+        if row_errors:
+            errors[index] = row_errors
+        else:
+            valid_rows.append(row)
+    
+    # A retried batch only costs the lookup of the passes the filter has seen
+    passes = {}
+    for row in valid_rows:
+        passes.setdefault(get_pass_key(row['sensor_uuid'], row['car_license_plate'], row['timestamp']), row)
+    recorded = find_recorded_passes({key: (row['sensor_uuid'], row['car_license_plate'], row['timestamp']) for key, row in passes.items()})
+    new_rows = [row for key, row in passes.items() if key not in recorded]
+    if not new_rows:
+        return [], errors
+    
+    with transaction.atomic():
+        car_ids = upsert_cars(new_rows, batch_size=batch_size)
+        
+        sensor_readings = [(row['road_segment_id'], car_ids[row['car_license_plate']], row['timestamp'], row['sensor_uuid']) for row in new_rows]
+        created = insert_new_readings(sensor_readings, batch_size=batch_size)
+    
+    # The passes of a batch that is rolled back are not remembered
+    transaction.on_commit(lambda: recent_passes.add_many(passes))
+    return created, errors
+
+
+# Insert the (road segment id, car id, timestamp, sensor id) rows of the readings, and return the ids of the inserted ones.
+# A pass written by another process in the meantime is left out by the unique constraint. Unlike bulk_create(ignore_conflicts=True),
+# RETURNING only gives back the rows that were inserted, so those passes are counted as duplicates without another query.
+READING_FIELDS = ['road_segment_id', 'car_license_plate', 'timestamp', 'sensor_uuid']
+
+def insert_new_readings(rows, batch_size=1000):
+    fields = [SensorReadings._meta.get_field(name) for name in READING_FIELDS]
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(field.column) for field in fields)
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, rows))
+    
+    created_ids = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            placeholders = ', '.join([f"({', '.join(['%s'] * len(fields))})"] * len(batch))
+            params = [field.get_db_prep_save(value, connection) for row in batch for field, value in zip(fields, row)]
+            cursor.execute(f"INSERT INTO {quote_name(SensorReadings._meta.db_table)} ({columns}) VALUES {placeholders} "
+                           f"ON CONFLICT DO NOTHING RETURNING {quote_name(SensorReadings._meta.pk.column)}", params)
+            created_ids.extend(row[0] for row in cursor.fetchall())
+    return created_ids
+
+
+# Resolve every license plate in the rows to a car id, creating the missing cars in a single INSERT.
+# A new car gets the timestamp of its earliest reading in the batch as its creation date, like the single create does.
+# Plates are unique, so a car created by a concurrent request in the meantime is skipped and picked up by the lookup after the insert.
+def upsert_cars(rows, batch_size=1000):
+    first_seen = {}
+    for row in rows:
+        plate = row['car_license_plate']
+        if plate not in first_seen or row['timestamp'] < first_seen[plate]:
+            first_seen[plate] = row['timestamp']
+    
+    car_ids = dict(Cars.objects.filter(car_license_plate__in=first_seen).values_list('car_license_plate', 'id'))
+    
+    missing_cars = [Cars(car_license_plate=plate, created_at=timestamp) for plate, timestamp in first_seen.items() if plate not in car_ids]
+    if missing_cars:
+        Cars.objects.bulk_create(missing_cars, batch_size=batch_size, ignore_conflicts=True)
+        car_ids.update(Cars.objects.filter(car_license_plate__in=[car.car_license_plate for car in missing_cars]).values_list('car_license_plate', 'id'))
+    
+    return car_ids
\ No newline at end of file
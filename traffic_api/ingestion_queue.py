@@ -0,0 +1,112 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+from traffic_monitoring_api.settings import INGESTION_QUEUE_MAX_ROWS, INGESTION_BATCH_SIZE, INGESTION_FLUSH_INTERVAL, INGESTION_WRITER
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+# Background writer of the sensor readings accepted by the ingestion endpoint. The requests only validate their rows and put
+# them on a bounded in-process queue, and a single thread drains it in micro-batches of up to batch_size rows (or whatever
+# arrived within flush_interval seconds of the first row), so the rows are written with one bulk INSERT per batch instead of
+# one transaction per request.
+# The writer is a function that receives (index, validated_data) pairs and returns (created, errors), like
+# bulk_create_sensor_readings, so it can be replaced with INGESTION_WRITER.
+class SensorReadingsWriter:
+    def __init__(self, writer=None, max_rows=INGESTION_QUEUE_MAX_ROWS, batch_size=INGESTION_BATCH_SIZE, flush_interval=INGESTION_FLUSH_INTERVAL):
+        self.writer = writer or import_string(INGESTION_WRITER)
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.stats = {'accepted': 0, 'written': 0, 'rejected': 0, 'batches': 0}
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+    
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopping.clear()
+                self.thread = threading.Thread(target=self.run, name='sensor-readings-writer', daemon=True)
+                self.thread.start()
+    
+    # Queue every row of a request, or none of them when they do not fit (backpressure for the client to retry later)
+    def submit(self, rows):
+        self.start()
+        with self.lock:
+            if self.queue.unfinished_tasks + len(rows) > self.max_rows:
+                raise IngestionQueueFull()
+            for row in rows:
+                self.queue.put_nowait(row)
+            self.stats['accepted'] += len(rows)
+    
+    def run(self):
+        while not (self.stopping.is_set() and self.queue.empty()):
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            self.write_batch(batch)
+    
+    def write_batch(self, batch):
+        try:
+            created, errors = self.writer(list(enumerate(batch)))
+            written, rejected = len(created), len(errors)
+            if errors:
+                logger.warning('Rejected %d of %d queued sensor readings: %s', rejected, len(batch), errors)
+        except Exception:
+            logger.exception('Could not write a batch of %d queued sensor readings', len(batch))
+            written, rejected = 0, len(batch)
+        
+        with self.lock:
+            self.stats['written'] += written
+            self.stats['rejected'] += rejected
+            self.stats['batches'] += 1
+        
+        # The thread keeps its own database connection, which is closed when it is too old or broken
+        close_old_connections()
+        for _ in batch:
+            self.queue.task_done()
+    
+    # Wait until every queued row has been written
+    def flush(self):
+        self.queue.join()
+    
+    # Write the rows still in the queue and stop the thread (on shutdown)
+    def stop(self, timeout=None):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+    
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, queued=self.queue.unfinished_tasks)
+
+
+# One writer per process, created on the first request and flushed when the process exits
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_ingestion_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SensorReadingsWriter()
+            atexit.register(_writer.stop)
+        return _writer
\ No newline at end of file
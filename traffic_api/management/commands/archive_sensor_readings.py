@@ -0,0 +1,24 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from traffic_api.partitions import archive_sensor_readings
+from traffic_monitoring_api.settings import SENSOR_READINGS_RETENTION_DAYS, SENSOR_READINGS_ARCHIVE_DIR
+
+
+# Command to apply the retention period of the sensor readings: the older readings are written to a compressed CSV file
+# per month, then their partitions are dropped (or their rows deleted when the table is not partitioned)
+class Command(BaseCommand):
+    help = 'Archive the sensor readings older than the retention period to .csv.gz files and remove them from the database.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=SENSOR_READINGS_RETENTION_DAYS, help='Number of days of sensor readings kept in the database.')
+        parser.add_argument('--output-dir', default=SENSOR_READINGS_ARCHIVE_DIR, help='Directory of the archive files.')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the months that would be archived.')
+    
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['retention_days'])
+        archived = archive_sensor_readings(cutoff, options['output_dir'], dry_run=options['dry_run'])
+        
+        for path, month_start in archived:
+            self.stdout.write(f"{month_start:%Y-%m}: {'would be written to' if options['dry_run'] else 'written to'} {path}")
+        self.stdout.write(self.style.SUCCESS(f'Archived {len(archived)} month(s) of sensor readings older than {cutoff:%Y-%m-%d %H:%M}.'))
\ No newline at end of file
@@ -0,0 +1,45 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from traffic_api.benchmark import BenchmarkSample, get_benchmark_requests, run_benchmark, get_benchmark_report, compare_reports
+
+
+# Command to time every endpoint of the API against the current data (see generate_synthetic_data), with a JSON report
+# that can be saved and compared with the report of another run
+class Command(BaseCommand):
+    help = 'Time every endpoint of the API and count its queries, writing the results as JSON.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Number of timed requests per endpoint.')
+        parser.add_argument('--warm-cache', action='store_true', help='Let the list endpoints answer from the response cache.')
+        parser.add_argument('--host', default='localhost', help='Host name of the requests (it has to be in ALLOWED_HOSTS).')
+        parser.add_argument('--only', nargs='*', default=None, help='Only measure the endpoints with these URL names.')
+        parser.add_argument('--output', help='File to write the JSON report to (by default it is written to the standard output).')
+        parser.add_argument('--compare', help='JSON report of a previous run to compare the results with.')
+    
+    def handle(self, *args, **options):
+        try:
+            sample = BenchmarkSample()
+        except ValueError as error:
+            raise CommandError(str(error))
+        
+        requests = get_benchmark_requests(sample)
+        if options['only']:
+            requests = [request for request in requests if request['name'] in options['only']]
+        
+        results = run_benchmark(requests, repeat=options['repeat'], warm_cache=options['warm_cache'], host=options['host'])
+        report = get_benchmark_report(results, options['repeat'], options['warm_cache'])
+        
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Measured {len(results)} request(s), report written to {options["output"]}.'))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+        
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+            for change in compare_reports(baseline, report):
+                before, after = change['median_ms']
+                self.stderr.write(f"{change['method']} {change['name']} {change['params'] or ''}: {before} -> {after} ms "
+                                  f"({change['change_percent']:+}%), queries {change['queries'][0]} -> {change['queries'][1]}")
\ No newline at end of file
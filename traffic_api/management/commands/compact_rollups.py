@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from traffic_api.rollups import rebuild_rollups, rebuild_stale_sketches
+
+
+# Command to rebuild the speed rollups (5 minutes, 1 hour, 1 day and all time buckets, with their speed sketches) from the raw traffic readings.
+# With --stale-sketches, only the sketches left stale by updated or deleted readings are rebuilt (cheap enough for a cron job).
+class Command(BaseCommand):
+    help = 'Rebuild the speed rollup tables of the road segments from the raw traffic readings.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--road-segment', type=int, nargs='*', dest='segment_ids', help='Only rebuild the rollups of these road segments.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Number of readings fetched from the database at a time.')
+        parser.add_argument('--stale-sketches', action='store_true', help='Only rebuild the speed sketches that are stale.')
+    
+    def handle(self, *args, **options):
+        if options['stale_sketches']:
+            total = rebuild_stale_sketches(chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} stale speed sketch(es).'))
+            return
+        total = rebuild_rollups(segment_ids=options['segment_ids'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} rollup bucket(s).'))
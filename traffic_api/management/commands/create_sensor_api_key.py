@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from traffic_api.authentication import create_api_key
+from traffic_api.models import Sensors
+
+
+# Command to create (or rotate) the API key a sensor uses to send its readings. The key is only shown here, since only its hash is stored.
+class Command(BaseCommand):
+    help = 'Create a new API key for a sensor, optionally revoking the keys it had before.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('sensor_id', type=int, help='Id of the sensor.')
+        parser.add_argument('--revoke-existing', action='store_true', help='Revoke the current keys of the sensor (key rotation).')
+    
+    def handle(self, *args, **options):
+        try:
+            sensor = Sensors.objects.get(id=options['sensor_id'])
+        except Sensors.DoesNotExist:
+            raise CommandError(f'Sensor {options["sensor_id"]} does not exist.')
+        
+        key = create_api_key(sensor, revoke_existing=options['revoke_existing'])
+        self.stdout.write(self.style.SUCCESS(f'Created a new API key for sensor {sensor.id} ({sensor}). Send it in the X-API-KEY header:'))
+        self.stdout.write(key)
\ No newline at end of file
@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from traffic_api.data_loader import LOADED_MODELS, truncate_tables, can_copy, refresh_derived_data
+from traffic_api.models import Cars
+from traffic_api.synthetic_data import SCALES, generate_synthetic_data
+
+
+# Command to fill the database with a reproducible synthetic dataset, to measure the API with 'python manage.py benchmark'
+class Command(BaseCommand):
+    help = 'Generate synthetic road segments, traffic readings, sensors, cars and sensor readings at a given scale.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=list(SCALES), default='10k', help='Rough total number of rows to generate.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator (the same seed gives the same data).')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Number of rows written per transaction.')
+        parser.add_argument('--truncate', action='store_true', help='Empty the tables (including the cars) before generating.')
+        parser.add_argument('--no-copy', action='store_true', help='Use INSERT statements even when COPY FROM STDIN is available.')
+    
+    def handle(self, *args, **options):
+        use_copy = not options['no_copy']
+        self.stdout.write(f"Generating the {options['scale']} dataset with {'COPY FROM STDIN' if use_copy and can_copy() else 'bulk INSERT statements'}...")
+        
+        if options['truncate']:
+            truncate_tables(LOADED_MODELS + [Cars])
+            self.stdout.write('Emptied the existing tables.')
+        
+        start_time = time.monotonic()
+        def progress(model, rows_generated):
+            self.stdout.write(f'{model._meta.db_table}: {rows_generated} rows ({time.monotonic() - start_time:.1f}s)')
+        
+        totals = generate_synthetic_data(options['scale'], seed=options['seed'], chunk_size=options['chunk_size'], use_copy=use_copy, progress=progress)
+        refresh_derived_data()
+        
+        summary = ', '.join(f'{total} {model.__name__}' for model, total in totals.items())
+        self.stdout.write(self.style.SUCCESS(f'Generated {summary} in {time.monotonic() - start_time:.1f}s.'))
\ No newline at end of file
@@ -0,0 +1,47 @@
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from traffic_api.data_loader import SPLIT_SOURCES, COMBINED_SOURCES, load_sources, truncate_tables, can_copy, refresh_derived_data
+
+
+# Command to load the CSV files of traffic_speed_data into the database (replaces the manual psql \copy steps)
+class Command(BaseCommand):
+    help = 'Load the road segments, traffic readings and sensors from the traffic_speed_data CSV files.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--data-dir', default=str(Path(settings.BASE_DIR) / 'traffic_speed_data'), help='Folder with the CSV files.')
+        parser.add_argument('--source', choices=['combined', 'split'], default='combined',
+                            help='Load traffic_speed.csv (split into road segments and readings on the fly), or road_segments.csv and traffic_readings.csv.')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Number of CSV rows written per transaction.')
+        parser.add_argument('--truncate', action='store_true', help='Empty the tables (and the tables that depend on them) before loading.')
+        parser.add_argument('--resume', action='store_true', help='Skip the rows whose id is already stored, to continue an interrupted load.')
+        parser.add_argument('--no-copy', action='store_true', help='Use INSERT statements even when COPY FROM STDIN is available.')
+    
+    def handle(self, *args, **options):
+        data_dir = Path(options['data_dir'])
+        sources = COMBINED_SOURCES if options['source'] == 'combined' else SPLIT_SOURCES
+        missing_files = [file_name for file_name, _ in sources if not (data_dir / file_name).exists()]
+        if missing_files:
+            raise CommandError(f'Missing CSV file(s) in {data_dir}: {", ".join(missing_files)}')
+        if options['truncate'] and options['resume']:
+            raise CommandError('--truncate and --resume can not be used together.')
+        
+        use_copy = not options['no_copy']
+        self.stdout.write(f"Loading with {'COPY FROM STDIN' if use_copy and can_copy() else 'bulk INSERT statements'}...")
+        
+        if options['truncate']:
+            truncate_tables()
+            self.stdout.write('Emptied the existing tables.')
+        
+        start_time = time.monotonic()
+        def progress(file_name, model, rows_loaded):
+            elapsed = time.monotonic() - start_time
+            self.stdout.write(f'{file_name} -> {model._meta.db_table}: {rows_loaded} rows ({elapsed:.1f}s)')
+        
+        totals = load_sources(data_dir, sources, chunk_size=options['chunk_size'], resume=options['resume'], use_copy=use_copy, progress=progress)
+        
+        refresh_derived_data()
+        
+        summary = ', '.join(f'{total} {model.__name__}' for model, total in totals.items())
+        self.stdout.write(self.style.SUCCESS(f'Loaded {summary} in {time.monotonic() - start_time:.1f}s.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from traffic_api.partitions import can_partition, is_partitioned, convert_to_partitioned, ensure_partitions, get_partitions, add_months, get_month_start
+from traffic_monitoring_api.settings import SENSOR_READINGS_PARTITIONS_AHEAD
+
+
+# Command to store the sensor readings in monthly range partitions on PostgreSQL. Run it once with --convert, then
+# regularly (e.g. daily from cron) so the partitions of the next months exist before their readings arrive.
+class Command(BaseCommand):
+    help = 'Create the monthly partitions of the sensor readings table (PostgreSQL), converting it to a partitioned table with --convert.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=SENSOR_READINGS_PARTITIONS_AHEAD, help='Number of monthly partitions created after the current month.')
+        parser.add_argument('--convert', action='store_true', help='Rewrite the sensor readings table as a partitioned table (locks it while the rows are copied).')
+    
+    def handle(self, *args, **options):
+        if not can_partition():
+            self.stdout.write(self.style.WARNING('Partitioning needs PostgreSQL: the sensor readings stay in a single table, '
+                                                 'and archive_sensor_readings deletes the old rows instead of dropping partitions.'))
+            return
+        
+        now = timezone.now()
+        last_month = add_months(get_month_start(now), options['months_ahead'])
+        if not is_partitioned():
+            if not options['convert']:
+                raise CommandError('The sensor readings table is not partitioned yet, run the command with --convert to convert it.')
+            convert_to_partitioned(now, months_ahead=options['months_ahead'])
+            self.stdout.write(self.style.SUCCESS(f'Converted the sensor readings table to {len(get_partitions())} monthly partition(s).'))
+            return
+        
+        created = ensure_partitions(get_month_start(now), last_month)
+        self.stdout.write(self.style.SUCCESS(f'Created {len(created)} partition(s){": " + ", ".join(created) if created else ""}.'))
\ No newline at end of file
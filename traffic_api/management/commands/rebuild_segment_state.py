@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from traffic_api.segment_state import rebuild_segment_states
+from traffic_api.caching import bump_versions
+from traffic_api.streaming import get_intensity_hub
+
+
+# Command to rebuild the current state (latest reading and intensity) of every road segment from the traffic readings
+class Command(BaseCommand):
+    help = 'Rebuild the current state table of the road segments from their latest traffic readings.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of road segments refreshed per query.')
+    
+    def handle(self, *args, **options):
+        total = rebuild_segment_states(chunk_size=options['chunk_size'])
+        bump_versions('road-segments')
+        get_intensity_hub().publish_resync()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the current state of {total} road segment(s).'))
@@ -0,0 +1,17 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from traffic_api.traffic_api_helpers import resync_sequences
+
+
+# Command to move the id sequences past the highest ids, after loading the CSV data with psql \copy
+class Command(BaseCommand):
+    help = 'Resynchronise the id sequences of the traffic_api tables with the highest id stored in each table.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to resynchronise.')
+    
+    def handle(self, *args, **options):
+        models = list(apps.get_app_config('traffic_api').get_models())
+        statements = resync_sequences(models, using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Resynchronised {len(statements)} sequence(s).'))
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from traffic_api.trajectories import update_trajectories, rebuild_trajectories
+from traffic_monitoring_api.settings import TRAJECTORY_BATCH_SIZE
+
+
+# Command to add the sensor readings stored since the last run to the car trajectories and the travel times of the road
+# segments. Run it regularly (e.g. every minute from cron), or keep it running with --loop.
+class Command(BaseCommand):
+    help = 'Compute the transitions between road segments of the new sensor readings and update the travel time statistics.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=TRAJECTORY_BATCH_SIZE, help='Number of sensor readings processed per query.')
+        parser.add_argument('--rebuild', action='store_true', help='Delete the trajectories and recompute them from every stored sensor reading.')
+        parser.add_argument('--loop', action='store_true', help='Keep processing the new sensor readings as they arrive.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between two runs with --loop.')
+    
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            totals = rebuild_trajectories(batch_size=options['batch_size'])
+            self.write_totals('Rebuilt the trajectories', totals)
+        
+        while True:
+            totals = update_trajectories(batch_size=options['batch_size'])
+            if totals['readings'] or not options['loop']:
+                self.write_totals('Updated the trajectories', totals)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+    
+    def write_totals(self, action, totals):
+        self.stdout.write(self.style.SUCCESS(f"{action}: {totals['readings']} sensor reading(s) in {totals['batches']} batch(es), "
+                                             f"{totals['transitions']} transition(s), {totals['late']} late reading(s) skipped."))
\ No newline at end of file
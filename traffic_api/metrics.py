@@ -0,0 +1,168 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+from django.db import connections
+from traffic_monitoring_api.settings import METRICS_SLOW_REQUEST_SECONDS, METRICS_SLOW_REQUEST_SAMPLE_RATE, METRICS_SLOWEST_QUERIES
+from .caching import get_cache_stats
+
+slow_request_logger = logging.getLogger('traffic_api.slow_requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_SQL_LENGTH = 200
+
+
+## QUERY COLLECTOR -------------------------------------------------------------------------------------------------
+# Database execute wrapper that counts the queries of a request and their time, keeping only its slowest statements
+# (the SQL with its %s placeholders, never the parameters)
+class QueryCollector:
+    def __init__(self, keep=5):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+    
+    def __call__(self, execute, sql, params, many, context):
+        start_time = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start_time
+            self.count += 1
+            self.duration += duration
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, (duration, sql))
+            elif duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (duration, sql))
+
+
+
+## METRICS REGISTRY ------------------------------------------------------------------------------------------------
+# Metrics of every view aggregated in the process (each process exposes its own, like the Prometheus client libraries do
+# without their multiprocess mode)
+class MetricsRegistry:
+    def __init__(self, slowest_queries=METRICS_SLOWEST_QUERIES):
+        self.lock = threading.Lock()
+        self.slowest_queries = slowest_queries
+        self.reset()
+    
+    def reset(self):
+        with self.lock:
+            self.requests = {}        # (view, method, status) -> count
+            self.latency = {}         # (view, method) -> [bucket counts..., sum, count]
+            self.queries = {}         # view -> [queries, query seconds]
+            self.response_size = {}   # view -> [bytes, responses]
+            self.slowest = {}         # sql -> (seconds, view), only the slowest_queries slowest
+    
+    def observe(self, view, method, status, duration, collector, response_size):
+        with self.lock:
+            self.requests[(view, method, status)] = self.requests.get((view, method, status), 0) + 1
+            
+            latency = self.latency.setdefault((view, method), [0] * (len(LATENCY_BUCKETS) + 2))
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    latency[index] += 1
+            latency[-2] += duration
+            latency[-1] += 1
+            
+            queries = self.queries.setdefault(view, [0, 0.0])
+            queries[0] += collector.count
+            queries[1] += collector.duration
+            
+            if response_size is not None:
+                size = self.response_size.setdefault(view, [0, 0])
+                size[0] += response_size
+                size[1] += 1
+            
+            for query_duration, sql in collector.slowest:
+                self.add_slow_query(sql[:MAX_SQL_LENGTH], query_duration, view)
+    
+    def add_slow_query(self, sql, duration, view):
+        if sql in self.slowest:
+            if duration > self.slowest[sql][0]:
+                self.slowest[sql] = (duration, view)
+        elif len(self.slowest) < self.slowest_queries:
+            self.slowest[sql] = (duration, view)
+        else:
+            fastest_sql = min(self.slowest, key=lambda key: self.slowest[key][0])
+            if duration > self.slowest[fastest_sql][0]:
+                del self.slowest[fastest_sql]
+                self.slowest[sql] = (duration, view)
+    
+    # Prometheus text exposition format (version 0.0.4)
+    def render(self):
+        lines = []
+        with self.lock:
+            lines += ['# HELP traffic_api_requests_total Requests handled, by view, method and status code.',
+                      '# TYPE traffic_api_requests_total counter']
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f'traffic_api_requests_total{format_labels(view=view, method=method, status=status)} {count}')
+            
+            lines += ['# HELP traffic_api_request_duration_seconds Time to build the response, by view and method.',
+                      '# TYPE traffic_api_request_duration_seconds histogram']
+            for (view, method), latency in sorted(self.latency.items()):
+                for bound, count in zip(LATENCY_BUCKETS, latency):
+                    lines.append(f'traffic_api_request_duration_seconds_bucket{format_labels(view=view, method=method, le=bound)} {count}')
+                lines.append(f'traffic_api_request_duration_seconds_bucket{format_labels(view=view, method=method, le="+Inf")} {latency[-1]}')
+                lines.append(f'traffic_api_request_duration_seconds_sum{format_labels(view=view, method=method)} {latency[-2]}')
+                lines.append(f'traffic_api_request_duration_seconds_count{format_labels(view=view, method=method)} {latency[-1]}')
+            
+            lines += ['# HELP traffic_api_db_queries_total Database queries run by the requests, by view.',
+                      '# TYPE traffic_api_db_queries_total counter']
+            lines += [f'traffic_api_db_queries_total{format_labels(view=view)} {queries[0]}' for view, queries in sorted(self.queries.items())]
+            lines += ['# HELP traffic_api_db_query_seconds_total Time spent in database queries by the requests, by view.',
+                      '# TYPE traffic_api_db_query_seconds_total counter']
+            lines += [f'traffic_api_db_query_seconds_total{format_labels(view=view)} {queries[1]}' for view, queries in sorted(self.queries.items())]
+            
+            lines += ['# HELP traffic_api_response_size_bytes Size of the (not streamed) response bodies, by view.',
+                      '# TYPE traffic_api_response_size_bytes summary']
+            for view, size in sorted(self.response_size.items()):
+                lines.append(f'traffic_api_response_size_bytes_sum{format_labels(view=view)} {size[0]}')
+                lines.append(f'traffic_api_response_size_bytes_count{format_labels(view=view)} {size[1]}')
+            
+            lines += ['# HELP traffic_api_slowest_query_seconds Slowest time seen for the slowest SQL statements, with the view that ran it.',
+                      '# TYPE traffic_api_slowest_query_seconds gauge']
+            for sql, (duration, view) in sorted(self.slowest.items(), key=lambda item: -item[1][0]):
+                lines.append(f'traffic_api_slowest_query_seconds{format_labels(view=view, sql=sql)} {duration}')
+        
+        lines += ['# HELP traffic_api_response_cache_total Answers of the response cache of the list endpoints.',
+                  '# TYPE traffic_api_response_cache_total counter']
+        lines += [f'traffic_api_response_cache_total{format_labels(result=result)} {count}' for result, count in get_cache_stats().items()]
+        return '\n'.join(lines) + '\n'
+
+def format_labels(**labels):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+metrics_registry = MetricsRegistry()
+
+
+
+## MIDDLEWARE ------------------------------------------------------------------------------------------------------
+# Records the latency, the database queries and the response size of every request under the name of its view. The queries
+# of a streamed response that run after the view returns (e.g. the exports) are not counted.
+# A sample of the requests slower than METRICS_SLOW_REQUEST_SECONDS is logged with their slowest queries.
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        collector = QueryCollector()
+        start_time = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start_time
+        
+        view = request.resolver_match.view_name if getattr(request, 'resolver_match', None) else 'unmatched'
+        response_size = None if response.streaming else len(response.content)
+        metrics_registry.observe(view, request.method, response.status_code, duration, collector, response_size)
+        
+        if duration >= METRICS_SLOW_REQUEST_SECONDS and random.random() < METRICS_SLOW_REQUEST_SAMPLE_RATE:
+            slowest = ''.join(f'\n  {query_duration * 1000:.1f} ms: {sql[:MAX_SQL_LENGTH]}' for query_duration, sql in sorted(collector.slowest, reverse=True))
+            slow_request_logger.warning('Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms%s', request.method, request.get_full_path(),
+                                        view, duration * 1000, collector.count, collector.duration * 1000, slowest)
+        return response
\ No newline at end of file
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cars',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('car_license_plate', models.CharField(max_length=6)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RoadSegments',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('long_start', models.FloatField()),
+                ('lat_start', models.FloatField()),
+                ('long_end', models.FloatField()),
+                ('lat_end', models.FloatField()),
+                ('length', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Sensors',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('uuid', models.UUIDField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrafficReadings',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('speed', models.FloatField(blank=True, null=True)),
+                ('road_segment_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='traffic_api.roadsegments')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SensorReadings',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('timestamp', models.DateTimeField()),
+                ('car_license_plate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='traffic_api.cars')),
+                ('road_segment_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='traffic_api.roadsegments')),
+                ('sensor_uuid', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='traffic_api.sensors')),
+            ],
+        ),
+    ]
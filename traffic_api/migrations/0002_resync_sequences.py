@@ -0,0 +1,19 @@
+from django.db import migrations
+from traffic_api.traffic_api_helpers import resync_sequences
+
+
+# The tables may already hold rows loaded with explicit ids (psql \copy of the CSV data), which leaves the id sequences behind
+def resync_traffic_api_sequences(apps, schema_editor):
+    models = list(apps.get_app_config('traffic_api').get_models())
+    resync_sequences(models, using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(resync_traffic_api_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+from traffic_api.traffic_api_helpers import get_intensity
+
+
+# Fill the new table with the latest reading of every road segment that already exists
+def populate_segment_states(apps, schema_editor):
+    RoadSegments = apps.get_model('traffic_api', 'RoadSegments')
+    TrafficReadings = apps.get_model('traffic_api', 'TrafficReadings')
+    SegmentCurrentState = apps.get_model('traffic_api', 'SegmentCurrentState')
+    
+    latest_readings = TrafficReadings.objects.filter(road_segment_id=models.OuterRef('pk')).order_by('-id')
+    segments = RoadSegments.objects.annotate(
+        latest_reading_id=models.Subquery(latest_readings.values('id')[:1]),
+        latest_speed=models.Subquery(latest_readings.values('speed')[:1]),
+    ).values_list('id', 'latest_reading_id', 'latest_speed').iterator(chunk_size=1000)
+    
+    SegmentCurrentState.objects.bulk_create(
+        (SegmentCurrentState(road_segment_id=segment_id, latest_reading_id=latest_reading_id, speed=speed, intensity=get_intensity(speed))
+         for segment_id, latest_reading_id, speed in segments),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_api', '0002_resync_sequences'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SegmentCurrentState',
+            fields=[
+                ('road_segment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='current_state', serialize=False, to='traffic_api.roadsegments')),
+                ('latest_reading_id', models.IntegerField(blank=True, db_index=True, null=True)),
+                ('speed', models.FloatField(blank=True, null=True)),
+                ('intensity', models.CharField(db_index=True, max_length=7)),
+            ],
+        ),
+        migrations.RunPython(populate_segment_states, migrations.RunPython.noop),
+    ]
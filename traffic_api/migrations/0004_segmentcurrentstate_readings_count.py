@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+# Count the readings that each road segment already has
+def populate_readings_count(apps, schema_editor):
+    TrafficReadings = apps.get_model('traffic_api', 'TrafficReadings')
+    SegmentCurrentState = apps.get_model('traffic_api', 'SegmentCurrentState')
+    
+    readings_count = (TrafficReadings.objects.filter(road_segment_id=models.OuterRef('road_segment_id'))
+                      .values('road_segment_id').annotate(count=models.Count('id')).values('count'))
+    SegmentCurrentState.objects.update(readings_count=models.functions.Coalesce(models.Subquery(readings_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_api', '0003_segmentcurrentstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='segmentcurrentstate',
+            name='readings_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_readings_count, migrations.RunPython.noop),
+    ]
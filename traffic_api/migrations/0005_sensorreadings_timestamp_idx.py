@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_api', '0004_segmentcurrentstate_readings_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sensorreadings',
+            index=models.Index(fields=['-timestamp', '-id'], name='sensorreadings_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_api', '0005_sensorreadings_timestamp_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SegmentSpeedRollups',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(choices=[('5m', '5 minutes'), ('1h', '1 hour'), ('1d', '1 day')], max_length=2)),
+                ('bucket_start', models.DateTimeField()),
+                ('readings_count', models.IntegerField(default=0)),
+                ('speed_count', models.IntegerField(default=0)),
+                ('speed_sum', models.FloatField(default=0)),
+                ('speed_min', models.FloatField(blank=True, null=True)),
+                ('speed_max', models.FloatField(blank=True, null=True)),
+                ('high_count', models.IntegerField(default=0)),
+                ('medium_count', models.IntegerField(default=0)),
+                ('low_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='trafficreadings',
+            name='recorded_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='trafficreadings',
+            index=models.Index(fields=['road_segment_id', 'recorded_at'], name='trafficreadings_segtime_idx'),
+        ),
+        migrations.AddField(
+            model_name='segmentspeedrollups',
+            name='road_segment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='speed_rollups', to='traffic_api.roadsegments'),
+        ),
+        migrations.AddConstraint(
+            model_name='segmentspeedrollups',
+            constraint=models.UniqueConstraint(fields=('road_segment', 'bucket', 'bucket_start'), name='segmentspeedrollups_unique_bucket'),
+        ),
+    ]
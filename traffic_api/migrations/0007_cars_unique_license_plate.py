@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:51
+
+from django.db import migrations, models, transaction
+from django.db.models import Min
+
+
+# Before the plate can be unique, the readings of duplicated cars are moved to the oldest car with that plate and the rest are removed
+def merge_duplicate_cars(apps, schema_editor):
+    Cars = apps.get_model('traffic_api', 'Cars')
+    SensorReadings = apps.get_model('traffic_api', 'SensorReadings')
+    db_alias = schema_editor.connection.alias
+    
+    duplicated_plates = (Cars.objects.using(db_alias).values('car_license_plate')
+                         .annotate(kept_id=Min('id'), cars_count=models.Count('id')).filter(cars_count__gt=1))
+    for plate in duplicated_plates:
+        duplicates = Cars.objects.using(db_alias).filter(car_license_plate=plate['car_license_plate']).exclude(id=plate['kept_id'])
+        SensorReadings.objects.using(db_alias).filter(car_license_plate__in=duplicates).update(car_license_plate_id=plate['kept_id'])
+        duplicates.delete()
+
+
+# Trigram index for ?search= (icontains) lookups, only when the pg_trgm extension is available on PostgreSQL
+def create_plate_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    
+    try:
+        with schema_editor.connection.cursor() as cursor, transaction.atomic(using=schema_editor.connection.alias):
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except Exception:
+        return
+    schema_editor.execute('CREATE INDEX IF NOT EXISTS cars_plate_trgm_idx ON traffic_api_cars USING gin (UPPER(car_license_plate::text) gin_trgm_ops)')
+
+
+def drop_plate_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS cars_plate_trgm_idx')
+
+
+class Migration(migrations.Migration):
+    # The merge runs in its own transaction, so its deferred foreign key checks are done before the table is altered
+    atomic = False
+
+    dependencies = [
+        ('traffic_api', '0006_trafficreadings_recorded_at_segmentspeedrollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cars, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='cars',
+            name='car_license_plate',
+            field=models.CharField(max_length=6, unique=True),
+        ),
+        migrations.RunPython(create_plate_trigram_index, drop_plate_trigram_index),
+    ]
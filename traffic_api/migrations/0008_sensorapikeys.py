@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_api', '0007_cars_unique_license_plate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorApiKeys',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key_prefix', models.CharField(max_length=8)),
+                ('key_hash', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('revoked_at', models.DateTimeField(blank=True, null=True)),
+                ('sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_keys', to='traffic_api.sensors')),
+            ],
+        ),
+    ]
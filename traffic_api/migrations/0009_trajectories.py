@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_api', '0008_sensorapikeys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrajectoryWatermarks',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_reading_id', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SegmentTravelTimes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transitions_count', models.IntegerField(default=0)),
+                ('seconds_sum', models.FloatField(default=0)),
+                ('seconds_squares_sum', models.FloatField(default=0)),
+                ('seconds_min', models.FloatField(blank=True, null=True)),
+                ('seconds_max', models.FloatField(blank=True, null=True)),
+                ('speed_sum', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('from_segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_travel_times', to='traffic_api.roadsegments')),
+                ('to_segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_travel_times', to='traffic_api.roadsegments')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SegmentTransitions',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_reading_id', models.IntegerField()),
+                ('to_reading_id', models.IntegerField(unique=True)),
+                ('departed_at', models.DateTimeField()),
+                ('arrived_at', models.DateTimeField()),
+                ('travel_seconds', models.FloatField()),
+                ('distance', models.FloatField()),
+                ('speed', models.FloatField()),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='traffic_api.cars')),
+                ('from_segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_transitions', to='traffic_api.roadsegments')),
+                ('to_segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_transitions', to='traffic_api.roadsegments')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CarTrajectoryStates',
+            fields=[
+                ('car', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trajectory_state', serialize=False, to='traffic_api.cars')),
+                ('reading_id', models.IntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('road_segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='traffic_api.roadsegments')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='segmenttraveltimes',
+            constraint=models.UniqueConstraint(fields=('from_segment', 'to_segment'), name='segmenttraveltimes_unique_pair'),
+        ),
+        migrations.AddIndex(
+            model_name='segmenttransitions',
+            index=models.Index(fields=['car', 'departed_at'], name='segmenttransitions_car_idx'),
+        ),
+    ]
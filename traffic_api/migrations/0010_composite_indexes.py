@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_api', '0009_trajectories'),
+    ]
+
+    operations = [
+        # The composite indexes are created before the single column indexes of the foreign keys they replace are dropped
+        migrations.AddIndex(
+            model_name='sensorreadings',
+            index=models.Index(fields=['car_license_plate', 'timestamp'], name='sensorreadings_car_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sensorreadings',
+            index=models.Index(fields=['sensor_uuid', 'timestamp'], name='sensorreadings_sensor_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trafficreadings',
+            index=models.Index(fields=['road_segment_id', '-id'], name='trafficreadings_segid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trafficreadings',
+            index=models.Index(fields=['speed'], name='trafficreadings_speed_idx'),
+        ),
+        migrations.AlterField(
+            model_name='sensorreadings',
+            name='car_license_plate',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='traffic_api.cars'),
+        ),
+        migrations.AlterField(
+            model_name='sensorreadings',
+            name='sensor_uuid',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='traffic_api.sensors'),
+        ),
+        migrations.AlterField(
+            model_name='trafficreadings',
+            name='road_segment_id',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='traffic_api.roadsegments'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:23
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+# Before a pass can be unique, the repeated readings of the same (sensor, car, timestamp) are removed, keeping the first one
+# (a single DELETE, nothing references the sensor readings)
+def delete_duplicate_passes(apps, schema_editor):
+    SensorReadings = apps.get_model('traffic_api', 'SensorReadings')
+    db_alias = schema_editor.connection.alias
+    
+    earlier_readings = SensorReadings.objects.using(db_alias).filter(sensor_uuid=OuterRef('sensor_uuid'), car_license_plate=OuterRef('car_license_plate'),
+                                                                     timestamp=OuterRef('timestamp'), id__lt=OuterRef('id'))
+    SensorReadings.objects.using(db_alias).filter(Exists(earlier_readings)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_api', '0010_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_passes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='sensorreadings',
+            constraint=models.UniqueConstraint(fields=('sensor_uuid', 'car_license_plate', 'timestamp'), name='sensorreadings_unique_pass'),
+        ),
+    ]
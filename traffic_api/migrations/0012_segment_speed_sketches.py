@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_api', '0011_sensor_readings_unique_pass'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='segmentspeedrollups',
+            name='speed_sketch',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='segmentspeedrollups',
+            name='bucket',
+            field=models.CharField(choices=[('5m', '5 minutes'), ('1h', '1 hour'), ('1d', '1 day'), ('all', 'All time')], max_length=3),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic_api', '0012_segment_speed_sketches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trajectorywatermarks',
+            name='pending_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
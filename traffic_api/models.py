@@ -1,6 +1,11 @@
-from django.db.models import Model, FloatField, AutoField, DateTimeField, CharField, UUIDField, ForeignKey, CASCADE
+from django.db.models import (Model, FloatField, AutoField, DateTimeField, CharField, UUIDField, IntegerField, ForeignKey, OneToOneField,
+                              BinaryField, JSONField, CASCADE, Index, UniqueConstraint)
+from django.utils import timezone
 from .traffic_api_helpers import get_intensity
 
+# The primary keys of every model are assigned by the database sequence of the id column, so inserts take a single
+# statement and concurrent writers never hand out the same id. After loading rows with explicit ids (e.g. with psql \copy),
+# run 'python manage.py resync_sequences' so the sequences continue after the highest id.
 
 # 1 - ROAD SEGMENTS -----------------------------------------------------------------------------------------------
 class RoadSegments(Model):
@@ -13,40 +18,39 @@ class RoadSegments(Model):
     
     def __str__(self):
         return str(self.id)
-    
-    def save(self, *args, **kwargs):
-        if not self.id:
-            # Get the latest id from existing recordings and increment by 1
-            last_route = RoadSegments.objects.order_by('-id').first()
-            if last_route:
-                self.id = last_route.id + 1
-            else:
-                self.id = 1
-            super(RoadSegments, self).save(*args, **kwargs)
 
 
 # 2 - TRAFFIC READINGS --------------------------------------------------------------------------------------------
 class TrafficReadings(Model):
     id = AutoField(primary_key=True)
     speed = FloatField(null=True, blank=True)
-    road_segment_id = ForeignKey(RoadSegments, on_delete=CASCADE)
+    # Indexed by the composite indexes below, which start with it
+    road_segment_id = ForeignKey(RoadSegments, on_delete=CASCADE, db_index=False)
+    recorded_at = DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            # Time window queries of a road segment (rollup rebuilds and exports)
+            Index(fields=['road_segment_id', 'recorded_at'], name='trafficreadings_segtime_idx'),
+            # Newest readings of a road segment (segment state refreshes and the road segment details)
+            Index(fields=['road_segment_id', '-id'], name='trafficreadings_segid_idx'),
+            # Intensity filters (speed ranges)
+            Index(fields=['speed'], name='trafficreadings_speed_idx'),
+        ]
     
     def __str__(self):
         return str(self.id)
     
     @property
     def intensity(self):
-        return self.get_intensity(self.speed)
+        return get_intensity(self.speed)
     
-    def save(self, *args, **kwargs):
-        if not self.id:
-            # Get the latest id from existing recordings and increment by 1
-            last_route = TrafficReadings.objects.order_by('-id').first()
-            if last_route:
-                self.id = last_route.id + 1
-            else:
-                self.id = 1
-        super(TrafficReadings, self).save(*args, **kwargs)
+    # Keep the values loaded from the database, so the write paths know which road segment and time bucket a reading was moved from
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
 
 # 3 - SENSORS -----------------------------------------------------------------------------------------------------
@@ -57,27 +61,18 @@ class Sensors(Model):
     
     def __str__(self):
         return str(self.name)
-    
-    def save(self, *args, **kwargs):
-        if not self.id:
-            # Get the latest id from existing recordings and increment by 1
-            last_route = Sensors.objects.order_by('-id').first()
-            if last_route:
-                self.id = last_route.id + 1
-            else:
-                self.id = 1
-            super(Sensors, self).save(*args, **kwargs)
 
 
 # 4 - CARS --------------------------------------------------------------------------------------------------------
 class Cars(Model):
     id = AutoField(primary_key=True)
-    car_license_plate = CharField(max_length=6)
+    # Unique, so exact lookups (and prefix lookups, through the extra pattern index PostgreSQL gets for it) use an index
+    car_license_plate = CharField(max_length=6, unique=True)
     created_at = DateTimeField()
     
     @property
     def sensor_readings(self):
-        return SensorReadings.objects.filter(car_license_plate=self.value)
+        return SensorReadings.objects.filter(car_license_plate=self)
     
     def __str__(self):
         return str(self.car_license_plate)
@@ -87,19 +82,156 @@ class Cars(Model):
 class SensorReadings(Model):
     id = AutoField(primary_key=True)
     road_segment_id = ForeignKey(RoadSegments, on_delete=CASCADE)
-    car_license_plate = ForeignKey(Cars, on_delete=CASCADE)
+    # The car and the sensor are indexed by the composite indexes below, which start with them
+    car_license_plate = ForeignKey(Cars, on_delete=CASCADE, db_index=False)
     timestamp = DateTimeField()
-    sensor_uuid = ForeignKey(Sensors, on_delete=CASCADE)
+    sensor_uuid = ForeignKey(Sensors, on_delete=CASCADE, db_index=False)
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination of the sensor readings, newest first
+            Index(fields=['-timestamp', '-id'], name='sensorreadings_timestamp_idx'),
+            # Recent readings of a car (car details) and of a sensor
+            Index(fields=['car_license_plate', 'timestamp'], name='sensorreadings_car_time_idx'),
+            Index(fields=['sensor_uuid', 'timestamp'], name='sensorreadings_sensor_time_idx'),
+        ]
+        constraints = [
+            # A pass of a car in front of a sensor is recorded once, however many times the sensor sends it
+            UniqueConstraint(fields=['sensor_uuid', 'car_license_plate', 'timestamp'], name='sensorreadings_unique_pass'),
+        ]
     
     def __str__(self):
         return str(self.id)
+
+
+# 6 - SEGMENT CURRENT STATE ---------------------------------------------------------------------------------------
+# Latest traffic reading and number of readings of each road segment, kept up to date by the traffic reading write paths (see segment_state.py)
+class SegmentCurrentState(Model):
+    road_segment = OneToOneField(RoadSegments, on_delete=CASCADE, primary_key=True, related_name='current_state')
+    latest_reading_id = IntegerField(null=True, blank=True, db_index=True)
+    speed = FloatField(null=True, blank=True)
+    intensity = CharField(max_length=7, db_index=True)
+    readings_count = IntegerField(default=0)
+    
+    def __str__(self):
+        return f'{self.road_segment_id} - {self.intensity}'
+
+
+# 7 - SEGMENT SPEED ROLLUPS ---------------------------------------------------------------------------------------
+# Speed statistics of a road segment aggregated per time bucket (5 minutes, 1 hour or 1 day, and a single 'all' bucket with
+# every reading of the segment), kept up to date as readings arrive
+class SegmentSpeedRollups(Model):
+    BUCKET_CHOICES = [('5m', '5 minutes'), ('1h', '1 hour'), ('1d', '1 day'), ('all', 'All time')]
+    
+    road_segment = ForeignKey(RoadSegments, on_delete=CASCADE, related_name='speed_rollups')
+    bucket = CharField(max_length=3, choices=BUCKET_CHOICES)
+    bucket_start = DateTimeField()
+    readings_count = IntegerField(default=0)
+    speed_count = IntegerField(default=0)
+    speed_sum = FloatField(default=0)
+    speed_min = FloatField(null=True, blank=True)
+    speed_max = FloatField(null=True, blank=True)
+    high_count = IntegerField(default=0)
+    medium_count = IntegerField(default=0)
+    low_count = IntegerField(default=0)
+    # Mean, variance and percentiles of the speeds of the bucket (see sketches.py)
+    speed_sketch = BinaryField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            # Also the index of the history lookups (a road segment, a bucket size and a time range)
+            UniqueConstraint(fields=['road_segment', 'bucket', 'bucket_start'], name='segmentspeedrollups_unique_bucket'),
+        ]
+    
+    def __str__(self):
+        return f'{self.road_segment_id} - {self.bucket} - {self.bucket_start}'
+
+
+# 8 - SENSOR API KEYS ---------------------------------------------------------------------------------------------
+# Keys that let a sensor send its readings (see authentication.py). Only the SHA-256 hash of a key is stored, and the key
+# itself is shown once when it is created with 'python manage.py create_sensor_api_key'.
+class SensorApiKeys(Model):
+    sensor = ForeignKey(Sensors, on_delete=CASCADE, related_name='api_keys')
+    key_prefix = CharField(max_length=8)
+    key_hash = CharField(max_length=64, unique=True)
+    created_at = DateTimeField(default=timezone.now)
+    revoked_at = DateTimeField(null=True, blank=True)
+    
+    @property
+    def is_active(self):
+        return self.revoked_at is None
     
-    def save(self, *args, **kwargs):
-        if not self.id:
-            # Get the latest id from existing recordings and increment by 1
-            last_route = SensorReadings.objects.order_by('-id').first()
-            if last_route:
-                self.id = last_route.id + 1
-            else:
-                self.id = 1
-            super(SensorReadings, self).save(*args, **kwargs)
\ No newline at end of file
+    def __str__(self):
+        return f'{self.sensor} - {self.key_prefix}...'
+
+
+# 9 - SEGMENT TRANSITIONS -----------------------------------------------------------------------------------------
+# Consecutive passes of a car on two different road segments, with the time it took and the implied speed (see trajectories.py).
+# The sensor readings are referenced by id only, so they can be partitioned and archived without losing the trajectories.
+class SegmentTransitions(Model):
+    car = ForeignKey(Cars, on_delete=CASCADE, related_name='transitions')
+    from_segment = ForeignKey(RoadSegments, on_delete=CASCADE, related_name='outgoing_transitions')
+    to_segment = ForeignKey(RoadSegments, on_delete=CASCADE, related_name='incoming_transitions')
+    from_reading_id = IntegerField()
+    to_reading_id = IntegerField(unique=True)
+    departed_at = DateTimeField()
+    arrived_at = DateTimeField()
+    travel_seconds = FloatField()
+    distance = FloatField()
+    speed = FloatField()
+    
+    class Meta:
+        indexes = [
+            # Trajectory of a car over a time window
+            Index(fields=['car', 'departed_at'], name='segmenttransitions_car_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.car_id} - {self.from_segment_id} -> {self.to_segment_id}'
+
+
+# 10 - SEGMENT TRAVEL TIMES ---------------------------------------------------------------------------------------
+# Travel time statistics of every observed pair of road segments, aggregated from the transitions as they are computed
+class SegmentTravelTimes(Model):
+    from_segment = ForeignKey(RoadSegments, on_delete=CASCADE, related_name='outgoing_travel_times')
+    to_segment = ForeignKey(RoadSegments, on_delete=CASCADE, related_name='incoming_travel_times')
+    transitions_count = IntegerField(default=0)
+    seconds_sum = FloatField(default=0)
+    seconds_squares_sum = FloatField(default=0)
+    seconds_min = FloatField(null=True, blank=True)
+    seconds_max = FloatField(null=True, blank=True)
+    speed_sum = FloatField(default=0)
+    updated_at = DateTimeField(default=timezone.now)
+    
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['from_segment', 'to_segment'], name='segmenttraveltimes_unique_pair'),
+        ]
+    
+    def __str__(self):
+        return f'{self.from_segment_id} -> {self.to_segment_id}'
+
+
+# 11 - CAR TRAJECTORY STATES --------------------------------------------------------------------------------------
+# Latest pass of each car taken into account by the trajectory engine, where its next transition starts from
+class CarTrajectoryStates(Model):
+    car = OneToOneField(Cars, on_delete=CASCADE, primary_key=True, related_name='trajectory_state')
+    reading_id = IntegerField()
+    road_segment = ForeignKey(RoadSegments, on_delete=CASCADE, related_name='+')
+    timestamp = DateTimeField()
+    
+    def __str__(self):
+        return f'{self.car_id} - {self.road_segment_id} - {self.timestamp}'
+
+
+# 12 - TRAJECTORY WATERMARKS --------------------------------------------------------------------------------------
+# Highest sensor reading id processed by the trajectory engine (a single row)
+class TrajectoryWatermarks(Model):
+    name = CharField(max_length=50, primary_key=True)
+    last_reading_id = IntegerField(default=0)
+    # Ranges of ids below last_reading_id that were missing when it moved past them, as [first id, last id, seen at]
+    pending_ids = JSONField(default=list, blank=True)
+    updated_at = DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f'{self.name} - {self.last_reading_id}'
\ No newline at end of file
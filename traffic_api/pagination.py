@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination
+from traffic_monitoring_api.settings import MAX_PAGE_SIZE
+
+
+# Keyset pagination on the primary key: every page is an indexed range scan from the position stored in the (opaque) cursor,
+# so deep pages cost the same as the first one. The page size can be chosen with ?page_size= up to MAX_PAGE_SIZE.
+class IdCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+# Keyset pagination for the sensor readings, newest first. The cursor only stores the timestamp (DRF uses the first ordering
+# field), plus an offset past the readings with that same timestamp. The id only makes the order of those readings stable.
+class TimestampCursorPagination(IdCursorPagination):
+    ordering = ('-timestamp', '-id')
@@ -0,0 +1,196 @@
+import csv
+import gzip
+import re
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from django.db import connection, transaction
+from .models import SensorReadings
+from .traffic_api_helpers import resync_sequences
+
+# The sensor readings can be stored in monthly range partitions on PostgreSQL (by timestamp), so the queries on recent
+# readings only scan the recent partitions and the old months can be archived by dropping whole partitions.
+# The model does not change: Django keeps using the id as the primary key, while the table has (id, timestamp).
+# On the other databases the readings stay in a single table, and the old ones are archived with DELETE statements.
+TABLE = SensorReadings._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+ARCHIVE_COLUMNS = [field.column for field in SensorReadings._meta.concrete_fields]
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+def get_month_start(timestamp):
+    return datetime(timestamp.year, timestamp.month, 1, tzinfo=dt_timezone.utc)
+
+def add_months(month_start, months):
+    month_index = month_start.year * 12 + month_start.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+def get_partition_name(month_start):
+    return f'{TABLE}_p{month_start.year}_{month_start.month:02d}'
+
+
+
+## PARTITIONS ------------------------------------------------------------------------------------------------------
+def can_partition():
+    return connection.vendor == 'postgresql'
+
+def is_partitioned():
+    if not can_partition():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLE])
+        return cursor.fetchone() is not None
+
+# Monthly partitions as (name, month start, next month start), oldest first
+def get_partitions():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                       'WHERE pg_inherits.inhparent = to_regclass(%s)', [TABLE])
+        names = [row[0] for row in cursor.fetchall()]
+    
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            month_start = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+            partitions.append((name, month_start, add_months(month_start, 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+# The partition is filled with the rows of its month that went to the default partition before it existed, and only then
+# attached, so PostgreSQL does not refuse it for overlapping the default partition
+def create_partition(month_start):
+    name, month_end = get_partition_name(month_start), add_months(month_start, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS)')
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [DEFAULT_PARTITION])
+        if cursor.fetchone()[0]:
+            in_month = f'{quote("timestamp")} >= %s AND {quote("timestamp")} < %s'
+            cursor.execute(f'INSERT INTO {quote(name)} SELECT * FROM {quote(DEFAULT_PARTITION)} WHERE {in_month}', [month_start, month_end])
+            cursor.execute(f'DELETE FROM {quote(DEFAULT_PARTITION)} WHERE {in_month}', [month_start, month_end])
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)', [month_start, month_end])
+    return name
+
+# Create the missing monthly partitions from first_month to last_month (included)
+def ensure_partitions(first_month, last_month):
+    existing = {partition[1] for partition in get_partitions()}
+    created = []
+    month_start = get_month_start(first_month)
+    while month_start <= last_month:
+        if month_start not in existing:
+            created.append(create_partition(month_start))
+        month_start = add_months(month_start, 1)
+    return created
+
+# Turn the existing single table into a partitioned one, with a partition per month of the stored readings up to
+# months_ahead months from now, and a default partition for readings outside of them. The table is rewritten in a single
+# transaction, so it is locked until the rows are copied.
+def convert_to_partitioned(now, months_ahead=3):
+    legacy = f'{TABLE}_unpartitioned'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN({quote("timestamp")}) FROM {quote(TABLE)}')
+        oldest = cursor.fetchone()[0] or now
+        
+        # The indexes, unique constraints and foreign keys are created again on the new table with their own names and
+        # definitions (the unique constraints have to include the timestamp, like the one on the passes)
+        cursor.execute("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype IN ('u', 'f') "
+                       "ORDER BY contype DESC", [TABLE])
+        constraints = cursor.fetchall()
+        constraint_names = {name for name, _ in constraints}
+        cursor.execute('SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s', [TABLE])
+        indexes = [definition for name, definition in cursor.fetchall() if name != f'{TABLE}_pkey' and name not in constraint_names]
+        
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(legacy)}')
+        cursor.execute(f'CREATE TABLE {quote(TABLE)} (LIKE {quote(legacy)} INCLUDING DEFAULTS) PARTITION BY RANGE ({quote("timestamp")})')
+        cursor.execute(f'CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} DEFAULT')
+        ensure_partitions(oldest, add_months(get_month_start(now), months_ahead))
+        
+        cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(legacy)}')
+        cursor.execute(f'DROP TABLE {quote(legacy)}')
+        
+        # The primary key of a partitioned table has to include the partition key
+        sequence = f'{TABLE}_id_seq'
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {quote(sequence)} OWNED BY {quote(TABLE)}.{quote("id")}')
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ALTER COLUMN {quote("id")} SET DEFAULT nextval(%s)', [sequence])
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD PRIMARY KEY ({quote("id")}, {quote("timestamp")})')
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in constraints:
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}')
+        resync_sequences([SensorReadings])
+
+
+
+## RETENTION -------------------------------------------------------------------------------------------------------
+def get_archive_path(output_dir, month_start):
+    return Path(output_dir) / f'sensor_readings_{month_start.year}_{month_start.month:02d}.csv.gz'
+
+# A month archived in several runs (a cutoff in the middle of the month, then its partition) gets numbered files, so an
+# archive is never overwritten
+def get_free_archive_path(output_dir, month_start):
+    path = get_archive_path(output_dir, month_start)
+    number = 1
+    while path.exists():
+        number += 1
+        path = path.with_name(f'sensor_readings_{month_start.year}_{month_start.month:02d}_{number}.csv.gz')
+    return path
+
+# Write a whole partition to a gzip compressed CSV file with COPY (psycopg2 or psycopg 3), then drop it
+def archive_partition(name, path):
+    sql = f'COPY (SELECT {", ".join(quote(column) for column in ARCHIVE_COLUMNS)} FROM {quote(name)} ORDER BY {quote("id")}) TO STDOUT WITH (FORMAT csv, HEADER)'
+    with transaction.atomic(), connection.cursor() as cursor:
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'):
+            with gzip.open(path, 'xt', newline='') as archive:
+                raw_cursor.copy_expert(sql, archive)
+        else:
+            with gzip.open(path, 'xb') as archive, raw_cursor.copy(sql) as copy:
+                for data in copy:
+                    archive.write(data)
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}')
+        cursor.execute(f'DROP TABLE {quote(name)}')
+
+# Write the readings of a month older than the cutoff to a gzip compressed CSV file, then delete them (single table
+# fallback, and the rows left in the default partition)
+def archive_rows(month_start, cutoff, output_dir, chunk_size=10000):
+    readings = SensorReadings.objects.filter(timestamp__gte=month_start, timestamp__lt=min(add_months(month_start, 1), cutoff))
+    path = get_free_archive_path(output_dir, month_start)
+    
+    with transaction.atomic():
+        with gzip.open(path, 'xt', newline='') as archive:
+            writer = csv.writer(archive)
+            writer.writerow(ARCHIVE_COLUMNS)
+            total = 0
+            for row in readings.order_by('id').values_list(*(field.attname for field in SensorReadings._meta.concrete_fields)).iterator(chunk_size=chunk_size):
+                writer.writerow(row)
+                total += 1
+        # Nothing depends on the sensor readings, so this is a single DELETE statement
+        readings.delete()
+    return path, total
+
+# Archive every reading older than the cutoff: the whole monthly partitions that ended before it, and the remaining rows
+# month by month. Returns the (path, month start) of the files written.
+def archive_sensor_readings(cutoff, output_dir, dry_run=False):
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    archived = []
+    
+    if is_partitioned():
+        for name, month_start, month_end in get_partitions():
+            if month_end <= cutoff:
+                path = get_free_archive_path(output_dir, month_start)
+                if not dry_run:
+                    archive_partition(name, path)
+                archived.append((path, month_start))
+    
+    # In a dry run the partitions were not dropped, so their months are still found here
+    listed_months = {month_start for _, month_start in archived}
+    months = sorted({get_month_start(timestamp) for timestamp in SensorReadings.objects.filter(timestamp__lt=cutoff)
+                     .dates('timestamp', 'month')} - listed_months)
+    for month_start in months:
+        if dry_run:
+            archived.append((get_free_archive_path(output_dir, month_start), month_start))
+        else:
+            path, _ = archive_rows(month_start, cutoff, output_dir)
+            archived.append((path, month_start))
+    return archived
\ No newline at end of file
@@ -1,15 +1,12 @@
+import hmac
 from rest_framework.permissions import BasePermission, SAFE_METHODS
+from traffic_monitoring_api.settings import METRICS_TOKEN
+from .models import Sensors
 
-# Global permission check for the presence of a valid API key.
+# Permission for the requests of a sensor authenticated with its own API key (see SensorApiKeyAuthentication)
 class HasAPIKey(BasePermission):
     def has_permission(self, request, view):
-        api_key = request.headers.get('X-API-KEY')
-        expected_api_key = '23231c7a-80a7-4810-93b3-98a18ecfbc42'
-
-        #print(f"api_key: {api_key}")
-        #print(f"expected_api_key: {expected_api_key}")
-
-        return api_key == expected_api_key
+        return isinstance(request.auth, Sensors)
 
 # Class to allow admin users to perform any action, while it allows all other users to perform read-only actions
 class IsAdminOrReadOnly(BasePermission):
@@ -27,4 +24,13 @@ class IsAnonymousReadOnly(BasePermission):
         # Allow read-only access to all users
         if request.method in SAFE_METHODS:
             return True
-        return False
\ No newline at end of file
+        return False
+
+# Class to allow the metrics scraper to read /metrics with the METRICS_TOKEN bearer token (admin users are allowed too)
+class HasMetricsToken(BasePermission):
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        
+        authorization = request.headers.get('Authorization', '')
+        return bool(METRICS_TOKEN) and hmac.compare_digest(authorization, f'Bearer {METRICS_TOKEN}')
\ No newline at end of file
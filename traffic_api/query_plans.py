@@ -0,0 +1,70 @@
+import json
+import re
+from django.db import connection
+from .benchmark import get_benchmark_client, send_request
+from .caching import bump_versions
+from .models import TrafficReadings, SensorReadings, Cars, SegmentSpeedRollups, SegmentTransitions
+
+# Tables that grow with the traffic, which the endpoints should only read through an index
+LARGE_TABLES = [model._meta.db_table for model in [TrafficReadings, SensorReadings, Cars, SegmentSpeedRollups, SegmentTransitions]]
+
+# Full table scan in an EXPLAIN QUERY PLAN of SQLite ('SCAN table' without an index, 'SCAN TABLE table' before SQLite 3.36)
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+## QUERY PLANS -----------------------------------------------------------------------------------------------------
+# Database execute wrapper that keeps the SELECT statements of a request with their parameters, to explain them afterwards
+class SelectRecorder:
+    def __init__(self):
+        self.statements = []
+    
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            return json.loads(plan) if isinstance(plan, str) else plan
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+# Tables read with a sequential scan in a plan of explain()
+def get_full_scans(plan):
+    if connection.vendor != 'postgresql':
+        return {match.group(1) for match in map(SQLITE_FULL_SCAN.match, plan) if match}
+    
+    tables = set()
+    nodes = [node['Plan'] for node in plan]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            tables.add(node['Relation Name'])
+        nodes += node.get('Plans', [])
+    return tables
+
+# Update the statistics the query planner chooses the indexes with (e.g. after generating a dataset)
+def analyze_tables():
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+# Send every request once (see benchmark.get_benchmark_requests) and explain its SELECT statements. Returns one result per
+# statement, with the large tables it scans sequentially.
+def get_query_plans(requests, host='localhost'):
+    client = get_benchmark_client(host)
+    results = []
+    for request in requests:
+        # The cached responses would not query the database
+        bump_versions()
+        recorder = SelectRecorder()
+        with connection.execute_wrapper(recorder):
+            response = send_request(client, request)
+        
+        for sql, params in recorder.statements:
+            full_scans = get_full_scans(explain(sql, params)) & set(LARGE_TABLES)
+            results.append({'name': request['name'], 'method': request['method'], 'params': request['params'], 'status': response.status_code,
+                            'sql': sql, 'full_scans': sorted(full_scans)})
+    return results
\ No newline at end of file
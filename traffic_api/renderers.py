@@ -0,0 +1,44 @@
+import re
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Numbers with an exponent, which orjson writes differently from the json module (1e-7 instead of 1e-07). Only a whole
+# value of the compact output is matched, so the strings like a UUID (270e4cc0-...) do not fall back to the slow renderer.
+EXPONENT = re.compile(rb'(?<=[:,\[])-?[0-9]+(\.[0-9]+)?e[-+]?[0-9]+(?=[,\]}])')
+
+
+# Renderer of the /metrics endpoint, whose view already returns the Prometheus text exposition format
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Error responses (e.g. a 403) come as a dict with a detail
+        if isinstance(data, dict):
+            return f"{data.get('detail', data)}\n"
+        return data
+
+
+# JSON renderer that uses orjson when it is installed, with the same output as the DRF JSONRenderer (compact, UTF-8, with
+# \u2028 and \u2029 escaped and the datetimes formatted by the DRF encoder). The pretty printed responses, the data orjson
+# can not encode (e.g. integers over 64 bits) and the responses with a number in exponent notation are rendered by the
+# DRF JSONRenderer itself. A NaN speed is written as null, where the DRF JSONRenderer refuses it (strict JSON).
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        if EXPONENT.search(content):
+            return super().render(data, accepted_media_type, renderer_context)
+        return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
\ No newline at end of file
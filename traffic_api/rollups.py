@@ -0,0 +1,191 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import transaction, IntegrityError
+from django.utils.dateparse import parse_datetime
+from django.db.models import Q, F, Case, When, Value, Count, Sum, Min, Max, FloatField
+from .models import TrafficReadings, SegmentSpeedRollups
+from .sketches import SpeedSketch
+from .traffic_api_helpers import get_intensity, intensity_filter
+
+ROLLUP_BUCKETS = {'5m': timedelta(minutes=5), '1h': timedelta(hours=1), '1d': timedelta(days=1)}
+# Bucket with every reading of a road segment (its speed sketch answers the percentiles of the segment in a single row)
+ALL_TIME_BUCKET = 'all'
+ALL_TIME_START = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+INTENSITY_COLUMNS = {'High': 'high_count', 'Medium': 'medium_count', 'Low': 'low_count'}
+
+
+# Start of the bucket that contains the timestamp (buckets are aligned on the Unix epoch, so days start at midnight UTC)
+def get_bucket_start(timestamp, bucket):
+    if isinstance(timestamp, str):
+        timestamp = parse_datetime(timestamp)
+    size = int(ROLLUP_BUCKETS[bucket].total_seconds())
+    seconds = int(timestamp.timestamp())
+    return datetime.fromtimestamp(seconds - seconds % size, tz=dt_timezone.utc)
+
+
+def get_rollup_keys(segment_id, timestamp):
+    keys = [(segment_id, bucket, get_bucket_start(timestamp, bucket)) for bucket in ROLLUP_BUCKETS]
+    return keys + [(segment_id, ALL_TIME_BUCKET, ALL_TIME_START)]
+
+def get_bucket_readings(segment_id, bucket, bucket_start):
+    readings = TrafficReadings.objects.filter(road_segment_id=segment_id)
+    if bucket == ALL_TIME_BUCKET:
+        return readings
+    return readings.filter(recorded_at__gte=bucket_start, recorded_at__lt=bucket_start + ROLLUP_BUCKETS[bucket])
+
+
+## INCREMENTAL UPDATES ----------------------------------------------------------------------------------------------
+# 1 - ADD A NEW READING TO THE BUCKETS IT FALLS IN
+# The four buckets are updated with a single UPDATE, and only the buckets that do not exist yet are inserted. Then the speed
+# is added to their sketches, which are read and written back under a row lock.
+def add_reading_to_rollups(reading):
+    keys = get_rollup_keys(reading.road_segment_id_id, reading.recorded_at)
+    in_keys = Q()
+    for segment_id, bucket, bucket_start in keys:
+        in_keys |= Q(road_segment_id=segment_id, bucket=bucket, bucket_start=bucket_start)
+    
+    updated = SegmentSpeedRollups.objects.filter(in_keys).update(**get_increments(reading.speed))
+    if updated < len(keys):
+        existing = set(SegmentSpeedRollups.objects.filter(in_keys).values_list('road_segment_id', 'bucket', 'bucket_start'))
+        for key in keys:
+            if key not in existing:
+                create_rollup(key, reading.speed)
+    
+    if reading.speed is not None:
+        add_speed_to_sketches(in_keys, reading.speed)
+
+# Column updates that add one reading to a bucket
+def get_increments(speed):
+    increments = {'readings_count': F('readings_count') + 1}
+    if speed is None:
+        return increments
+    
+    speed_value = Value(speed, output_field=FloatField())
+    increments.update({
+        'speed_count': F('speed_count') + 1,
+        'speed_sum': F('speed_sum') + speed_value,
+        'speed_min': Case(When(Q(speed_min__isnull=True) | Q(speed_min__gt=speed), then=speed_value), default=F('speed_min')),
+        'speed_max': Case(When(Q(speed_max__isnull=True) | Q(speed_max__lt=speed), then=speed_value), default=F('speed_max')),
+    })
+    intensity_column = INTENSITY_COLUMNS[get_intensity(speed)]
+    increments[intensity_column] = F(intensity_column) + 1
+    return increments
+
+def create_rollup(key, speed):
+    segment_id, bucket, bucket_start = key
+    try:
+        # A concurrent writer may have created the bucket in the meantime, in which case the reading is added to it instead
+        with transaction.atomic():
+            SegmentSpeedRollups.objects.create(road_segment_id=segment_id, bucket=bucket, bucket_start=bucket_start, readings_count=0,
+                                               speed_sketch=SpeedSketch().to_bytes())
+    except IntegrityError:
+        pass
+    SegmentSpeedRollups.objects.filter(road_segment_id=segment_id, bucket=bucket, bucket_start=bucket_start).update(**get_increments(speed))
+
+# A new bucket starts with an empty sketch, so a null sketch is always stale and left null (a sketch of this speed alone
+# would be wrong). This does not depend on the counts, which concurrent readings of the same bucket may already have incremented.
+def add_speed_to_sketches(in_keys, speed):
+    with transaction.atomic():
+        rollups = list(SegmentSpeedRollups.objects.select_for_update().filter(in_keys).order_by('id').only('id', 'speed_sketch'))
+        rollups = [rollup for rollup in rollups if rollup.speed_sketch is not None]
+        for rollup in rollups:
+            sketch = SpeedSketch.from_bytes(rollup.speed_sketch)
+            sketch.add(speed)
+            rollup.speed_sketch = sketch.to_bytes()
+        SegmentSpeedRollups.objects.bulk_update(rollups, ['speed_sketch'])
+
+# 2 - RECOMPUTE THE BUCKETS OF A READING THAT WAS UPDATED OR DELETED (min, max and the sketches can not be undone
+# incrementally). The sketch of the 'all' bucket would need every speed of the segment, so it is only marked as stale
+# (null) and rebuilt later by compact_rollups --stale-sketches.
+def recompute_rollups(segment_id, timestamp):
+    for _, bucket, bucket_start in get_rollup_keys(segment_id, timestamp):
+        readings = get_bucket_readings(segment_id, bucket, bucket_start)
+        totals = readings.aggregate(
+            readings_count=Count('id'), speed_count=Count('speed'), speed_sum=Sum('speed'), speed_min=Min('speed'), speed_max=Max('speed'),
+            high_count=Count('id', filter=intensity_filter(['High'])),
+            medium_count=Count('id', filter=intensity_filter(['Medium'])),
+            low_count=Count('id', filter=intensity_filter(['Low'])),
+        )
+        
+        if not totals['readings_count']:
+            SegmentSpeedRollups.objects.filter(road_segment_id=segment_id, bucket=bucket, bucket_start=bucket_start).delete()
+            continue
+        totals['speed_sum'] = totals['speed_sum'] or 0
+        if bucket != ALL_TIME_BUCKET:
+            totals['speed_sketch'] = get_bucket_sketch(readings).to_bytes()
+        else:
+            totals['speed_sketch'] = None if totals['speed_count'] else SpeedSketch().to_bytes()
+        SegmentSpeedRollups.objects.update_or_create(road_segment_id=segment_id, bucket=bucket, bucket_start=bucket_start, defaults=totals)
+
+
+def get_bucket_sketch(readings, chunk_size=2000):
+    sketch = SpeedSketch()
+    for speed in readings.filter(speed__isnull=False).values_list('speed', flat=True).iterator(chunk_size=chunk_size):
+        sketch.add(speed)
+    return sketch
+
+
+## COMPACTION -------------------------------------------------------------------------------------------------------
+# 3 - REBUILD THE ROLLUPS FROM THE RAW READINGS
+# The readings are streamed ordered by road segment, so only the buckets of one segment are kept in memory at a time.
+def rebuild_rollups(segment_ids=None, chunk_size=5000):
+    rollups = SegmentSpeedRollups.objects.all()
+    readings = TrafficReadings.objects.all()
+    if segment_ids is not None:
+        rollups = rollups.filter(road_segment_id__in=segment_ids)
+        readings = readings.filter(road_segment_id__in=segment_ids)
+    
+    total = 0
+    with transaction.atomic():
+        rollups.delete()
+        
+        buckets, sketches = {}, {}
+        current_segment_id = None
+        for segment_id, speed, recorded_at in readings.order_by('road_segment_id', 'recorded_at').values_list(
+                'road_segment_id', 'speed', 'recorded_at').iterator(chunk_size=chunk_size):
+            if segment_id != current_segment_id:
+                total += save_buckets(buckets, sketches)
+                buckets, sketches = {}, {}
+                current_segment_id = segment_id
+            
+            for key in get_rollup_keys(segment_id, recorded_at):
+                if key not in buckets:
+                    buckets[key] = SegmentSpeedRollups(road_segment_id=key[0], bucket=key[1], bucket_start=key[2])
+                    sketches[key] = SpeedSketch()
+                add_speed(buckets[key], speed)
+                if speed is not None:
+                    sketches[key].add(speed)
+        total += save_buckets(buckets, sketches)
+    return total
+
+def add_speed(rollup, speed):
+    rollup.readings_count += 1
+    if speed is None:
+        return
+    rollup.speed_count += 1
+    rollup.speed_sum += speed
+    rollup.speed_min = speed if rollup.speed_min is None else min(rollup.speed_min, speed)
+    rollup.speed_max = speed if rollup.speed_max is None else max(rollup.speed_max, speed)
+    intensity_column = INTENSITY_COLUMNS[get_intensity(speed)]
+    setattr(rollup, intensity_column, getattr(rollup, intensity_column) + 1)
+
+def save_buckets(buckets, sketches):
+    for key, rollup in buckets.items():
+        rollup.speed_sketch = sketches[key].to_bytes()
+    SegmentSpeedRollups.objects.bulk_create(buckets.values(), batch_size=1000)
+    return len(buckets)
+
+# 4 - REBUILD THE STALE SKETCHES ONLY
+# Each bucket is locked while its readings are read, so a speed added in the meantime is not lost.
+def rebuild_stale_sketches(chunk_size=5000):
+    stale = SegmentSpeedRollups.objects.filter(speed_sketch__isnull=True, speed_count__gt=0)
+    total = 0
+    for rollup_id in stale.values_list('id', flat=True).iterator(chunk_size=chunk_size):
+        with transaction.atomic():
+            rollup = SegmentSpeedRollups.objects.select_for_update().filter(id=rollup_id, speed_sketch__isnull=True).first()
+            if rollup is None:
+                continue
+            readings = get_bucket_readings(rollup.road_segment_id, rollup.bucket, rollup.bucket_start)
+            rollup.speed_sketch = get_bucket_sketch(readings, chunk_size=chunk_size).to_bytes()
+            rollup.save(update_fields=['speed_sketch'])
+            total += 1
+    return total
\ No newline at end of file
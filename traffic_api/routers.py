@@ -0,0 +1,109 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.utils import DatabaseError
+from rest_framework.permissions import SAFE_METHODS
+from traffic_monitoring_api.settings import DATABASE_REPLICAS, DATABASE_REPLICA_RETRY_SECONDS
+
+# The reads of the GET requests (and of the blocks under use_replica) go to one of the DATABASE_REPLICAS, while the writes,
+# and every read of the requests that write, stay on the primary database ('default'), so they see their own writes.
+# The database of the reads is kept in a context variable, which follows the request into the threads of the ASGI server.
+read_database = ContextVar('read_database', default=None)
+
+
+def get_read_database():
+    return read_database.get() or DEFAULT_DB_ALIAS
+
+@contextmanager
+def use_database(alias):
+    token = read_database.set(alias)
+    try:
+        yield alias
+    finally:
+        read_database.reset(token)
+
+# Read from a replica (or the primary when none is available) in a block, like a long export or analytics query
+def use_replica():
+    return use_database(replica_pool.get_database())
+
+# Read from the primary in a block, like a read that has to see a write made just before it
+def use_primary():
+    return use_database(DEFAULT_DB_ALIAS)
+
+
+
+## REPLICAS --------------------------------------------------------------------------------------------------------
+# Picks the replicas in turn. A replica whose connection fails is left out for retry_seconds, and when none of them is
+# available the reads go to the primary.
+class ReplicaPool:
+    def __init__(self, aliases, retry_seconds=DATABASE_REPLICA_RETRY_SECONDS):
+        self.aliases = list(aliases)
+        self.retry_seconds = retry_seconds
+        self.unavailable_until = {}
+        self.lock = threading.Lock()
+        self.cycle = itertools.cycle(self.aliases)
+
+    def get_database(self):
+        for _ in self.aliases:
+            with self.lock:
+                alias = next(self.cycle)
+                if self.unavailable_until.get(alias, 0) > time.monotonic():
+                    continue
+
+            if self.is_available(alias):
+                return alias
+            with self.lock:
+                self.unavailable_until[alias] = time.monotonic() + self.retry_seconds
+        return DEFAULT_DB_ALIAS
+
+    # With CONN_HEALTH_CHECKS, a persistent connection that stopped working is closed (once per request) and opened again
+    def is_available(self, alias):
+        connection = connections[alias]
+        try:
+            connection.close_if_health_check_failed()
+            connection.ensure_connection()
+            return True
+        except DatabaseError:
+            return False
+
+replica_pool = ReplicaPool(DATABASE_REPLICAS)
+
+
+
+## ROUTER ----------------------------------------------------------------------------------------------------------
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    # The writes go to the database the instance was loaded from, or to the primary
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_pool.aliases}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    # The replicas get the tables from the primary
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_pool.aliases:
+            return False
+        return None
+
+
+
+## MIDDLEWARE ------------------------------------------------------------------------------------------------------
+# Sends the reads of the GET, HEAD and OPTIONS requests to a replica
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in SAFE_METHODS or not replica_pool.aliases:
+            return self.get_response(request)
+        with use_replica():
+            return self.get_response(request)
\ No newline at end of file
@@ -0,0 +1,195 @@
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from traffic_monitoring_api.settings import EXPAND_DEFAULT_LIMIT, EXPAND_MAX_LIMIT
+from .models import TrafficReadings
+from .traffic_api_helpers import intensity_case
+
+
+# Read-only serialization of the list views from .values() rows, without building a model instance and running the DRF
+# field machinery per row. Each row serializer gives the same output as the ModelSerializer of its view (which still
+# describes the responses in the API docs), with a precomputed list of (name, lookup, conversion) per field.
+# The clients can ask for some of the fields only with ?fields=id,long_start,..., and only their columns are selected.
+
+# Conversion of the datetime fields, to the same representation as the DRF DateTimeField (ISO 8601 in the current time zone,
+# with a Z for UTC). The time zone is looked up once per response.
+DATETIME = 'datetime'
+
+def get_datetime_converter():
+    current_timezone = timezone.get_current_timezone()
+    def convert(value):
+        value = value.astimezone(current_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+class RowSerializer:
+    # (name in the response, lookup of .values(), conversion of the values that are not null: None to keep them, a function or DATETIME)
+    fields = []
+    # Fields that are only included when they are asked for with ?fields=
+    optional_fields = []
+    
+    def __init__(self, names=None):
+        if names is None:
+            self.selected_fields = self.fields
+            return
+        
+        available_fields = self.fields + self.optional_fields
+        available_names = [name for name, _, _ in available_fields]
+        unknown_names = [name for name in names if name not in available_names]
+        if unknown_names:
+            raise ValidationError({'fields': f'Unknown field(s) {", ".join(unknown_names)}, expected a comma separated list of {", ".join(available_names)}.'})
+        self.selected_fields = [field for field in available_fields if field[0] in names]
+    
+    # The extra lookups are selected without being in the response (like the ordering of the pagination)
+    def get_values(self, queryset, extra_lookups=()):
+        return queryset.values(*{lookup for _, lookup, _ in self.selected_fields}.union(extra_lookups))
+    
+    def to_representation(self, rows):
+        convert_datetime = get_datetime_converter()
+        fields = [(name, lookup, convert_datetime if convert == DATETIME else convert) for name, lookup, convert in self.selected_fields]
+        
+        data = []
+        for row in rows:
+            item = {}
+            for name, lookup, convert in fields:
+                value = row[lookup]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+
+# 1 - TRAFFIC READINGS (the intensity comes from the intensity_level annotation of the list view)
+class TrafficReadingRows(RowSerializer):
+    fields = [
+        ('id', 'id', None),
+        ('intensity', 'intensity_level', None),
+        ('speed', 'speed', None),
+        ('road_segment_id', 'road_segment_id', None),
+        ('recorded_at', 'recorded_at', DATETIME),
+    ]
+
+# 2 - ROAD SEGMENTS (without the readings, which are only included with ?expand=traffic_readings, and a null count for a
+# segment without a state). The current intensity and speed of the segments can be asked for with ?fields= (e.g. by the map).
+class RoadSegmentRows(RowSerializer):
+    fields = [
+        ('id', 'id', None),
+        ('long_start', 'long_start', None),
+        ('lat_start', 'lat_start', None),
+        ('long_end', 'long_end', None),
+        ('lat_end', 'lat_end', None),
+        ('length', 'length', None),
+        ('traffic_readings_count', 'current_state__readings_count', None),
+    ]
+    optional_fields = [
+        ('intensity', 'current_state__intensity', None),
+        ('speed', 'current_state__speed', None),
+    ]
+
+# 3 - SENSORS
+class SensorRows(RowSerializer):
+    fields = [
+        ('id', 'id', None),
+        ('name', 'name', None),
+        ('uuid', 'uuid', str),
+    ]
+
+# 4 - SENSOR READINGS
+class SensorReadingRows(RowSerializer):
+    fields = [
+        ('id', 'id', None),
+        ('road_segment_id', 'road_segment_id', None),
+        ('car_license_plate', 'car_license_plate', None),
+        ('timestamp', 'timestamp', DATETIME),
+        ('sensor_uuid', 'sensor_uuid', None),
+    ]
+
+# 5 - CARS
+class CarRows(RowSerializer):
+    fields = [
+        ('id', 'id', None),
+        ('car_license_plate', 'car_license_plate', None),
+        ('created_at', 'created_at', DATETIME),
+    ]
+
+
+# Parse the ?fields= query parameter (e.g. "id,long_start,lat_start") into field names, None when it is not given
+def get_requested_fields(request):
+    value = request.query_params.get('fields')
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+# Parse the ?expand_limit= query parameter, the number of nested items per row
+def get_expand_limit(request, default=EXPAND_DEFAULT_LIMIT):
+    value = request.query_params.get('expand_limit')
+    if value is None:
+        return default
+    if not value.isdigit() or int(value) > EXPAND_MAX_LIMIT:
+        raise ValidationError({'expand_limit': f'Expected a whole number between 0 and {EXPAND_MAX_LIMIT}.'})
+    return int(value)
+
+# Latest `limit` traffic readings of each of the road segments (road segment id -> readings, newest first), in a single query:
+# the readings are numbered per segment by a window function, as a sliced Prefetch would do, and read from the
+# (road_segment_id, -id) index
+def get_latest_traffic_readings(segment_ids, limit):
+    if not segment_ids or limit == 0:
+        return {}
+    
+    rank = Window(RowNumber(), partition_by=[F('road_segment_id')], order_by=F('id').desc())
+    queryset = (TrafficReadings.objects.filter(road_segment_id__in=segment_ids).annotate(intensity_level=intensity_case(), rank=rank)
+                .filter(rank__lte=limit).order_by('road_segment_id', '-id'))
+    
+    row_serializer = TrafficReadingRows()
+    readings = {}
+    for reading in row_serializer.to_representation(row_serializer.get_values(queryset)):
+        readings.setdefault(reading['road_segment_id'], []).append(reading)
+    return readings
+
+
+# Mixin for the list views serialized with a row serializer. The pagination works on the rows as it does on the instances.
+# The nested collections a view can include with ?expand= are given by expandable_fields: name -> function of (the ids of
+# the rows of the page, the ?expand_limit=) that returns the nested items by id.
+class RowListMixin:
+    row_serializer_class = None
+    expandable_fields = {}
+    
+    def list(self, request, *args, **kwargs):
+        row_serializer = self.row_serializer_class(get_requested_fields(request))
+        expand = self.get_expand(request)
+        queryset = row_serializer.get_values(self.filter_queryset(self.get_queryset()), self.get_extra_lookups(expand))
+        
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else queryset
+        data = row_serializer.to_representation(rows)
+        if expand:
+            limit = get_expand_limit(request)
+            ids = [row['id'] for row in rows]
+            for name in expand:
+                nested = self.expandable_fields[name](ids, limit)
+                for row, item in zip(rows, data):
+                    item[name] = nested.get(row['id'], [])
+        
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+    
+    def get_expand(self, request):
+        value = request.query_params.get('expand')
+        if not value:
+            return []
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown_names = [name for name in names if name not in self.expandable_fields]
+        if unknown_names:
+            expected = ', '.join(self.expandable_fields) or 'nothing, this list has no nested fields'
+            raise ValidationError({'expand': f'Unknown field(s) {", ".join(unknown_names)}, expected {expected}.'})
+        return names
+    
+    # The rows keep the fields of the ordering of the pagination (for the cursor of the next page) and the id (for the
+    # nested fields), even when ?fields= leaves them out of the response
+    def get_extra_lookups(self, expand):
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        ordering = [ordering] if isinstance(ordering, str) else list(ordering)
+        return [field.lstrip('-') for field in ordering] + (['id'] if expand else [])
\ No newline at end of file
@@ -0,0 +1,54 @@
+from django.db.models import Q, F, Case, When, Value, Count, OuterRef, Subquery, IntegerField, FloatField, CharField
+from .models import RoadSegments, TrafficReadings, SegmentCurrentState
+from .traffic_api_helpers import get_intensity, classify_speeds
+
+
+# Recompute the current state of the given road segments from their traffic readings and upsert it.
+# Each segment costs an indexed lookup of its newest reading and a count over its readings, so this is cheap for the handful of segments touched by a write,
+# and it can also be run in chunks over every segment to rebuild the whole table.
+def refresh_segment_states(segment_ids):
+    segment_ids = set(segment_ids)
+    if not segment_ids:
+        return []
+    
+    latest_readings = TrafficReadings.objects.filter(road_segment_id=OuterRef('pk')).order_by('-id')
+    readings_count = TrafficReadings.objects.filter(road_segment_id=OuterRef('pk')).values('road_segment_id').annotate(count=Count('id')).values('count')
+    segments = RoadSegments.objects.filter(id__in=segment_ids).annotate(
+        latest_reading_id=Subquery(latest_readings.values('id')[:1]),
+        latest_speed=Subquery(latest_readings.values('speed')[:1]),
+        readings_count=Subquery(readings_count),
+    ).values_list('id', 'latest_reading_id', 'latest_speed', 'readings_count')
+    
+    segments = list(segments)
+    intensities = classify_speeds([speed for _, _, speed, _ in segments])
+    states = [
+        SegmentCurrentState(road_segment_id=segment_id, latest_reading_id=latest_reading_id, speed=speed, intensity=intensity,
+                            readings_count=count or 0)
+        for (segment_id, latest_reading_id, speed, count), intensity in zip(segments, intensities)
+    ]
+    SegmentCurrentState.objects.bulk_create(states, update_conflicts=True, unique_fields=['road_segment'],
+                                            update_fields=['latest_reading_id', 'speed', 'intensity', 'readings_count'])
+    return states
+
+
+# Count a newly created reading in the state of its road segment with a single UPDATE, which also moves the latest reading
+# forward unless the segment already has a newer one. Falls back to a full refresh when the segment has no state row yet.
+def advance_segment_state(reading):
+    is_newer = Q(latest_reading_id__isnull=True) | Q(latest_reading_id__lt=reading.id)
+    updated = SegmentCurrentState.objects.filter(road_segment_id=reading.road_segment_id_id).update(
+        latest_reading_id=Case(When(is_newer, then=Value(reading.id, output_field=IntegerField())), default=F('latest_reading_id')),
+        speed=Case(When(is_newer, then=Value(reading.speed, output_field=FloatField())), default=F('speed')),
+        intensity=Case(When(is_newer, then=Value(get_intensity(reading.speed), output_field=CharField())), default=F('intensity')),
+        readings_count=F('readings_count') + 1,
+    )
+    
+    if not updated:
+        refresh_segment_states({reading.road_segment_id_id})
+
+
+# Rebuild the current state of every road segment, a chunk of segments at a time
+def rebuild_segment_states(chunk_size=1000):
+    segment_ids = list(RoadSegments.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(segment_ids), chunk_size):
+        refresh_segment_states(segment_ids[start:start + chunk_size])
+    return len(segment_ids)
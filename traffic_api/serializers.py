@@ -1,8 +1,10 @@
-from rest_framework.serializers import ModelSerializer, SerializerMethodField, CharField, PrimaryKeyRelatedField, FloatField
+from rest_framework.serializers import (Serializer, ModelSerializer, SerializerMethodField, CharField, PrimaryKeyRelatedField, FloatField,
+                                        IntegerField, DateTimeField)
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from django.db.models import DateTimeField
-from .models import RoadSegments, TrafficReadings, Sensors, Cars, SensorReadings
+from .models import RoadSegments, TrafficReadings, Sensors, Cars, SensorReadings, SegmentSpeedRollups, SegmentTransitions, SegmentTravelTimes
 from .traffic_api_helpers import get_intensity
+from .deduplication import get_pass_key, find_recorded_reading, recent_passes
 
 
 ## TRAFFIC READINGS -----------------------------------------------------------------------------------------
@@ -12,20 +14,26 @@ class TrafficReadingsSerializer(ModelSerializer):
     intensity = SerializerMethodField()
     
     def get_intensity(self, obj):
+        # Use the intensity computed by the database when the queryset was annotated with intensity_case()
+        intensity_level = getattr(obj, 'intensity_level', None)
+        if intensity_level is not None:
+            return intensity_level
         return get_intensity(obj.speed)
     
     class Meta:
         model = TrafficReadings
-        fields = ['id', 'intensity', 'speed', 'road_segment_id']
+        fields = ['id', 'intensity', 'speed', 'road_segment_id', 'recorded_at']
 
 # 2 - CREATE TRAFFIC READINGS
 class CreateTrafficReadingSerializer(ModelSerializer):
     speed = FloatField()
     road_segment_id = PrimaryKeyRelatedField(queryset=RoadSegments.objects.all())
     
+    recorded_at = DateTimeField(required=False)
+    
     class Meta:
         model = TrafficReadings
-        fields = ['id', 'speed', 'road_segment_id']
+        fields = ['id', 'speed', 'road_segment_id', 'recorded_at']
     
     # Override the create function so the intensity property is not involved when creating a new instance
     def create(self, validated_data):
@@ -33,20 +41,23 @@ class CreateTrafficReadingSerializer(ModelSerializer):
         speed = validated_data.pop('speed')
         road_segment_id = validated_data.pop('road_segment_id')
         
-        # Create a new instance just with these speed and road_segment_id
-        new_traffic_reading = TrafficReadings.objects.create(speed=speed, road_segment_id=road_segment_id)
+        # The reading time defaults to now when the client does not send it
+        recorded_at = validated_data.pop('recorded_at', timezone.now())
+        
+        # Create a new instance just with these speed, road_segment_id and recorded_at
+        new_traffic_reading = TrafficReadings.objects.create(speed=speed, road_segment_id=road_segment_id, recorded_at=recorded_at)
         return new_traffic_reading
 
 
 ## ROAD SEGMENTS --------------------------------------------------------------------------------------------
 # 3 - GET ROAD SEGMENTS
 class RoadSegmentsSerializer(ModelSerializer):
+    # Describes the latest readings of the responses with ?expand=traffic_readings (see RoadSegmentsView), the segments do
+    # not have this attribute, so it is left out of the other responses
     traffic_readings = TrafficReadingsSerializer(many=True, read_only=True)
-    traffic_readings_count = SerializerMethodField()
     
-    def get_traffic_readings_count(self, obj):
-        count = obj.trafficreadings_set.count()
-        return count
+    # The count is kept in the segment state table, so list views only need to select_related('current_state')
+    traffic_readings_count = IntegerField(source='current_state.readings_count', read_only=True, default=0)
     
     class Meta:
         model = RoadSegments
@@ -85,27 +96,94 @@ class CreateSensorReadingSerializer(ModelSerializer):
         model = SensorReadings
         fields = ['car_license_plate', 'timestamp', 'road_segment_id', 'sensor_uuid']
     
+    # The timestamp of the device is kept, so a pass sent again is recognized (see deduplication.py).
+    # Saving a pass that is already stored returns the stored reading, and sets recorded_reading.
+    def validate(self, attrs):
+        self.pass_key = get_pass_key(attrs['sensor_uuid'].id, attrs['car_license_plate'], attrs['timestamp'])
+        self.recorded_reading = find_recorded_reading(attrs['sensor_uuid'].id, attrs['car_license_plate'], attrs['timestamp'])
+        return attrs
+    
     def create(self, validated_data):
+        if self.recorded_reading is not None:
+            return self.recorded_reading
+        
         car_license_plate = validated_data.get('car_license_plate')
         timestamp = validated_data.get('timestamp')
         
         cars, created = Cars.objects.get_or_create(car_license_plate=car_license_plate, defaults={'created_at': timestamp})
-        
-        # Set timestamp to the current time
-        validated_data['timestamp'] = timezone.now()
         validated_data['car_license_plate'] = cars
         
-        sensor_reading = SensorReadings.objects.create(**validated_data)
+        # The same pass may have been written by another request since it was validated
+        try:
+            with transaction.atomic():
+                sensor_reading = SensorReadings.objects.create(**validated_data)
+        except IntegrityError:
+            self.recorded_reading = SensorReadings.objects.get(sensor_uuid=validated_data['sensor_uuid'], car_license_plate=cars, timestamp=timestamp)
+            return self.recorded_reading
+        # A pass that is rolled back is not remembered
+        transaction.on_commit(lambda: recent_passes.add_many([self.pass_key]))
         return sensor_reading
 
+# 8 - BULK CREATE SENSOR READINGS (validates a single row of the batch, the related objects are checked in bulk afterwards)
+class BulkSensorReadingRowSerializer(Serializer):
+    car_license_plate = CharField(max_length=6)
+    timestamp = DateTimeField()
+    road_segment_id = IntegerField()
+    sensor_uuid = IntegerField()
+
+
+## SEGMENT SPEED HISTORY -------------------------------------------------------------------------------------
+# 9 - GET THE SPEED HISTORY OF A ROAD SEGMENT (one row per time bucket)
+class SegmentSpeedHistorySerializer(ModelSerializer):
+    average_speed = SerializerMethodField()
+    intensity_share = SerializerMethodField()
+    
+    def get_average_speed(self, obj):
+        return obj.speed_sum / obj.speed_count if obj.speed_count else None
+    
+    def get_intensity_share(self, obj):
+        counts = {'high': obj.high_count, 'medium': obj.medium_count, 'low': obj.low_count,
+                  'no_data': obj.readings_count - obj.high_count - obj.medium_count - obj.low_count}
+        return {level: count / obj.readings_count for level, count in counts.items()}
+    
+    class Meta:
+        model = SegmentSpeedRollups
+        fields = ['bucket_start', 'readings_count', 'average_speed', 'speed_min', 'speed_max', 'intensity_share']
+
 
 ## CARS -----------------------------------------------------------------------------------------------------
-# 8 - GET CARS
+# 10 - GET CARS
+# (the readings, road segments and sensors of a car are only loaded by the car details view, in a bounded number of queries)
 class CarsSerializer(ModelSerializer):
-    sensor_readings = SensorReadingsSerializer(many=True, read_only=True)
-    road_segments = RoadSegmentsSerializer(many=True, read_only=True)
-    sensors = SensorsSerializer(many=True, read_only=True)
-    
     class Meta:
         model = Cars
-        fields = ['id', 'car_license_plate', 'created_at', 'sensor_readings', 'road_segments', 'sensors']
\ No newline at end of file
+        fields = ['id', 'car_license_plate', 'created_at']
+
+
+## TRAJECTORIES ---------------------------------------------------------------------------------------------
+# 11 - GET THE TRANSITIONS OF A CAR BETWEEN ROAD SEGMENTS (the speed is in km/h)
+class SegmentTransitionsSerializer(ModelSerializer):
+    class Meta:
+        model = SegmentTransitions
+        fields = ['from_segment', 'to_segment', 'departed_at', 'arrived_at', 'travel_seconds', 'distance', 'speed']
+
+# 12 - GET THE TRAVEL TIME STATISTICS OF A PAIR OF ROAD SEGMENTS
+class SegmentTravelTimesSerializer(ModelSerializer):
+    average_seconds = SerializerMethodField()
+    stddev_seconds = SerializerMethodField()
+    average_speed = SerializerMethodField()
+    
+    def get_average_seconds(self, obj):
+        return obj.seconds_sum / obj.transitions_count
+    
+    def get_stddev_seconds(self, obj):
+        variance = obj.seconds_squares_sum / obj.transitions_count - (obj.seconds_sum / obj.transitions_count) ** 2
+        return max(variance, 0) ** 0.5
+    
+    def get_average_speed(self, obj):
+        return obj.speed_sum / obj.transitions_count
+    
+    class Meta:
+        model = SegmentTravelTimes
+        fields = ['from_segment', 'to_segment', 'transitions_count', 'average_seconds', 'stddev_seconds', 'seconds_min', 'seconds_max',
+                  'average_speed', 'updated_at']
\ No newline at end of file
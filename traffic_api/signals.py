@@ -0,0 +1,135 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.query import QuerySet
+from .models import RoadSegments, TrafficReadings, SegmentCurrentState, SensorApiKeys
+from .segment_state import refresh_segment_states, advance_segment_state
+from .rollups import add_reading_to_rollups, recompute_rollups
+from .spatial import invalidate_segment_index
+from .caching import bump_versions
+from .authentication import api_key_cache
+from .streaming import get_intensity_hub
+from .traffic_api_helpers import get_intensity
+
+
+## SEGMENT CURRENT STATE -------------------------------------------------------------------------------------------
+# 1 - NEW ROAD SEGMENTS START WITHOUT READINGS
+@receiver(post_save, sender=RoadSegments)
+def create_segment_state(sender, instance, created, **kwargs):
+    if created:
+        SegmentCurrentState.objects.get_or_create(road_segment=instance, defaults={'intensity': get_intensity(None)})
+
+# 2 - A TRAFFIC READING WAS CREATED OR UPDATED
+@receiver(post_save, sender=TrafficReadings)
+def update_segment_state_on_save(sender, instance, created, **kwargs):
+    if created:
+        advance_segment_state(instance)
+        return
+    
+    # An updated reading may have been moved from another road segment (which loses it from its count), and may have been
+    # the latest one of another road segment before it was moved
+    segment_ids = {instance.road_segment_id_id}
+    previous_segment_id = getattr(instance, '_loaded_values', {}).get('road_segment_id_id')
+    if previous_segment_id is not None:
+        segment_ids.add(previous_segment_id)
+    segment_ids.update(SegmentCurrentState.objects.filter(latest_reading_id=instance.id).values_list('road_segment_id', flat=True))
+    refresh_segment_states(segment_ids)
+
+# 3 - A TRAFFIC READING WAS DELETED
+@receiver(post_delete, sender=TrafficReadings)
+def update_segment_state_on_delete(sender, instance, origin=None, **kwargs):
+    if not is_road_segment_deletion(origin):
+        refresh_segment_states({instance.road_segment_id_id})
+
+# When the road segment itself is being deleted, the derived rows of its readings go away with it
+def is_road_segment_deletion(origin):
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is RoadSegments
+
+
+
+## SEGMENT SPEED ROLLUPS -------------------------------------------------------------------------------------------
+# 4 - A TRAFFIC READING WAS CREATED OR UPDATED
+@receiver(post_save, sender=TrafficReadings)
+def update_rollups_on_save(sender, instance, created, **kwargs):
+    if created:
+        add_reading_to_rollups(instance)
+        return
+    
+    positions = {(instance.road_segment_id_id, instance.recorded_at)}
+    loaded_values = getattr(instance, '_loaded_values', {})
+    if 'road_segment_id_id' in loaded_values and 'recorded_at' in loaded_values:
+        positions.add((loaded_values['road_segment_id_id'], loaded_values['recorded_at']))
+    for segment_id, recorded_at in positions:
+        recompute_rollups(segment_id, recorded_at)
+
+# 5 - A TRAFFIC READING WAS DELETED
+@receiver(post_delete, sender=TrafficReadings)
+def update_rollups_on_delete(sender, instance, origin=None, **kwargs):
+    if not is_road_segment_deletion(origin):
+        recompute_rollups(instance.road_segment_id_id, instance.recorded_at)
+
+
+
+## SPATIAL INDEX ---------------------------------------------------------------------------------------------------
+# 6 - A ROAD SEGMENT WAS CREATED, MOVED OR DELETED
+@receiver(post_save, sender=RoadSegments)
+@receiver(post_delete, sender=RoadSegments)
+def update_segment_index(sender, instance, **kwargs):
+    invalidate_segment_index()
+
+
+
+## RESPONSE CACHE --------------------------------------------------------------------------------------------------
+# 7 - A TRAFFIC READING, ROAD SEGMENT OR SEGMENT STATE WAS WRITTEN (by the API or the admin)
+@receiver(post_save, sender=TrafficReadings)
+@receiver(post_delete, sender=TrafficReadings)
+def bump_traffic_readings_version(sender, instance, origin=None, **kwargs):
+    # The deletion of the road segment bumps both versions once, instead of once per reading
+    if not is_road_segment_deletion(origin):
+        bump_versions('traffic-readings', 'road-segments')
+
+@receiver(post_save, sender=RoadSegments)
+@receiver(post_delete, sender=RoadSegments)
+@receiver(post_save, sender=SegmentCurrentState)
+@receiver(post_delete, sender=SegmentCurrentState)
+def bump_road_segments_version(sender, instance, **kwargs):
+    bump_versions('traffic-readings', 'road-segments')
+
+
+
+## SENSOR API KEYS -------------------------------------------------------------------------------------------------
+# 8 - AN API KEY WAS CREATED, ROTATED, REVOKED OR DELETED (by the command or the admin)
+@receiver(post_save, sender=SensorApiKeys)
+@receiver(post_delete, sender=SensorApiKeys)
+def invalidate_api_key_cache(sender, instance, **kwargs):
+    api_key_cache.invalidate(instance.key_hash)
+
+
+
+## INTENSITY STREAM ------------------------------------------------------------------------------------------------
+# 9 - A TRAFFIC READING WAS WRITTEN: THE NEW STATE OF ITS ROAD SEGMENT IS PUBLISHED ONCE THE WRITE IS COMMITTED
+@receiver(post_save, sender=TrafficReadings)
+def publish_intensity_on_save(sender, instance, created, **kwargs):
+    # A new reading is always the latest one of its road segment, so its state is known without a query
+    if created:
+        segment_id, intensity, speed = instance.road_segment_id_id, get_intensity(instance.speed), instance.speed
+        transaction.on_commit(lambda: get_intensity_hub().publish(segment_id, intensity, speed))
+        return
+    
+    segment_ids = {instance.road_segment_id_id}
+    loaded_values = getattr(instance, '_loaded_values', {})
+    if 'road_segment_id_id' in loaded_values:
+        segment_ids.add(loaded_values['road_segment_id_id'])
+    transaction.on_commit(lambda: publish_segment_states(segment_ids))
+
+@receiver(post_delete, sender=TrafficReadings)
+def publish_intensity_on_delete(sender, instance, origin=None, **kwargs):
+    if not is_road_segment_deletion(origin):
+        segment_ids = {instance.road_segment_id_id}
+        transaction.on_commit(lambda: publish_segment_states(segment_ids))
+
+def publish_segment_states(segment_ids):
+    hub = get_intensity_hub()
+    for segment_id, intensity, speed in SegmentCurrentState.objects.filter(road_segment_id__in=segment_ids).values_list('road_segment_id', 'intensity', 'speed'):
+        hub.publish(segment_id, intensity, speed)
\ No newline at end of file
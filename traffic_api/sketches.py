@@ -0,0 +1,169 @@
+import math
+import struct
+from traffic_monitoring_api.settings import SPEED_SKETCH_COMPRESSION
+
+# Speed statistics of a set of readings that can be updated one reading at a time and merged with the statistics of other
+# sets (other road segments or time buckets): the count, mean and variance are kept with Welford's method, and the
+# percentiles are estimated with a t-digest, which keeps the speeds in at most about SPEED_SKETCH_COMPRESSION clusters
+# (centroids), smaller near the extremes, so a percentile costs the same whatever the number of readings.
+# A sketch is stored in a few hundred bytes to a little over a kilobyte (see to_bytes).
+
+FORMAT_VERSION = 1
+# Version, count, mean, sum of the squared differences to the mean, min and max
+HEADER = struct.Struct('<BQdddd')
+# Mean and weight of a centroid
+CENTROID = struct.Struct('<dI')
+
+
+class SpeedSketch:
+    def __init__(self, compression=SPEED_SKETCH_COMPRESSION):
+        self.compression = compression
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        # Sorted (mean, weight) pairs, and the values added since they were last merged
+        self.centroids = []
+        self.buffer = []
+    
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        
+        self.buffer.append((value, 1))
+        if len(self.buffer) >= 5 * self.compression:
+            self.compress()
+    
+    # Add the readings of another sketch (Chan's formula for the variance, and the centroids are clustered again)
+    def merge(self, other):
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        
+        self.buffer.extend(other.centroids)
+        self.buffer.extend(other.buffer)
+        self.compress()
+        return self
+    
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+    
+
+
+    ## T-DIGEST ----------------------------------------------------------------------------------------------------
+    # Scale function of the t-digest (k1): a centroid may cover at most one unit of k, which is steep near the quantiles 0
+    # and 1, so the centroids there hold few readings and the extreme percentiles stay accurate
+    def get_scale(self, quantile):
+        return self.compression / (2 * math.pi) * math.asin(2 * quantile - 1)
+    
+    def get_quantile_limit(self, quantile):
+        k = self.get_scale(quantile) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+    
+    # Merge the buffer into the centroids, in a single pass over the sorted values
+    def compress(self):
+        if not self.buffer:
+            return
+        points = sorted(self.centroids + self.buffer)
+        self.buffer = []
+        
+        centroids = []
+        mean, weight = points[0]
+        cumulative = 0
+        limit = self.get_quantile_limit(0)
+        for point_mean, point_weight in points[1:]:
+            if (cumulative + weight + point_weight) / self.count <= limit:
+                weight += point_weight
+                mean += (point_mean - mean) * point_weight / weight
+            else:
+                centroids.append((mean, weight))
+                cumulative += weight
+                limit = self.get_quantile_limit(cumulative / self.count)
+                mean, weight = point_mean, point_weight
+        centroids.append((mean, weight))
+        self.centroids = centroids
+    
+    # Estimated value at the quantile (between 0 and 1): each centroid stands for the readings around its mean, and the
+    # values are interpolated between the centers of the centroids (and the exact min and max at both ends)
+    def get_quantile(self, quantile):
+        if not self.count:
+            return None
+        self.compress()
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+        
+        target = quantile * self.count
+        first_mean, first_weight = self.centroids[0]
+        if target < first_weight / 2:
+            return self.min + (first_mean - self.min) * target / (first_weight / 2)
+        last_mean, last_weight = self.centroids[-1]
+        if target > self.count - last_weight / 2:
+            return last_mean + (self.max - last_mean) * (target - self.count + last_weight / 2) / (last_weight / 2)
+        
+        center = first_weight / 2
+        for (mean, weight), (next_mean, next_weight) in zip(self.centroids, self.centroids[1:]):
+            next_center = center + (weight + next_weight) / 2
+            if target <= next_center:
+                return mean + (next_mean - mean) * (target - center) / (next_center - center)
+            center = next_center
+        return self.max
+    
+
+
+    ## STORAGE -----------------------------------------------------------------------------------------------------
+    # A header with the Welford statistics, then the centroids (empty for a sketch without readings, a null sketch in the
+    # rollups means a stale one, see rollups.py)
+    def to_bytes(self):
+        if not self.count:
+            return b''
+        self.compress()
+        centroids = b''.join(CENTROID.pack(mean, weight) for mean, weight in self.centroids)
+        return HEADER.pack(FORMAT_VERSION, self.count, self.mean, self.m2, self.min, self.max) + centroids
+    
+    @classmethod
+    def from_bytes(cls, data, compression=SPEED_SKETCH_COMPRESSION):
+        sketch = cls(compression)
+        if not data:
+            return sketch
+        data = bytes(data)
+        version, sketch.count, sketch.mean, sketch.m2, sketch.min, sketch.max = HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise ValueError(f'Unknown speed sketch format version {version}.')
+        sketch.centroids = list(CENTROID.iter_unpack(data[HEADER.size:]))
+        return sketch
+
+
+def merge_sketches(sketches):
+    merged = SpeedSketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+# Statistics of a sketch at the given percentiles (between 0 and 100), as served by the stats endpoints. A stale sketch
+# (None, see rollups.py) has no statistics at all, rather than the ones of part of the readings.
+def get_sketch_stats(sketch, percentiles):
+    if sketch is None or not sketch.count:
+        return {'speed_count': None if sketch is None else 0, 'average_speed': None, 'stddev_speed': None, 'speed_min': None, 'speed_max': None,
+                'percentiles': {f'p{percentile:g}': None for percentile in percentiles}}
+    return {
+        'speed_count': sketch.count,
+        'average_speed': sketch.mean,
+        'stddev_speed': math.sqrt(sketch.variance),
+        'speed_min': sketch.min,
+        'speed_max': sketch.max,
+        'percentiles': {f'p{percentile:g}': sketch.get_quantile(percentile / 100) for percentile in percentiles},
+    }
\ No newline at end of file
@@ -0,0 +1,141 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from traffic_monitoring_api.settings import SPATIAL_INDEX_CELL_SIZE, SPATIAL_INDEX_MAX_AGE, SPATIAL_FILTER_MAX_IDS
+from .models import RoadSegments
+
+EARTH_RADIUS_M = 6371000
+
+
+# In-memory grid index over the bounding boxes of the road segments (no PostGIS needed).
+# Each segment is stored in every grid cell its bounding box overlaps, so a bounding box query only looks at the segments
+# of the cells it covers, and a nearest segment query searches rings of cells around the point.
+class SegmentGridIndex:
+    def __init__(self, segments, cell_size=SPATIAL_INDEX_CELL_SIZE):
+        self.cell_size = cell_size
+        self.lines = {}
+        self.cells = defaultdict(list)
+        
+        for segment_id, long_start, lat_start, long_end, lat_end in segments:
+            self.lines[segment_id] = (long_start, lat_start, long_end, lat_end)
+            min_x, min_y, max_x, max_y = self.get_cell_range(min(long_start, long_end), min(lat_start, lat_end),
+                                                             max(long_start, long_end), max(lat_start, lat_end))
+            for x in range(min_x, max_x + 1):
+                for y in range(min_y, max_y + 1):
+                    self.cells[(x, y)].append(segment_id)
+    
+    def get_cell(self, lon, lat):
+        return (math.floor(lon / self.cell_size), math.floor(lat / self.cell_size))
+    
+    def get_cell_range(self, min_lon, min_lat, max_lon, max_lat):
+        return (*self.get_cell(min_lon, min_lat), *self.get_cell(max_lon, max_lat))
+    
+    # Ids of the segments whose bounding box intersects the given bounding box
+    def query_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        min_x, min_y, max_x, max_y = self.get_cell_range(min_lon, min_lat, max_lon, max_lat)
+        
+        # A large box covers more cells than there are occupied cells, so walk the occupied cells instead
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > len(self.cells):
+            cells = [cell for (x, y), cell in self.cells.items() if min_x <= x <= max_x and min_y <= y <= max_y]
+        else:
+            cells = [self.cells[(x, y)] for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1) if (x, y) in self.cells]
+        
+        found = set()
+        for cell in cells:
+            for segment_id in cell:
+                if segment_id in found:
+                    continue
+                long_start, lat_start, long_end, lat_end = self.lines[segment_id]
+                if (min(long_start, long_end) <= max_lon and max(long_start, long_end) >= min_lon
+                        and min(lat_start, lat_end) <= max_lat and max(lat_start, lat_end) >= min_lat):
+                    found.add(segment_id)
+        return found
+    
+    # The closest segments to a point, as a list of (distance in meters, segment id)
+    def nearest(self, lon, lat, limit=1):
+        if not self.lines:
+            return []
+        center_x, center_y = self.get_cell(lon, lat)
+        max_ring = max(max(abs(x - center_x), abs(y - center_y)) for x, y in self.cells)
+        
+        best = {}
+        for ring in range(max_ring + 1):
+            for x in range(center_x - ring, center_x + ring + 1):
+                for y in range(center_y - ring, center_y + ring + 1):
+                    if max(abs(x - center_x), abs(y - center_y)) != ring:
+                        continue
+                    for segment_id in self.cells.get((x, y), []):
+                        if segment_id not in best:
+                            best[segment_id] = distance_to_segment(lon, lat, *self.lines[segment_id])
+            
+            # Everything outside the rings searched so far is at least `ring` cells away from the point
+            found = sorted((distance, segment_id) for segment_id, distance in best.items())[:limit]
+            if len(found) == limit and found[-1][0] <= ring * self.cell_size * math.pi / 180 * EARTH_RADIUS_M * math.cos(math.radians(lat)):
+                return found
+        return sorted((distance, segment_id) for segment_id, distance in best.items())[:limit]
+
+
+# Distance in meters from a point to a segment, with an equirectangular projection around the point (fine at city scale)
+def distance_to_segment(lon, lat, long_start, lat_start, long_end, lat_end):
+    scale_x = math.cos(math.radians(lat)) * math.pi / 180 * EARTH_RADIUS_M
+    scale_y = math.pi / 180 * EARTH_RADIUS_M
+    start_x, start_y = (long_start - lon) * scale_x, (lat_start - lat) * scale_y
+    end_x, end_y = (long_end - lon) * scale_x, (lat_end - lat) * scale_y
+    
+    delta_x, delta_y = end_x - start_x, end_y - start_y
+    length_squared = delta_x ** 2 + delta_y ** 2
+    position = 0 if length_squared == 0 else max(0, min(1, -(start_x * delta_x + start_y * delta_y) / length_squared))
+    return math.hypot(start_x + position * delta_x, start_y + position * delta_y)
+
+
+# Distance in meters between two points, with the same projection
+def get_distance(lon, lat, other_lon, other_lat):
+    return distance_to_segment(lon, lat, other_lon, other_lat, other_lon, other_lat)
+
+
+
+## SHARED INDEX -----------------------------------------------------------------------------------------------------
+# The index of this process is built on first use and rebuilt after a road segment changes (see signals.py). Changes made by
+# other processes are picked up once the index is older than SPATIAL_INDEX_MAX_AGE seconds.
+_index = None
+_index_built_at = 0
+_index_lock = threading.Lock()
+
+def get_segment_index():
+    global _index, _index_built_at
+    with _index_lock:
+        if _index is None or time.monotonic() - _index_built_at > SPATIAL_INDEX_MAX_AGE:
+            segments = RoadSegments.objects.values_list('id', 'long_start', 'lat_start', 'long_end', 'lat_end').iterator(chunk_size=5000)
+            _index = SegmentGridIndex(segments)
+            _index_built_at = time.monotonic()
+        return _index
+
+def invalidate_segment_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+# Filter of the road segments whose bounding box intersects the given one. The ids found by the index are only sent as a
+# list up to SPATIAL_FILTER_MAX_IDS (one bound parameter each), a larger area is filtered by the coordinates of the segments
+# instead, with the same test as the index (the smallest end is below the maximum, and the largest end above the minimum).
+def get_bbox_filter(min_lon, min_lat, max_lon, max_lat):
+    segment_ids = get_segment_index().query_bbox(min_lon, min_lat, max_lon, max_lat)
+    if len(segment_ids) <= SPATIAL_FILTER_MAX_IDS:
+        return Q(id__in=segment_ids)
+    return ((Q(long_start__lte=max_lon) | Q(long_end__lte=max_lon)) & (Q(long_start__gte=min_lon) | Q(long_end__gte=min_lon))
+            & (Q(lat_start__lte=max_lat) | Q(lat_end__lte=max_lat)) & (Q(lat_start__gte=min_lat) | Q(lat_end__gte=min_lat)))
+
+
+# Parse the ?bbox=minlon,minlat,maxlon,maxlat query parameter
+def parse_bbox(value):
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(number) for number in value.split(','))
+    except ValueError:
+        raise ValidationError({'bbox': 'Expected four numbers: minlon,minlat,maxlon,maxlat.'})
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValidationError({'bbox': 'The minimum longitude and latitude must not be larger than the maximum ones.'})
+    return min_lon, min_lat, max_lon, max_lat
\ No newline at end of file
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import deque
+from asgiref.sync import sync_to_async
+from django.utils.module_loading import import_string
+from traffic_monitoring_api.settings import (STREAM_BROKER, STREAM_CLIENT_BUFFER, STREAM_HEARTBEAT_SECONDS, STREAM_MAX_SECONDS,
+                                             STREAM_MAX_SUBSCRIBERS, STREAM_RETRY_MILLISECONDS)
+from .caching import get_response_cache
+from .models import SegmentCurrentState
+
+# Stream of the intensity changes of the road segments, as server-sent events. The writes publish the new state of their
+# road segment to a broker, and the hub of every process keeps the last known intensity of each segment and forwards only
+# the changes to its subscribers. Each subscriber is an idle coroutine of the ASGI server until an event wakes it up, so
+# the open streams do not query the database (apart from the snapshot sent when they connect or fall behind).
+# The bulk changes made by another process (a load or a rebuild run by a management command) do not go through the broker
+# of the server: they bump a resync version in the response cache, which the hubs check once per heartbeat (so it needs a
+# cache backend shared by the processes, like the response cache itself).
+
+RESYNC_VERSION_KEY = 'traffic_api:stream:resync'
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+
+## BROKERS ---------------------------------------------------------------------------------------------------------
+# Delivers the messages to the hub of this process, in the thread of the write that published them (the default, for a
+# single process deployment)
+class InProcessBroker:
+    def __init__(self):
+        self.handlers = []
+    
+    def subscribe(self, handler):
+        self.handlers.append(handler)
+    
+    def publish(self, message):
+        for handler in self.handlers:
+            handler(message)
+
+# Local stand-in for an external broker (like the pub/sub of Redis): the messages are serialized and delivered by a
+# background thread, so the writes do not wait for the hub. Another broker only needs the same subscribe and publish methods.
+class LocalThreadBroker(InProcessBroker):
+    def __init__(self):
+        super().__init__()
+        self.messages = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='intensity-broker', daemon=True)
+        self.thread.start()
+    
+    def publish(self, message):
+        self.messages.put(json.dumps(message))
+    
+    def run(self):
+        while True:
+            super().publish(json.loads(self.messages.get()))
+            self.messages.task_done()
+    
+    # Wait until the published messages were delivered (for the tests)
+    def join(self):
+        self.messages.join()
+
+
+
+## SUBSCRIBERS -----------------------------------------------------------------------------------------------------
+# Events waiting to be sent to a client. A client that falls more than max_events behind loses them and gets a new snapshot.
+class Subscriber:
+    def __init__(self, max_events=STREAM_CLIENT_BUFFER):
+        self.loop = asyncio.get_running_loop()
+        self.events = deque()
+        self.max_events = max_events
+        self.needs_snapshot = True
+        self.wakeup = asyncio.Event()
+    
+    # Runs in the event loop of the subscriber
+    def put(self, event):
+        if event['type'] == 'resync' or len(self.events) >= self.max_events:
+            self.events.clear()
+            self.needs_snapshot = True
+        else:
+            self.events.append(event)
+        self.wakeup.set()
+    
+    # Wait for an event, at most timeout seconds
+    async def wait(self, timeout):
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.wakeup.clear()
+
+
+
+## HUB -------------------------------------------------------------------------------------------------------------
+class IntensityHub:
+    def __init__(self, broker=None, max_subscribers=STREAM_MAX_SUBSCRIBERS, resync_check_seconds=STREAM_HEARTBEAT_SECONDS):
+        self.broker = broker or import_string(STREAM_BROKER)()
+        self.broker.subscribe(self.receive)
+        self.max_subscribers = max_subscribers
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.intensities = {}
+        self.resync_check_seconds = resync_check_seconds
+        self.resync_checked_at = time.monotonic()
+        self.resync_version = get_response_cache().get(RESYNC_VERSION_KEY)
+    
+    # Publish the current state of a road segment (called after the write was committed)
+    def publish(self, segment_id, intensity, speed):
+        self.broker.publish({'type': 'state', 'id': segment_id, 'intensity': intensity, 'speed': speed})
+    
+    # Send a new snapshot to every client, after a bulk change that did not publish the states (a load or a rebuild), in
+    # this process through the broker and in the others through the resync version
+    def publish_resync(self):
+        self.resync_version = time.time_ns()
+        get_response_cache().set(RESYNC_VERSION_KEY, self.resync_version, None)
+        self.broker.publish({'type': 'resync'})
+    
+    def is_resync_check_due(self):
+        return time.monotonic() - self.resync_checked_at >= self.resync_check_seconds
+    
+    # Resync the clients when another process bumped the resync version (only one stream of the process reads it per period)
+    def check_resync(self):
+        with self.lock:
+            if not self.is_resync_check_due():
+                return
+            self.resync_checked_at = time.monotonic()
+        
+        version = get_response_cache().get(RESYNC_VERSION_KEY)
+        with self.lock:
+            changed = version != self.resync_version
+            self.resync_version = version
+        if changed:
+            self.receive({'type': 'resync'})
+    
+    def receive(self, message):
+        with self.lock:
+            if message['type'] == 'resync':
+                # The known intensities may be stale, so the next snapshot starts over from the database
+                self.intensities.clear()
+            if message['type'] == 'state':
+                previous = self.intensities.get(message['id'])
+                if previous == message['intensity']:
+                    return
+                self.intensities[message['id']] = message['intensity']
+                event = {**message, 'type': 'intensity', 'previous_intensity': previous}
+            else:
+                event = message
+            subscribers = {loop: list(loop_subscribers) for loop, loop_subscribers in self.subscribers.items()}
+        
+        # A single callback per event loop, which wakes up its subscribers
+        for loop, loop_subscribers in subscribers.items():
+            try:
+                loop.call_soon_threadsafe(deliver, loop_subscribers, event)
+            except RuntimeError:
+                pass
+    
+    def subscribe(self):
+        subscriber = Subscriber()
+        with self.lock:
+            if sum(len(loop_subscribers) for loop_subscribers in self.subscribers.values()) >= self.max_subscribers:
+                raise TooManySubscribers()
+            self.subscribers.setdefault(subscriber.loop, set()).add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            loop_subscribers = self.subscribers.get(subscriber.loop, set())
+            loop_subscribers.discard(subscriber)
+            if not loop_subscribers:
+                self.subscribers.pop(subscriber.loop, None)
+    
+    def get_subscriber_count(self):
+        with self.lock:
+            return sum(len(loop_subscribers) for loop_subscribers in self.subscribers.values())
+    
+    # Current intensity of every road segment (a single query). The segments the hub has not heard of yet start from it,
+    # while the ones it already knows keep the intensity of their latest event, which may be more recent than the query.
+    def get_snapshot(self):
+        states = SegmentCurrentState.objects.order_by('road_segment_id').values_list('road_segment_id', 'intensity', 'speed')
+        segments = [{'id': segment_id, 'intensity': intensity, 'speed': speed} for segment_id, intensity, speed in states]
+        with self.lock:
+            for segment in segments:
+                self.intensities.setdefault(segment['id'], segment['intensity'])
+        return segments
+
+def deliver(subscribers, event):
+    for subscriber in subscribers:
+        subscriber.put(event)
+
+
+# One hub per process, created by the first write or stream
+_hub = None
+_hub_lock = threading.Lock()
+
+def get_intensity_hub():
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = IntensityHub()
+        return _hub
+
+
+
+## SERVER-SENT EVENTS ----------------------------------------------------------------------------------------------
+def format_event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+def get_snapshot_event(hub):
+    return format_event('snapshot', {'segments': hub.get_snapshot()})
+
+# Events of a subscriber: the snapshot, then the intensity changes, with a comment every heartbeat seconds to keep the
+# connection open through proxies. The stream ends after max_seconds (the browser reconnects and gets a new snapshot), so
+# the clients that went away without the server noticing do not stay subscribed forever.
+async def stream_events(hub, subscriber, heartbeat=STREAM_HEARTBEAT_SECONDS, max_seconds=STREAM_MAX_SECONDS):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_seconds
+    try:
+        yield f'retry: {STREAM_RETRY_MILLISECONDS}\n\n'
+        while loop.time() < deadline:
+            if subscriber.needs_snapshot:
+                subscriber.needs_snapshot = False
+                yield await sync_to_async(get_snapshot_event)(hub)
+            
+            if subscriber.events:
+                while subscriber.events:
+                    event = subscriber.events.popleft()
+                    yield format_event('intensity', {key: value for key, value in event.items() if key != 'type'})
+            elif not subscriber.needs_snapshot:
+                await subscriber.wait(min(heartbeat, max(deadline - loop.time(), 0)))
+                if hub.is_resync_check_due():
+                    await sync_to_async(hub.check_resync, thread_sensitive=False)()
+                    # The resync event is delivered by a callback of this event loop
+                    await asyncio.sleep(0)
+                if not (subscriber.events or subscriber.needs_snapshot):
+                    yield ': heartbeat\n\n'
+    finally:
+        hub.unsubscribe(subscriber)
\ No newline at end of file
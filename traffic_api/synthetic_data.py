@@ -0,0 +1,124 @@
+import math
+import random
+import uuid
+from datetime import timedelta
+from itertools import islice
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from .data_loader import SEGMENT_COLUMNS, READING_COLUMNS, SENSOR_COLUMNS, copy_rows, insert_rows, can_copy
+from .models import RoadSegments, TrafficReadings, Sensors, Cars, SensorReadings
+
+# Number of rows generated per table at each scale (the name is the rough total number of rows)
+SCALES = {
+    '10k': {'segments': 200, 'readings': 5000, 'sensors': 20, 'cars': 800, 'sensor_readings': 4000},
+    '1m': {'segments': 5000, 'readings': 500000, 'sensors': 200, 'cars': 40000, 'sensor_readings': 455000},
+    '10m': {'segments': 20000, 'readings': 5000000, 'sensors': 500, 'cars': 400000, 'sensor_readings': 4580000},
+}
+
+CAR_COLUMNS = ['id', 'car_license_plate', 'created_at']
+SENSOR_READING_COLUMNS = ['id', 'road_segment_id_id', 'car_license_plate_id', 'timestamp', 'sensor_uuid_id']
+
+# The road segments are spread around the centre of Chengdu, where the traffic_speed_data dataset comes from
+CITY_CENTER = (104.06, 30.66)
+CITY_RADIUS = 0.15
+METERS_PER_DEGREE = 111320
+
+
+## GENERATORS ------------------------------------------------------------------------------------------------------
+# Every generator yields table rows in the column order above, with ids starting after the highest id already stored
+
+# Short straight segments of 50 to 800 meters in a random direction
+def generate_segments(rng, count, first_id):
+    for segment_id in range(first_id, first_id + count):
+        long_start = CITY_CENTER[0] + rng.uniform(-CITY_RADIUS, CITY_RADIUS)
+        lat_start = CITY_CENTER[1] + rng.uniform(-CITY_RADIUS, CITY_RADIUS)
+        length = rng.uniform(50, 800)
+        angle = rng.uniform(0, 2 * math.pi)
+        long_end = long_start + length * math.cos(angle) / (METERS_PER_DEGREE * math.cos(math.radians(lat_start)))
+        lat_end = lat_start + length * math.sin(angle) / METERS_PER_DEGREE
+        yield (segment_id, long_start, lat_start, long_end, lat_end, round(length, 1))
+
+# Each road segment has its own typical speed, and the readings of the last week vary around it
+def generate_readings(rng, count, first_id, segment_ids, now):
+    typical_speeds = {segment_id: rng.uniform(10, 70) for segment_id in segment_ids}
+    for reading_id in range(first_id, first_id + count):
+        segment_id = rng.choice(segment_ids)
+        speed = round(max(0.0, rng.gauss(typical_speeds[segment_id], 10)), 2)
+        yield (reading_id, speed, segment_id, now - timedelta(seconds=rng.uniform(0, 7 * 24 * 3600)))
+
+def generate_sensors(rng, count, first_id):
+    for sensor_id in range(first_id, first_id + count):
+        yield (sensor_id, f'Sensor {sensor_id}', str(uuid.UUID(int=rng.getrandbits(128))))
+
+# Unique plates in the AA11AA format, skipping the plates of the cars already stored
+def get_license_plate(number):
+    number, digits = divmod(number, 100)
+    letters = ''
+    for _ in range(4):
+        number, letter = divmod(number, 26)
+        letters += chr(ord('A') + letter)
+    return f'{letters[:2]}{digits:02d}{letters[2:]}'
+
+def generate_cars(rng, count, first_id, now, used_plates):
+    number = 0
+    for car_id in range(first_id, first_id + count):
+        while get_license_plate(number) in used_plates:
+            number += 1
+        yield (car_id, get_license_plate(number), now - timedelta(days=rng.uniform(1, 30)))
+        number += 1
+
+# The cars drive trips of consecutive road segments during the last day, seen by a sensor on every segment
+def generate_sensor_readings(rng, count, first_id, segment_ids, car_ids, sensor_ids, now):
+    reading_id = first_id
+    while reading_id < first_id + count:
+        car_id = rng.choice(car_ids)
+        position = rng.randrange(len(segment_ids))
+        timestamp = now - timedelta(seconds=rng.uniform(3600, 24 * 3600))
+        for _ in range(min(rng.randint(3, 30), first_id + count - reading_id)):
+            yield (reading_id, segment_ids[position], car_id, timestamp, rng.choice(sensor_ids))
+            reading_id += 1
+            position = (position + rng.randint(1, 5)) % len(segment_ids)
+            timestamp += timedelta(seconds=rng.uniform(20, 300))
+
+
+
+## LOADING ---------------------------------------------------------------------------------------------------------
+def get_next_id(model):
+    return (model.objects.aggregate(highest_id=Max('id'))['highest_id'] or 0) + 1
+
+def write_in_chunks(model, columns, rows, write_rows, chunk_size, progress=None):
+    total = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return total
+        with transaction.atomic():
+            write_rows(model, columns, chunk)
+        total += len(chunk)
+        if progress:
+            progress(model, total)
+
+# Add a reproducible synthetic dataset (the same seed gives the same rows) next to the rows already stored, at one of
+# the SCALES or with explicit counts per table. Like the CSV loader, the rows are written in chunks with COPY on
+# PostgreSQL or bulk INSERT statements elsewhere, so call refresh_derived_data() afterwards.
+def generate_synthetic_data(scale='10k', counts=None, seed=0, chunk_size=10000, use_copy=True, progress=None):
+    counts = dict(SCALES[scale], **(counts or {}))
+    write_rows = copy_rows if use_copy and can_copy() else insert_rows
+    rng = random.Random(seed)
+    now = timezone.now()
+    
+    first_ids = {model: get_next_id(model) for model in [RoadSegments, TrafficReadings, Sensors, Cars, SensorReadings]}
+    segment_ids = list(range(first_ids[RoadSegments], first_ids[RoadSegments] + counts['segments']))
+    sensor_ids = list(range(first_ids[Sensors], first_ids[Sensors] + counts['sensors']))
+    car_ids = list(range(first_ids[Cars], first_ids[Cars] + counts['cars']))
+    
+    tables = [
+        (RoadSegments, SEGMENT_COLUMNS, generate_segments(rng, counts['segments'], first_ids[RoadSegments])),
+        (TrafficReadings, READING_COLUMNS, generate_readings(rng, counts['readings'], first_ids[TrafficReadings], segment_ids, now)),
+        (Sensors, SENSOR_COLUMNS, generate_sensors(rng, counts['sensors'], first_ids[Sensors])),
+        (Cars, CAR_COLUMNS, generate_cars(rng, counts['cars'], first_ids[Cars], now, set(Cars.objects.values_list('car_license_plate', flat=True)))),
+        (SensorReadings, SENSOR_READING_COLUMNS, generate_sensor_readings(rng, counts['sensor_readings'], first_ids[SensorReadings],
+                                                                         segment_ids, car_ids, sensor_ids, now)),
+    ]
+    return {model: write_in_chunks(model, columns, rows, write_rows, chunk_size, progress) for model, columns, rows in tables}
\ No newline at end of file
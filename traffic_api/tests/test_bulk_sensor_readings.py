@@ -0,0 +1,86 @@
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.models import RoadSegments, Sensors, Cars, SensorReadings
+from traffic_api.deduplication import recent_passes
+import json
+
+
+User = get_user_model()
+
+class BulkSensorReadingsTestCase(APITestCase):
+    def setUp(self):
+        # Authenticate as the admin
+        self.admin_user = User.objects.create_user(username="test_admin_user", password="test_admin_password")
+        self.admin_user.is_staff = True   # Assign admin role
+        self.admin_user.save()
+        self.client.force_authenticate(user=self.admin_user)
+        recent_passes.clear()
+        
+        self.road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        self.sensor = Sensors.objects.create(name="Test Sensor", uuid="270e4cc0-d454-4b42-8682-80e87c3d163c")
+        self.url = reverse('bulk-create-sensor-readings')
+    
+    def reading(self, car_license_plate, timestamp="2023-11-20T10:00:00Z"):
+        return {"car_license_plate": car_license_plate, "timestamp": timestamp,
+                "road_segment_id": self.road_segment.id, "sensor_uuid": self.sensor.id}
+
+## Tests for the bulk sensor readings endpoint
+# Test 1 - Can the admin user create a batch of sensor readings (sent as a JSON array)?
+class TestBulkCreateJSON(BulkSensorReadingsTestCase):
+    def test_bulk_create_sensor_readings_json(self):
+        Cars.objects.create(car_license_plate="AA11AA", created_at="2023-11-19T10:00:00Z")
+        readings = [self.reading("AA11AA"), self.reading("BB22BB"), self.reading("BB22BB", "2023-11-20T09:00:00Z")]
+        response = self.client.post(self.url, readings, format="json")
+        
+        # Assert that every reading was created, and that the new car was created only once
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(SensorReadings.objects.count(), 3)
+        self.assertEqual(Cars.objects.count(), 2)
+        
+        # Assert that the device timestamps are kept, and that a new car takes the timestamp of its first reading
+        self.assertEqual(Cars.objects.get(car_license_plate="BB22BB").created_at.hour, 9)
+
+# Test 2 - Is a batch sent as NDJSON accepted?
+class TestBulkCreateNDJSON(BulkSensorReadingsTestCase):
+    def test_bulk_create_sensor_readings_ndjson(self):
+        body = "\n".join(json.dumps(self.reading(plate)) for plate in ["AA11AA", "BB22BB"]) + "\n"
+        response = self.client.post(self.url, body, content_type="application/x-ndjson")
+        
+        # Assert that both readings were created
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SensorReadings.objects.count(), 2)
+
+# Test 3 - Are invalid rows reported without aborting the rest of the batch?
+class TestBulkCreatePartialErrors(BulkSensorReadingsTestCase):
+    def test_bulk_create_sensor_readings_partial_errors(self):
+        invalid_segment = dict(self.reading("CC33CC"), road_segment_id=self.road_segment.id + 1)
+        readings = [self.reading("AA11AA"), {"car_license_plate": "TOOLONG1"}, invalid_segment]
+        response = self.client.post(self.url, readings, format="json")
+        
+        # Assert that only the valid row was created, and that the errors point to the rows 1 and 2
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('road_segment_id', response.data['errors'][1]['errors'])
+        self.assertFalse(Cars.objects.filter(car_license_plate="CC33CC").exists())
+
+# Test 4 - Does the number of queries stay the same no matter the batch size?
+class TestBulkCreateQueryCount(BulkSensorReadingsTestCase):
+    def test_bulk_create_sensor_readings_query_count(self):
+        # Segment and sensor lookups, car lookup, car insert and re-select, readings insert, plus the two savepoint statements of the transaction
+        readings = [self.reading(f"AA{i:02d}AA") for i in range(50)]
+        with self.assertNumQueries(8):
+            self.client.post(self.url, readings, format="json")
+        self.assertEqual(SensorReadings.objects.count(), 50)
+
+# Test 5 - Can an anonymous user create a batch of sensor readings?
+class TestBulkCreateAnonymous(BulkSensorReadingsTestCase):
+    def test_anonymous_user_bulk_create_sensor_readings(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.post(self.url, [self.reading("AA11AA")], format="json")
+        
+        # Assert that anonymous users can not create sensor readings (status code 403 Forbidden)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
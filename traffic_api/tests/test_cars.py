@@ -0,0 +1,68 @@
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.models import RoadSegments, Sensors, Cars, SensorReadings
+
+
+class CarsTestCase(APITestCase):
+    def setUp(self):
+        self.road_segments = [RoadSegments.objects.create(long_start=i, lat_start=0, long_end=i + 1, lat_end=1, length=10) for i in range(3)]
+        self.sensors = [Sensors.objects.create(name=f"Sensor {i}", uuid=f"270e4cc0-d454-4b42-8682-80e87c3d163{i}") for i in range(2)]
+        self.car = Cars.objects.create(car_license_plate="AA11AA", created_at=timezone.now())
+        Cars.objects.create(car_license_plate="AA22BB", created_at=timezone.now())
+        Cars.objects.create(car_license_plate="CC33AA", created_at=timezone.now())
+        
+        # Recent readings on every road segment, and one older reading
+        now = timezone.now()
+        for i, road_segment in enumerate(self.road_segments):
+            SensorReadings.objects.create(car_license_plate=self.car, road_segment_id=road_segment,
+                                          sensor_uuid=self.sensors[i % 2], timestamp=now - timedelta(minutes=10 * i))
+        SensorReadings.objects.create(car_license_plate=self.car, road_segment_id=self.road_segments[0],
+                                      sensor_uuid=self.sensors[0], timestamp=now - timedelta(hours=30))
+
+## Tests for the car endpoints
+# Test 1 - Does a car lookup return only the car with that exact plate, even when other plates contain it?
+class TestCarDetailsExactPlate(CarsTestCase):
+    def test_car_details_exact_plate(self):
+        response = self.client.get(reverse('individual-car', args=["AA11AA"]))
+        
+        # Assert that the car and its readings of the last 24 hours are returned, with their distinct segments and sensors
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([car['car_license_plate'] for car in response.data['car']], ["AA11AA"])
+        self.assertEqual(len(response.data['sensor_readings']), 3)
+        self.assertEqual([segment['id'] for segment in response.data['road_segments']], [segment.id for segment in self.road_segments])
+        self.assertEqual(len(response.data['sensors']), 2)
+        
+        # Assert that a partial plate is not found
+        response = self.client.get(reverse('individual-car', args=["AA1"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+# Test 2 - Does ?hours= widen the time window, and is an invalid value rejected?
+class TestCarDetailsHours(CarsTestCase):
+    def test_car_details_hours(self):
+        url = reverse('individual-car', args=["AA11AA"])
+        response = self.client.get(url, {'hours': 48})
+        self.assertEqual(len(response.data['sensor_readings']), 4)
+        
+        for invalid_hours in ["0", "abc", "-5"]:
+            response = self.client.get(url, {'hours': invalid_hours})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+# Test 3 - Does the number of queries of the car details stay the same no matter how many readings the car has?
+class TestCarDetailsQueryCount(CarsTestCase):
+    def test_car_details_query_count(self):
+        # Car lookup, then the readings together with their segments and sensors
+        with self.assertNumQueries(2):
+            self.client.get(reverse('individual-car', args=["AA11AA"]))
+
+# Test 4 - Can the cars be looked up by exact plate, plate prefix and partial plate?
+class TestCarsPlateLookups(CarsTestCase):
+    def test_cars_plate_lookups(self):
+        url = reverse('all-cars')
+        plates = lambda params: sorted(car['car_license_plate'] for car in self.client.get(url, params).data['results'])
+        
+        self.assertEqual(plates({'plate': "AA11AA"}), ["AA11AA"])
+        self.assertEqual(plates({'plate_prefix': "AA"}), ["AA11AA", "AA22BB"])
+        self.assertEqual(plates({'search': "aa"}), ["AA11AA", "AA22BB", "CC33AA"])
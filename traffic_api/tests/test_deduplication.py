@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_monitoring_api.settings import IDEMPOTENCY_CACHE_ALIAS
+from traffic_api.deduplication import BloomFilter, RecentPassesFilter, recent_passes, get_pass_key
+from traffic_api.models import RoadSegments, Sensors, Cars, SensorReadings
+
+
+User = get_user_model()
+
+class DeduplicationTestCase(APITestCase):
+    def setUp(self):
+        recent_passes.clear()
+        caches[IDEMPOTENCY_CACHE_ALIAS].clear()
+        self.admin_user = User.objects.create_user(username="test_admin_user", password="test_admin_password", is_staff=True)
+        self.client.force_authenticate(user=self.admin_user)
+        
+        self.road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        self.sensor = Sensors.objects.create(name="Test Sensor", uuid="270e4cc0-d454-4b42-8682-80e87c3d163c")
+        Cars.objects.create(car_license_plate="AA11AA", created_at="2023-11-19T10:00:00Z")
+    
+    def reading(self, car_license_plate="AA11AA", timestamp="2023-11-20T10:00:00Z"):
+        return {"car_license_plate": car_license_plate, "timestamp": timestamp,
+                "road_segment_id": self.road_segment.id, "sensor_uuid": self.sensor.id}
+    
+    def post_batch(self, readings, **headers):
+        return self.client.post(reverse('bulk-create-sensor-readings'), readings, format="json", **headers)
+
+## Tests for the deduplication of the sensor readings
+# Test 1 - Is the timestamp of the device kept, and does the same pass sent again get the stored reading back?
+class TestSingleCreate(DeduplicationTestCase):
+    def test_duplicate_pass(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('create-sensor-reading'), self.reading(), format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SensorReadings.objects.get().timestamp.isoformat(), "2023-11-20T10:00:00+00:00")
+        
+        response = self.client.post(reverse('create-sensor-reading'), self.reading(), format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['car_license_plate'], "AA11AA")
+        self.assertEqual(SensorReadings.objects.count(), 1)
+    
+    # Like a retry sent to another process, whose filter has not seen the pass
+    def test_unique_constraint(self):
+        self.client.post(reverse('create-sensor-reading'), self.reading(), format="json")
+        recent_passes.clear()
+        response = self.client.post(reverse('create-sensor-reading'), self.reading(), format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(SensorReadings.objects.count(), 1)
+
+# Test 2 - Does a retried batch write nothing, with a single lookup for its passes?
+class TestBulkRetry(DeduplicationTestCase):
+    def test_retried_batch(self):
+        readings = [self.reading(), self.reading("BB22BB"), self.reading("BB22BB")]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post_batch(readings)
+        self.assertEqual((response.data['created'], response.data['duplicates']), (2, 1))
+        
+        # Segment and sensor lookups, and the lookup of the passes the filter has seen
+        with self.assertNumQueries(3):
+            response = self.post_batch(readings)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['duplicates']), (0, 3))
+        self.assertEqual(SensorReadings.objects.count(), 2)
+    
+    # Like a retry sent to another process, whose filter has not seen the passes: the conflicts are still counted as duplicates
+    def test_unique_constraint(self):
+        self.post_batch([self.reading()])
+        recent_passes.clear()
+        response = self.post_batch([self.reading(), self.reading(timestamp="2023-11-20T10:01:00Z")])
+        self.assertEqual((response.data['created'], response.data['duplicates']), (1, 1))
+        self.assertEqual(SensorReadings.objects.count(), 2)
+    
+    # A batch that is rolled back is not remembered by the filter, so sending it again costs no lookup
+    def test_rolled_back_batch(self):
+        with transaction.atomic():
+            self.post_batch([self.reading()])
+            transaction.set_rollback(True)
+        self.assertFalse(recent_passes.may_contain(get_pass_key(self.sensor.id, "AA11AA", parse_datetime("2023-11-20T10:00:00Z"))))
+
+# Test 3 - Does a request sent again with its Idempotency-Key get the first response, without querying the database?
+class TestIdempotencyKey(DeduplicationTestCase):
+    def test_replayed_response(self):
+        first_response = self.post_batch([self.reading()], HTTP_IDEMPOTENCY_KEY="upload-1")
+        
+        with self.assertNumQueries(0):
+            response = self.post_batch([self.reading()], HTTP_IDEMPOTENCY_KEY="upload-1")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, first_response.data)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        
+        # Assert that the key can not be reused for another payload, and that it is only valid for the same user
+        response = self.post_batch([self.reading("BB22BB")], HTTP_IDEMPOTENCY_KEY="upload-1")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.client.force_authenticate(user=User.objects.create_user(username="other_admin_user", is_staff=True))
+        response = self.post_batch([self.reading("BB22BB")], HTTP_IDEMPOTENCY_KEY="upload-1")
+        self.assertEqual(response.data['created'], 1)
+
+## Tests for the Bloom filter
+# Test 4 - Are the added keys always found, with a false positive rate close to the expected one, and are the old ones forgotten?
+class TestBloomFilter(APITestCase):
+    def test_false_positives(self):
+        bloom_filter = BloomFilter(capacity=10000, error_rate=0.01)
+        for index in range(10000):
+            bloom_filter.add(f'added-{index}')
+        
+        self.assertTrue(all(f'added-{index}' in bloom_filter for index in range(10000)))
+        false_positives = sum(f'other-{index}' in bloom_filter for index in range(10000))
+        self.assertLess(false_positives, 200)
+    
+    def test_generations(self):
+        passes_filter = RecentPassesFilter(capacity=100, error_rate=0.001)
+        passes_filter.add_many(f'pass-{index}' for index in range(250))
+        
+        self.assertTrue(all(passes_filter.may_contain(f'pass-{index}') for index in range(100, 250)))
+        self.assertLess(sum(passes_filter.may_contain(f'pass-{index}') for index in range(100)), 5)
\ No newline at end of file
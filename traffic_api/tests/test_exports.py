@@ -0,0 +1,60 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.models import RoadSegments, TrafficReadings, Sensors, Cars, SensorReadings
+import json
+
+
+class ExportsTestCase(APITestCase):
+    def setUp(self):
+        self.road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        self.other_road_segment = RoadSegments.objects.create(long_start=1, lat_start=1, long_end=2, lat_end=2, length=20)
+        TrafficReadings.objects.create(speed=10, road_segment_id=self.road_segment)
+        TrafficReadings.objects.create(speed=60, road_segment_id=self.other_road_segment)
+    
+    def export(self, resource, file_format, query=''):
+        response = self.client.get(reverse('export', args=[resource, file_format]) + query)
+        return response, b''.join(response.streaming_content).decode()
+
+## Tests for the streaming exports
+# Test 1 - Is the NDJSON export streamed with one object per row?
+class TestNDJSONExport(ExportsTestCase):
+    def test_ndjson_export(self):
+        response, content = self.export('traffic-readings', 'ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([row['speed'] for row in rows], [10, 60])
+        self.assertEqual(set(rows[0]), {'id', 'speed', 'road_segment_id', 'recorded_at'})
+
+# Test 2 - Does the CSV export have a header and respect the road segment filter?
+class TestCSVExport(ExportsTestCase):
+    def test_csv_export_with_segment_filter(self):
+        response, content = self.export('road-segments', 'csv', f'?road_segment={self.other_road_segment.id}')
+        
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(content.splitlines(), ['id,long_start,lat_start,long_end,lat_end,length', f'{self.other_road_segment.id},1.0,1.0,2.0,2.0,20.0'])
+
+# Test 3 - Can the sensor readings be exported within a time window?
+class TestTimeFilteredExport(ExportsTestCase):
+    def test_sensor_readings_time_filter(self):
+        sensor = Sensors.objects.create(name="Test Sensor", uuid="270e4cc0-d454-4b42-8682-80e87c3d163c")
+        car = Cars.objects.create(car_license_plate="AA11AA", created_at="2023-11-20T08:00:00Z")
+        for hour in [9, 10, 11]:
+            SensorReadings.objects.create(road_segment_id=self.road_segment, car_license_plate=car, sensor_uuid=sensor,
+                                          timestamp=f"2023-11-20T{hour:02d}:00:00Z")
+        
+        response, content = self.export('sensor-readings', 'ndjson', '?from=2023-11-20T10:00:00Z&to=2023-11-20T11:00:00Z')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['timestamp'] for row in rows], ['2023-11-20T10:00:00Z'])
+
+# Test 4 - Are unknown exports and invalid filters rejected?
+class TestInvalidExports(ExportsTestCase):
+    def test_invalid_exports(self):
+        self.assertEqual(self.client.get(reverse('export', args=['cars', 'csv'])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('export', args=['road-segments', 'csv']) + '?from=2023-11-20T10:00:00Z').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('export', args=['sensor-readings', 'csv']) + '?road_segment=a').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('export', args=['sensor-readings', 'csv']) + '?from=2023-11-21T00:00:00Z&to=2023-11-20T00:00:00Z').status_code,
+                         status.HTTP_400_BAD_REQUEST)
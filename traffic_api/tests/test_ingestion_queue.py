@@ -0,0 +1,108 @@
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.ingestion_queue import SensorReadingsWriter, IngestionQueueFull
+import threading
+
+
+User = get_user_model()
+
+# Writer that records the batches instead of inserting them, and that can be held to fill the queue
+class RecordingWriter:
+    def __init__(self):
+        self.batches = []
+        self.released = threading.Event()
+        self.released.set()
+    
+    def __call__(self, rows):
+        self.released.wait()
+        self.batches.append([row for _, row in rows])
+        return [row for _, row in rows], {}
+
+def make_rows(total):
+    return [{'car_license_plate': f"AA{i:02d}AA", 'timestamp': "2023-11-20T10:00:00Z", 'road_segment_id': 1, 'sensor_uuid': 1} for i in range(total)]
+
+## Tests for the background writer of the ingestion queue
+class TestSensorReadingsWriter(APITestCase):
+    # Test 1 - Are the queued rows written in batches of at most batch_size rows?
+    def test_micro_batches(self):
+        recorder = RecordingWriter()
+        recorder.released.clear()
+        writer = SensorReadingsWriter(writer=recorder, batch_size=3, flush_interval=0.05)
+        writer.submit(make_rows(7))
+        recorder.released.set()
+        writer.flush()
+        
+        self.assertEqual(sum(len(batch) for batch in recorder.batches), 7)
+        self.assertTrue(all(len(batch) <= 3 for batch in recorder.batches))
+        self.assertEqual(writer.get_stats()['written'], 7)
+        self.assertEqual(writer.get_stats()['queued'], 0)
+        writer.stop()
+    
+    # Test 2 - Are the rows of a request refused as a whole when they do not fit in the queue?
+    def test_backpressure(self):
+        recorder = RecordingWriter()
+        recorder.released.clear()
+        writer = SensorReadingsWriter(writer=recorder, max_rows=5, flush_interval=0.05)
+        writer.submit(make_rows(3))
+        
+        with self.assertRaises(IngestionQueueFull):
+            writer.submit(make_rows(3))
+        
+        recorder.released.set()
+        writer.flush()
+        writer.submit(make_rows(3))
+        writer.flush()
+        self.assertEqual(writer.get_stats()['accepted'], 6)
+        writer.stop()
+    
+    # Test 3 - Are the rows still in the queue written when the writer is stopped?
+    def test_stop_flushes_queue(self):
+        recorder = RecordingWriter()
+        writer = SensorReadingsWriter(writer=recorder, batch_size=2, flush_interval=0.05)
+        writer.submit(make_rows(5))
+        writer.stop()
+        
+        self.assertEqual(sum(len(batch) for batch in recorder.batches), 5)
+        self.assertFalse(writer.thread.is_alive())
+
+## Tests for the queued ingestion endpoint
+class TestIngestSensorReadings(APITestCase):
+    def setUp(self):
+        # Authenticate as the admin
+        self.admin_user = User.objects.create_user(username="test_admin_user", password="test_admin_password")
+        self.admin_user.is_staff = True   # Assign admin role
+        self.admin_user.save()
+        self.client.force_authenticate(user=self.admin_user)
+        self.url = reverse('ingest-sensor-readings')
+    
+    # Test 4 - Are the valid rows acknowledged with a 202 and handed to the writer?
+    def test_ingest_accepted(self):
+        recorder = RecordingWriter()
+        writer = SensorReadingsWriter(writer=recorder, flush_interval=0.05)
+        with mock.patch('traffic_api.views.get_ingestion_writer', return_value=writer):
+            response = self.client.post(self.url, make_rows(2) + [{'car_license_plate': "TOOLONG1"}], format="json")
+        writer.stop()
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['accepted'], 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [2])
+        self.assertEqual([row['car_license_plate'] for batch in recorder.batches for row in batch], ["AA00AA", "AA01AA"])
+    
+    # Test 5 - Does a full queue answer with a 429?
+    def test_ingest_queue_full(self):
+        writer = SensorReadingsWriter(writer=RecordingWriter(), max_rows=1)
+        with mock.patch('traffic_api.views.get_ingestion_writer', return_value=writer):
+            response = self.client.post(self.url, make_rows(2), format="json")
+        writer.stop()
+        
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+    
+    # Test 6 - Can an anonymous user queue sensor readings?
+    def test_ingest_anonymous(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.post(self.url, make_rows(1), format="json")
+        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
\ No newline at end of file
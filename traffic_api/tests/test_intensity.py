@@ -0,0 +1,51 @@
+from unittest import mock
+from django.db.models import Count
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api import traffic_api_helpers
+from traffic_api.models import RoadSegments, TrafficReadings
+from traffic_api.traffic_api_helpers import get_intensity, intensity_case, classify_speeds
+
+
+SPEEDS = [None, 0, 19.9, 20, 20.1, 35, 50, 50.1, 120]
+
+class IntensityTestCase(APITestCase):
+    def setUp(self):
+        self.road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        TrafficReadings.objects.bulk_create([TrafficReadings(speed=speed, road_segment_id=self.road_segment) for speed in SPEEDS])
+
+## Tests for the intensity classification
+# Test 1 - Does the database classification match get_intensity?
+class TestDatabaseClassification(IntensityTestCase):
+    def test_intensity_case_matches_get_intensity(self):
+        readings = TrafficReadings.objects.annotate(intensity_level=intensity_case()).order_by('id')
+        self.assertEqual([reading.intensity_level for reading in readings], [get_intensity(speed) for speed in SPEEDS])
+        
+        # The classification can also be grouped and counted by the database
+        totals = dict(TrafficReadings.objects.annotate(intensity_level=intensity_case())
+                      .values_list('intensity_level').annotate(total=Count('id')))
+        self.assertEqual(totals, {'No Data': 1, 'High': 3, 'Medium': 3, 'Low': 2})
+
+# Test 2 - Does the batch classification match get_intensity, with and without NumPy?
+class TestBatchClassification(IntensityTestCase):
+    def test_classify_speeds(self):
+        speeds = SPEEDS * 10
+        expected = [get_intensity(speed) for speed in speeds]
+        
+        self.assertEqual(classify_speeds(speeds), expected)
+        with mock.patch.object(traffic_api_helpers, 'numpy', None):
+            self.assertEqual(classify_speeds(speeds), expected)
+
+# Test 3 - Can the traffic readings be filtered with ?intensity=?
+class TestIntensityParameter(IntensityTestCase):
+    def test_intensity_parameter(self):
+        response = self.client.get(reverse('all-traffic-readings') + '?intensity=high,no-data')
+        self.assertEqual(sorted(reading['intensity'] for reading in response.data['results']), ['High', 'High', 'High', 'No Data'])
+        
+        response = self.client.get(reverse('medium-intensity-traffic-readings'))
+        self.assertEqual([reading['speed'] for reading in response.data['results']], [20.1, 35, 50])
+    
+    def test_invalid_intensity_parameter(self):
+        response = self.client.get(reverse('all-road-segments') + '?intensity=extreme')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
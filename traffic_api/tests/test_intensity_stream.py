@@ -0,0 +1,150 @@
+import asyncio
+import json
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.models import RoadSegments, TrafficReadings
+from traffic_monitoring_api.settings import STREAM_RETRY_MILLISECONDS
+from traffic_api.streaming import IntensityHub, InProcessBroker, LocalThreadBroker, get_intensity_hub, stream_events
+
+
+def parse_events(text):
+    events = []
+    for block in text.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class IntensityStreamTestCase(APITestCase):
+    def setUp(self):
+        self.segment = RoadSegments.objects.create(long_start=103.9, lat_start=30.6, long_end=104.0, lat_end=30.7, length=100)
+        TrafficReadings.objects.create(road_segment_id=self.segment, speed=10)
+        
+        # Messages published to the hub of this process
+        self.messages = []
+        handlers = get_intensity_hub().broker.handlers
+        handlers.append(self.messages.append)
+        self.addCleanup(handlers.remove, self.messages.append)
+
+## Tests for the hub
+# Test 1 - Are only the intensity changes forwarded to the subscribers, does a slow subscriber get a new snapshot instead, and
+# is a closed stream unsubscribed?
+class TestIntensityHub(IntensityStreamTestCase):
+    def test_changes_only(self):
+        async def run():
+            hub = IntensityHub(broker=InProcessBroker())
+            subscriber = hub.subscribe()
+            for speed in [10, 15, 30, 60]:
+                hub.publish(1, 'High' if speed < 20 else 'Medium' if speed < 50 else 'Low', speed)
+            await asyncio.sleep(0)
+            return [(event['intensity'], event['previous_intensity']) for event in subscriber.events]
+        
+        self.assertEqual(asyncio.run(run()), [('High', None), ('Medium', 'High'), ('Low', 'Medium')])
+    
+    def test_slow_subscriber(self):
+        async def run():
+            hub = IntensityHub(broker=InProcessBroker())
+            subscriber = hub.subscribe()
+            subscriber.needs_snapshot = False
+            subscriber.max_events = 2
+            for segment_id in range(3):
+                hub.publish(segment_id, 'High', 10)
+            await asyncio.sleep(0)
+            return subscriber
+        
+        subscriber = asyncio.run(run())
+        self.assertTrue(subscriber.needs_snapshot)
+        self.assertEqual(len(subscriber.events), 0)
+    
+    def test_unsubscribe_on_close(self):
+        async def run():
+            hub = IntensityHub(broker=InProcessBroker())
+            subscriber = hub.subscribe()
+            subscriber.needs_snapshot = False
+            events = stream_events(hub, subscriber, heartbeat=0.01)
+            chunks = [await anext(events), await anext(events)]
+            await events.aclose()
+            return chunks, hub.get_subscriber_count()
+        
+        self.assertEqual(asyncio.run(run()), ([f'retry: {STREAM_RETRY_MILLISECONDS}\n\n', ': heartbeat\n\n'], 0))
+    
+    # Test 2 - Is a resync published by another process (a management command) picked up on the next heartbeat?
+    def test_resync_from_another_process(self):
+        async def run():
+            hub = IntensityHub(broker=InProcessBroker(), resync_check_seconds=0)
+            # The snapshot itself is tested with the endpoint
+            hub.get_snapshot = lambda: []
+            hub.publish(1, 'Low', 70)
+            await asyncio.sleep(0)
+            subscriber = hub.subscribe()
+            subscriber.needs_snapshot = False
+            events = stream_events(hub, subscriber, heartbeat=0.01)
+            await anext(events)
+            
+            IntensityHub(broker=InProcessBroker()).publish_resync()
+            chunk = await anext(events)
+            await events.aclose()
+            return chunk, hub.intensities
+        
+        chunk, intensities = asyncio.run(run())
+        self.assertEqual(chunk, 'event: snapshot\ndata: {"segments":[]}\n\n')
+        self.assertNotIn(1, intensities)
+    
+    # Test 3 - Does the local broker stand-in deliver the messages from its own thread?
+    def test_local_thread_broker(self):
+        async def run():
+            broker = LocalThreadBroker()
+            hub = IntensityHub(broker=broker)
+            subscriber = hub.subscribe()
+            hub.publish(1, 'Low', 70)
+            await asyncio.get_running_loop().run_in_executor(None, broker.join)
+            await asyncio.wait_for(subscriber.wakeup.wait(), 1)
+            return list(subscriber.events)
+        
+        self.assertEqual(asyncio.run(run()), [{'type': 'intensity', 'id': 1, 'intensity': 'Low', 'speed': 70, 'previous_intensity': None}])
+
+## Tests for the publication of the writes
+# Test 4 - Is the new intensity of the road segment published once the traffic reading is committed?
+class TestPublishIntensity(IntensityStreamTestCase):
+    def test_publish_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reading = TrafficReadings.objects.create(road_segment_id=self.segment, speed=35)
+            self.assertEqual(self.messages, [])
+        self.assertEqual(self.messages, [{'type': 'state', 'id': self.segment.id, 'intensity': 'Medium', 'speed': 35}])
+        
+        # After a deletion, the state is read back from the segment state table
+        with self.captureOnCommitCallbacks(execute=True):
+            reading.delete()
+        self.assertEqual(self.messages[-1], {'type': 'state', 'id': self.segment.id, 'intensity': 'High', 'speed': 10})
+
+## Tests for the stream endpoint
+# Test 5 - Does the WSGI fallback answer with the snapshot only?
+class TestIntensityStreamView(IntensityStreamTestCase):
+    def test_snapshot_only(self):
+        response = self.client.get(reverse('road-segments-intensity-stream'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('retry: ', response.content.decode())
+        self.assertEqual(parse_events(response.content.decode()),
+                         [('snapshot', {'segments': [{'id': self.segment.id, 'intensity': 'High', 'speed': 10.0}]})])
+
+# Test 6 - Does an ASGI stream send the snapshot, then the changes of intensity only?
+class TestAsyncIntensityStreamView(IntensityStreamTestCase):
+    async def test_stream(self):
+        response = await AsyncClient().get(reverse('road-segments-intensity-stream'))
+        self.assertTrue(response.streaming)
+        chunks = aiter(response.streaming_content)
+        
+        self.assertIn(b'retry: ', await anext(chunks))
+        self.assertEqual(parse_events((await anext(chunks)).decode())[0][0], 'snapshot')
+        
+        hub = get_intensity_hub()
+        hub.publish(self.segment.id, 'High', 12)
+        hub.publish(self.segment.id, 'Low', 80)
+        self.assertEqual(parse_events((await anext(chunks)).decode()),
+                         [('intensity', {'id': self.segment.id, 'intensity': 'Low', 'speed': 80, 'previous_intensity': 'High'})])
+        await chunks.aclose()
\ No newline at end of file
@@ -0,0 +1,55 @@
+from django.core.management import call_command
+from django.test import TestCase
+from traffic_api.models import RoadSegments, TrafficReadings, Sensors, SegmentCurrentState
+from io import StringIO
+from pathlib import Path
+import tempfile
+
+
+TRAFFIC_SPEED_CSV = """ID,Long_start,Lat_start,Long_end,Lat_end,Length,Speed
+1,103.9460064,30.75066046,30.7450801,1179.207157,103.9564943,31.76904762
+2,103.9460064,30.75066046,30.75449343,620.9053755,103.9412759,49.45
+3,104.0,30.7,30.7,100.0,104.1,
+"""
+SENSORS_CSV = """id,name,uuid
+1,Gorgeous Flamingo,270e4cc0-d454-4b42-8682-80e87c3d163c
+"""
+
+class LoadTrafficDataTestCase(TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.data_dir.cleanup)
+        (Path(self.data_dir.name) / 'traffic_speed.csv').write_text(TRAFFIC_SPEED_CSV)
+        (Path(self.data_dir.name) / 'sensors.csv').write_text(SENSORS_CSV)
+    
+    def load(self, *args):
+        call_command('load_traffic_data', '--data-dir', self.data_dir.name, '--chunk-size', '2', *args, stdout=StringIO())
+
+## Tests for the CSV loader command
+# Test 1 - Is traffic_speed.csv split into road segments and readings, with the derived state rebuilt?
+class TestLoadCombinedSource(LoadTrafficDataTestCase):
+    def test_load_combined_source(self):
+        self.load()
+        
+        self.assertEqual(list(RoadSegments.objects.order_by('id').values_list('id', flat=True)), [1, 2, 3])
+        self.assertEqual(list(TrafficReadings.objects.order_by('id').values_list('road_segment_id', 'speed')), [(1, 31.76904762), (2, 49.45), (3, None)])
+        self.assertEqual(Sensors.objects.get().name, 'Gorgeous Flamingo')
+        self.assertEqual(SegmentCurrentState.objects.get(road_segment_id=3).intensity, 'No Data')
+        self.assertEqual(SegmentCurrentState.objects.get(road_segment_id=1).readings_count, 1)
+        
+        # New rows continue after the loaded ids
+        self.assertEqual(RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10).id, 4)
+
+# Test 2 - Can a load be resumed, and can the tables be emptied and loaded again?
+class TestResumeAndTruncate(LoadTrafficDataTestCase):
+    def test_resume_and_truncate(self):
+        RoadSegments.objects.bulk_create([RoadSegments(id=1, long_start=0, lat_start=0, long_end=0, lat_end=0, length=0)])
+        self.load('--resume')
+        
+        # The row that was already there is kept, and the others are added
+        self.assertEqual(RoadSegments.objects.count(), 3)
+        self.assertEqual(RoadSegments.objects.get(id=1).length, 0)
+        
+        self.load('--truncate')
+        self.assertEqual(RoadSegments.objects.count(), 3)
+        self.assertEqual(RoadSegments.objects.get(id=1).length, 103.9564943)
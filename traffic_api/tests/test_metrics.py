@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.metrics import metrics_registry
+from traffic_api.models import RoadSegments, TrafficReadings
+from unittest import mock
+
+
+User = get_user_model()
+
+class MetricsTestCase(APITestCase):
+    def setUp(self):
+        metrics_registry.reset()
+        road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        TrafficReadings.objects.create(speed=10, road_segment_id=road_segment)
+        
+        # Authenticate as the admin
+        self.admin_user = User.objects.create_user(username="test_admin_user", password="test_admin_password")
+        self.admin_user.is_staff = True   # Assign admin role
+        self.admin_user.save()
+    
+    def get_metrics(self, **headers):
+        return self.client.get(reverse('metrics'), **headers)
+
+## Tests for the request metrics
+# Test 1 - Are the requests, their latency, queries and response size exposed in the Prometheus format?
+class TestMetricsExposition(MetricsTestCase):
+    def test_metrics_exposition(self):
+        self.client.get(reverse('all-road-segments'))
+        self.client.get(reverse('all-road-segments'))
+        
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.get_metrics()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        
+        metrics = response.content.decode()
+        self.assertIn('traffic_api_requests_total{view="all-road-segments",method="GET",status="200"} 2', metrics)
+        self.assertIn('traffic_api_request_duration_seconds_count{view="all-road-segments",method="GET"} 2', metrics)
+        self.assertIn('traffic_api_request_duration_seconds_bucket{view="all-road-segments",method="GET",le="+Inf"} 2', metrics)
+        self.assertIn('traffic_api_db_queries_total{view="all-road-segments"}', metrics)
+        self.assertIn('traffic_api_response_size_bytes_sum{view="all-road-segments"}', metrics)
+        self.assertIn('traffic_api_slowest_query_seconds{view="all-road-segments",sql="SELECT', metrics)
+
+# Test 2 - Can the metrics be read with the bearer token, and only with it?
+class TestMetricsAccess(MetricsTestCase):
+    def test_metrics_access(self):
+        self.assertEqual(self.get_metrics().status_code, status.HTTP_403_FORBIDDEN)
+        
+        with mock.patch('traffic_api.permissions.METRICS_TOKEN', 'scraper-token'):
+            self.assertEqual(self.get_metrics(HTTP_AUTHORIZATION="Bearer scraper-token").status_code, status.HTTP_200_OK)
+            self.assertEqual(self.get_metrics(HTTP_AUTHORIZATION="Bearer wrong-token").status_code, status.HTTP_403_FORBIDDEN)
+
+# Test 3 - Are the slow requests logged with their slowest queries?
+class TestSlowRequestLog(MetricsTestCase):
+    def test_slow_request_log(self):
+        with mock.patch('traffic_api.metrics.METRICS_SLOW_REQUEST_SECONDS', 0), mock.patch('traffic_api.metrics.METRICS_SLOW_REQUEST_SAMPLE_RATE', 1):
+            with self.assertLogs('traffic_api.slow_requests', level='WARNING') as logs:
+                self.client.get(reverse('all-traffic-readings'))
+        
+        self.assertIn('all-traffic-readings', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
\ No newline at end of file
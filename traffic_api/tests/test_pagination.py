@@ -0,0 +1,37 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from traffic_api.models import RoadSegments, Sensors, Cars, SensorReadings
+
+
+## Tests for the cursor pagination of the list endpoints
+# Test 1 - Can every road segment be read by following the cursors, without repeating or skipping any?
+class TestRoadSegmentsPagination(APITestCase):
+    def test_follow_cursors(self):
+        RoadSegments.objects.bulk_create([RoadSegments(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10) for _ in range(7)])
+        
+        ids = []
+        url = reverse('all-road-segments') + '?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.data['results']), 3)
+            ids += [road_segment['id'] for road_segment in response.data['results']]
+            url = response.data['next']
+        
+        self.assertEqual(ids, sorted(RoadSegments.objects.values_list('id', flat=True)))
+
+# Test 2 - Are the sensor readings paginated newest first?
+class TestSensorReadingsPagination(APITestCase):
+    def test_sensor_readings_newest_first(self):
+        road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        sensor = Sensors.objects.create(name="Test Sensor", uuid="270e4cc0-d454-4b42-8682-80e87c3d163c")
+        car = Cars.objects.create(car_license_plate="AA11AA", created_at="2023-11-20T08:00:00Z")
+        for hour in [10, 12, 11]:
+            SensorReadings.objects.create(road_segment_id=road_segment, car_license_plate=car, sensor_uuid=sensor,
+                                          timestamp=f"2023-11-20T{hour}:00:00Z")
+        
+        first_page = self.client.get(reverse('sensors-readings') + '?page_size=2').data
+        second_page = self.client.get(first_page['next']).data
+        timestamps = [reading['timestamp'] for reading in first_page['results'] + second_page['results']]
+        
+        self.assertEqual(timestamps, ["2023-11-20T12:00:00Z", "2023-11-20T11:00:00Z", "2023-11-20T10:00:00Z"])
+        self.assertIsNone(second_page['next'])
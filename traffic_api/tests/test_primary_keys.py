@@ -0,0 +1,46 @@
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from traffic_api.models import RoadSegments, TrafficReadings
+from io import StringIO
+
+
+## Tests for the primary key allocation
+# Test 1 - Does an insert take a single statement, with the id assigned by the database?
+# (the signal handlers also update the derived state of the road segment, so only the inserts into the readings are counted)
+class TestSingleStatementInsert(TestCase):
+    def test_insert_takes_one_query(self):
+        road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        
+        with CaptureQueriesContext(connection) as context:
+            first_reading = TrafficReadings.objects.create(speed=30, road_segment_id=road_segment)
+        inserts = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith(f'INSERT INTO {connection.ops.quote_name(TrafficReadings._meta.db_table)}')]
+        self.assertEqual(len(inserts), 1)
+        self.assertIsNotNone(first_reading.id)
+        second_reading = TrafficReadings.objects.create(speed=40, road_segment_id=road_segment)
+        
+        # Assert that the database handed out distinct, increasing ids
+        self.assertGreater(second_reading.id, first_reading.id)
+
+# Test 2 - Are updates to existing road segments saved?
+class TestExistingRowUpdate(TestCase):
+    def test_road_segment_update_is_saved(self):
+        road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        road_segment.length = 72.55
+        road_segment.save()
+        
+        # Assert that the new value was written to the database
+        road_segment.refresh_from_db()
+        self.assertEqual(road_segment.length, 72.55)
+
+# Test 3 - Do new rows continue after rows loaded with explicit ids, once the sequences are resynchronised?
+class TestResyncSequences(TestCase):
+    def test_resync_sequences_after_explicit_ids(self):
+        RoadSegments.objects.bulk_create([RoadSegments(id=i, long_start=0, lat_start=0, long_end=1, lat_end=1, length=10) for i in range(1, 6)])
+        call_command('resync_sequences', stdout=StringIO())
+        
+        # Assert that the next road segment gets the id after the highest loaded id
+        road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        self.assertEqual(road_segment.id, 6)
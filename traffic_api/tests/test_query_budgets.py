@@ -0,0 +1,73 @@
+from rest_framework.test import APITestCase
+from traffic_api.benchmark import BenchmarkSample, get_benchmark_requests, run_benchmark
+from traffic_api.data_loader import refresh_derived_data
+from traffic_api.synthetic_data import generate_synthetic_data
+
+# Most queries each endpoint may run, by URL name. An endpoint whose number of queries grows with the data (N+1) or goes
+# over its budget fails the tests below, and a new endpoint fails until it gets a budget here.
+QUERY_BUDGETS = {
+    'home': 1,
+    'all-traffic-readings': 1,
+    'individual-traffic-reading': 1,
+    'high-intensity-traffic-readings': 1,
+    'medium-intensity-traffic-readings': 1,
+    'low-intensity-traffic-readings': 1,
+    'create-traffic-reading': 13,   # When none of the rollup buckets of the reading exist yet, and the update of their speed sketches
+    'all-road-segments': 2,             # With ?expand=traffic_readings, the readings of the page
+    'individual-road-segment': 2,
+    'nearest-road-segments': 2,
+    'road-segment-history': 2,
+    'road-segment-travel-times': 2,
+    'road-segment-stats': 2,
+    'road-segments-stats': 2,
+    'road-segments-intensity-stream': 1,   # The snapshot (the test client is not an ASGI server)
+    'high-intensity-road-segments': 1,
+    'medium-intensity-road-segments': 1,
+    'low-intensity-road-segments': 1,
+    'create-road-segment': 3,
+    'all-sensors': 1,
+    'individual-sensor': 1,
+    'sensors-readings': 1,
+    'individual-sensor-readings': 1,
+    'create-sensor-reading': 4,
+    'bulk-create-sensor-readings': 4,
+    'ingest-sensor-readings': 0,
+    'all-cars': 1,
+    'individual-car': 2,
+    'car-trajectory': 2,
+    'export': 1,
+    'cache-stats': 0,
+    'metrics': 0,
+}
+
+SMALL_DATASET = {'segments': 10, 'readings': 50, 'sensors': 3, 'cars': 10, 'sensor_readings': 60}
+
+
+## Tests for the number of queries of every endpoint (with the requests of the benchmark command)
+class TestQueryBudgets(APITestCase):
+    def measure(self):
+        results = run_benchmark(get_benchmark_requests(BenchmarkSample()), repeat=1, host='testserver')
+        return {(result['name'], str(result['params'])): result for result in results}
+    
+    def setUp(self):
+        generate_synthetic_data(counts=SMALL_DATASET, use_copy=False)
+        refresh_derived_data()
+    
+    # Test 1 - Does every endpoint answer within its query budget?
+    def test_query_budgets(self):
+        for (name, params), result in self.measure().items():
+            with self.subTest(name=name, params=params):
+                self.assertLess(result['status'], 400)
+                self.assertIn(name, QUERY_BUDGETS, 'New endpoint without a query budget.')
+                self.assertLessEqual(result['queries'], QUERY_BUDGETS[name])
+    
+    # Test 2 - Does the number of queries stay the same with three times as much data?
+    def test_no_queries_per_row(self):
+        small_results = self.measure()
+        generate_synthetic_data(counts={table: count * 2 for table, count in SMALL_DATASET.items()}, seed=1, use_copy=False)
+        refresh_derived_data()
+        large_results = self.measure()
+        
+        for key, result in small_results.items():
+            with self.subTest(name=key[0], params=key[1]):
+                self.assertEqual(large_results[key]['queries'], result['queries'])
\ No newline at end of file
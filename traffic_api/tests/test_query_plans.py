@@ -0,0 +1,58 @@
+from django.db import connection
+from rest_framework.test import APITestCase
+from traffic_api.benchmark import BenchmarkSample, get_benchmark_requests
+from traffic_api.data_loader import refresh_derived_data
+from traffic_api.models import TrafficReadings
+from traffic_api.query_plans import get_query_plans, analyze_tables
+from traffic_api.synthetic_data import generate_synthetic_data
+
+# Sequential scans of the large tables that are expected, by database and URL name: the whole table exports, the partial
+# plate search (without the trigram index) and, on SQLite, the lists ordered by id (the table is read in rowid order, which
+# stops at the page size)
+EXPECTED_FULL_SCANS = {
+    'postgresql': {
+        'export': {'traffic_api_trafficreadings'},
+        'all-cars': {'traffic_api_cars'},
+    },
+    'sqlite': {
+        'home': {'traffic_api_trafficreadings'},
+        'all-traffic-readings': {'traffic_api_trafficreadings'},
+        'high-intensity-traffic-readings': {'traffic_api_trafficreadings'},
+        'medium-intensity-traffic-readings': {'traffic_api_trafficreadings'},
+        'low-intensity-traffic-readings': {'traffic_api_trafficreadings'},
+        'export': {'traffic_api_trafficreadings'},
+        'all-cars': {'traffic_api_cars'},
+    },
+}
+
+
+## Tests for the query plans of every endpoint (with the requests of the benchmark command, on the 10k synthetic dataset)
+class TestQueryPlans(APITestCase):
+    def setUp(self):
+        generate_synthetic_data('10k', use_copy=False)
+        refresh_derived_data()
+        analyze_tables()
+    
+    def get_full_scans(self):
+        full_scans = {}
+        for result in get_query_plans(get_benchmark_requests(BenchmarkSample()), host='testserver'):
+            self.assertLess(result['status'], 400, result['name'])
+            full_scans.setdefault(result['name'], set()).update(result['full_scans'])
+        return full_scans
+    
+    # Test 1 - Are the large tables only read through an index, except for the expected scans?
+    def test_query_plans(self):
+        expected = EXPECTED_FULL_SCANS.get(connection.vendor, {})
+        for name, tables in self.get_full_scans().items():
+            with self.subTest(name=name):
+                self.assertLessEqual(tables, expected.get(name, set()), 'Sequential scan of a large table, is an index missing?')
+    
+    # Test 2 - Is a missing index caught?
+    def test_missing_index(self):
+        with connection.cursor() as cursor:
+            for index in TrafficReadings._meta.indexes:
+                if index.fields[0] == 'road_segment_id':
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+        analyze_tables()
+        
+        self.assertIn('traffic_api_trafficreadings', self.get_full_scans()['individual-road-segment'])
\ No newline at end of file
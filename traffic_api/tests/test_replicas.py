@@ -0,0 +1,87 @@
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.utils import OperationalError
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.caching import bump_versions
+from traffic_api.models import RoadSegments, Sensors, Cars, SensorReadings
+from traffic_api.routers import ReplicaPool, use_replica, use_primary
+
+
+User = get_user_model()
+
+# The 'test' database stands in for a replica of the default one, with different rows so the tests can tell them apart
+class ReplicaTestCase(APITestCase):
+    databases = {'default', 'test'}
+    
+    def setUp(self):
+        self.replica_pool = ReplicaPool(['test'], retry_seconds=30)
+        patcher = mock.patch('traffic_api.routers.replica_pool', self.replica_pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.sensor = Sensors.objects.create(name="Primary Sensor", uuid="270e4cc0-d454-4b42-8682-80e87c3d163c")
+        self.road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        # Written without the signals, which would write the derived rows to the primary
+        Sensors.objects.using('test').bulk_create([Sensors(name="Replica Sensor", uuid="94c1a9e0-5f43-4a2f-9a5c-8f6a1b3e0d27")])
+        RoadSegments.objects.using('test').bulk_create([RoadSegments(long_start=0, lat_start=0, long_end=1, lat_end=1, length=99)])
+    
+    def get_names(self):
+        response = self.client.get(reverse('all-sensors'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [sensor['name'] for sensor in response.data['results']]
+
+## Tests for the database router
+# Test 1 - Do the GET requests, the exports and the use_replica blocks read from the replica?
+class TestReplicaReads(ReplicaTestCase):
+    def test_list_view(self):
+        self.assertEqual(self.get_names(), ["Replica Sensor"])
+    
+    def test_export(self):
+        response = self.client.get(reverse('export', args=['road-segments', 'csv']))
+        content = b''.join(response.streaming_content).decode()
+        
+        self.assertIn(',99.0', content)
+        self.assertNotIn(',10.0', content)
+    
+    def test_use_replica(self):
+        with use_replica():
+            self.assertEqual(Sensors.objects.get().name, "Replica Sensor")
+            with use_primary():
+                self.assertEqual(Sensors.objects.get().name, "Primary Sensor")
+        self.assertEqual(Sensors.objects.get().name, "Primary Sensor")
+
+# Test 2 - Do the requests that write read and write on the primary?
+class TestPrimaryWrites(ReplicaTestCase):
+    def test_create_sensor_reading(self):
+        admin_user = User.objects.create_user(username="test_admin_user", password="test_admin_password", is_staff=True)
+        self.client.force_authenticate(user=admin_user)
+        Cars.objects.create(car_license_plate="AA11AA", created_at="2023-11-19T10:00:00Z")
+        reading = {"car_license_plate": "AA11AA", "timestamp": "2023-11-20T10:00:00Z",
+                   "road_segment_id": self.road_segment.id, "sensor_uuid": self.sensor.id}
+        
+        # The sensor, car and road segment are only found on the primary
+        response = self.client.post(reverse('create-sensor-reading'), reading, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SensorReadings.objects.count(), 1)
+        self.assertEqual(SensorReadings.objects.using('test').count(), 0)
+    
+    # The replica may not have the write yet, and the response would be cached until the next write
+    def test_cached_list_after_write(self):
+        bump_versions()
+        response = self.client.get(reverse('all-road-segments'))
+        self.assertEqual([segment['length'] for segment in response.data['results']], [10.0])
+
+# Test 3 - Do the reads go to the primary while the replica can not be reached, without trying it on every request?
+class TestReplicaFallback(ReplicaTestCase):
+    def test_unavailable_replica(self):
+        with mock.patch.object(connections['test'], 'ensure_connection', side_effect=OperationalError) as ensure_connection:
+            self.assertEqual(self.get_names(), ["Primary Sensor"])
+            self.assertEqual(self.get_names(), ["Primary Sensor"])
+        self.assertEqual(ensure_connection.call_count, 1)
+        
+        # Tried again once the retry delay is over
+        self.replica_pool.unavailable_until.clear()
+        self.assertEqual(self.get_names(), ["Replica Sensor"])
\ No newline at end of file
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.models import RoadSegments, TrafficReadings
+import json
+
+
+User = get_user_model()
+
+class ResponseCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        TrafficReadings.objects.create(speed=10, road_segment_id=self.road_segment)
+        
+        # Authenticate as the admin
+        self.admin_user = User.objects.create_user(username="test_admin_user", password="test_admin_password")
+        self.admin_user.is_staff = True   # Assign admin role
+        self.admin_user.save()
+
+## Tests for the response cache of the polled list endpoints
+# Test 1 - Is a repeated poll answered from the cache without querying the database?
+class TestRepeatedPoll(ResponseCacheTestCase):
+    def test_repeated_poll(self):
+        url = reverse('all-road-segments')
+        first_response = self.client.get(url, {'intensity': 'low', 'page_size': 10})
+        self.assertEqual(first_response['X-Cache'], 'MISS')
+        
+        # Assert that the same query string, in another order, is served from the cache with the same content
+        with self.assertNumQueries(0):
+            second_response = self.client.get(url, {'page_size': 10, 'intensity': 'low'})
+        self.assertEqual(second_response['X-Cache'], 'HIT')
+        self.assertEqual(second_response['ETag'], first_response['ETag'])
+        self.assertEqual(json.loads(second_response.content), json.loads(first_response.content))
+
+# Test 2 - Does a poll with the ETag of the current response get a 304 without a body?
+class TestConditionalPoll(ResponseCacheTestCase):
+    def test_conditional_poll(self):
+        url = reverse('all-traffic-readings')
+        etag = self.client.get(url)['ETag']
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+# Test 3 - Do the writes of the API invalidate the cached responses?
+class TestInvalidationOnWrite(ResponseCacheTestCase):
+    def test_invalidation_on_write(self):
+        url = reverse('all-traffic-readings')
+        first_response = self.client.get(url)
+        etag = first_response['ETag']
+        
+        self.client.force_authenticate(user=self.admin_user)
+        self.client.post(reverse('create-traffic-reading'), {'speed': 70, 'road_segment_id': self.road_segment.id}, format="json")
+        
+        # Assert that the old ETag no longer matches, and that the new reading is in the response
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['results']), 2)
+        
+        # Assert that a write in the same second as the first response is not hidden by If-Modified-Since (one second granularity)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first_response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        # Assert that the road segments are invalidated by the writes of the readings too (they show the readings count)
+        self.client.get(reverse('all-road-segments'))
+        self.client.delete(reverse('individual-traffic-reading', args=[TrafficReadings.objects.latest('id').id]))
+        response = self.client.get(reverse('all-road-segments'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['traffic_readings_count'], 1)
+
+# Test 4 - Are the hit and miss counters available to the admin only?
+class TestCacheStats(ResponseCacheTestCase):
+    def test_cache_stats(self):
+        url = reverse('all-traffic-readings')
+        etag = self.client.get(url)['ETag']
+        self.client.get(url)
+        self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.data, {'hits': 1, 'not_modified': 1, 'misses': 1})
\ No newline at end of file
@@ -0,0 +1,90 @@
+import csv
+import gzip
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from traffic_api.models import RoadSegments, Sensors, Cars, SensorReadings
+from traffic_api.partitions import add_months, get_month_start, get_partition_name, archive_sensor_readings
+
+
+class RetentionTestCase(TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.now = timezone.now()
+        road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        sensor = Sensors.objects.create(name="Test Sensor", uuid="270e4cc0-d454-4b42-8682-80e87c3d163c")
+        car = Cars.objects.create(car_license_plate="AA11AA", created_at=self.now)
+        for days in [200, 120, 100, 10, 1]:
+            SensorReadings.objects.create(road_segment_id=road_segment, car_license_plate=car, sensor_uuid=sensor,
+                                          timestamp=self.now - timedelta(days=days))
+    
+    def archive(self, *args):
+        output = StringIO()
+        call_command('archive_sensor_readings', '--retention-days', '90', '--output-dir', self.output_dir, *args, stdout=output)
+        return output.getvalue()
+    
+    def read_archives(self):
+        rows = []
+        for path in sorted(Path(self.output_dir).glob('*.csv.gz')):
+            with gzip.open(path, 'rt', newline='') as archive:
+                reader = csv.reader(archive)
+                self.assertEqual(next(reader), ['id', 'road_segment_id_id', 'car_license_plate_id', 'timestamp', 'sensor_uuid_id'])
+                rows += list(reader)
+        return rows
+
+## Tests for the retention of the sensor readings
+# Test 1 - Are the readings older than the retention period written to the archive files and deleted, and the recent ones kept?
+class TestArchiveSensorReadings(RetentionTestCase):
+    def test_archive_sensor_readings(self):
+        old_ids = {str(reading_id) for reading_id in SensorReadings.objects.filter(timestamp__lt=self.now - timedelta(days=90)).values_list('id', flat=True)}
+        
+        self.archive()
+        
+        self.assertEqual(SensorReadings.objects.count(), 2)
+        self.assertFalse(SensorReadings.objects.filter(timestamp__lt=self.now - timedelta(days=90)).exists())
+        self.assertEqual({row[0] for row in self.read_archives()}, old_ids)
+        
+        # Assert that a second run has nothing left to archive
+        self.assertIn('Archived 0 month(s)', self.archive())
+
+# Test 2 - Does a dry run leave the readings and the archive directory untouched?
+class TestArchiveSensorReadingsDryRun(RetentionTestCase):
+    def test_archive_sensor_readings_dry_run(self):
+        output = self.archive('--dry-run')
+        
+        self.assertIn('would be written to', output)
+        self.assertEqual(SensorReadings.objects.count(), 5)
+        self.assertEqual(list(Path(self.output_dir).iterdir()), [])
+
+# Test 3 - Are the month boundaries and partition names computed across years, and is the partitioning skipped without PostgreSQL?
+class TestPartitionSensorReadings(RetentionTestCase):
+    def test_partition_sensor_readings(self):
+        month_start = get_month_start(self.now.replace(year=2023, month=11, day=20))
+        self.assertEqual(add_months(month_start, 2).strftime('%Y-%m-%d'), '2024-01-01')
+        self.assertEqual(add_months(month_start, -11).strftime('%Y-%m-%d'), '2022-12-01')
+        self.assertEqual(get_partition_name(month_start), 'traffic_api_sensorreadings_p2023_11')
+        
+        output = StringIO()
+        call_command('partition_sensor_readings', stdout=output)
+        self.assertIn('single table', output.getvalue())
+        self.assertEqual(SensorReadings.objects.count(), 5)
+
+# Test 4 - Does a month archived in two runs keep both files, and does a dry run list each month once?
+class TestArchiveMonthTwice(RetentionTestCase):
+    def test_archive_month_twice(self):
+        reading = SensorReadings.objects.first()
+        for day in [5, 20]:
+            SensorReadings.objects.create(road_segment_id=reading.road_segment_id, car_license_plate=reading.car_license_plate,
+                                          sensor_uuid=reading.sensor_uuid, timestamp=datetime(2023, 3, day, tzinfo=dt_timezone.utc))
+        
+        first = archive_sensor_readings(datetime(2023, 3, 10, tzinfo=dt_timezone.utc), self.output_dir)
+        months = [month_start for _, month_start in archive_sensor_readings(datetime(2023, 4, 1, tzinfo=dt_timezone.utc), self.output_dir, dry_run=True)]
+        second = archive_sensor_readings(datetime(2023, 4, 1, tzinfo=dt_timezone.utc), self.output_dir)
+        
+        self.assertEqual(months, [datetime(2023, 3, 1, tzinfo=dt_timezone.utc)])
+        self.assertNotEqual(first[0][0], second[0][0])
+        self.assertEqual(len(self.read_archives()), 2)
\ No newline at end of file
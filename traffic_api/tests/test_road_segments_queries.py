@@ -0,0 +1,41 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from traffic_api.models import RoadSegments, TrafficReadings, SegmentCurrentState
+
+
+## Tests for the number of queries of the road segment list endpoints
+class TestRoadSegmentsQueryCount(APITestCase):
+    def create_segments(self, total, speed):
+        for _ in range(total):
+            road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+            TrafficReadings.objects.create(speed=speed, road_segment_id=road_segment)
+            TrafficReadings.objects.create(speed=speed, road_segment_id=road_segment)
+    
+    def count_queries(self, url_name):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse(url_name))
+        return len(context.captured_queries)
+    
+    # Test 1 - Do the list endpoints run the same number of queries for any number of road segments?
+    def test_constant_number_of_queries(self):
+        url_names = ['all-road-segments', 'high-intensity-road-segments', 'medium-intensity-road-segments', 'low-intensity-road-segments']
+        
+        self.create_segments(2, speed=10)
+        small_counts = [self.count_queries(url_name) for url_name in url_names]
+        self.create_segments(20, speed=10)
+        large_counts = [self.count_queries(url_name) for url_name in url_names]
+        
+        self.assertEqual(small_counts, large_counts)
+        self.assertEqual(large_counts, [1, 1, 1, 1])
+    
+    # Test 2 - Does the readings count come from the maintained counter?
+    def test_traffic_readings_count(self):
+        self.create_segments(1, speed=10)
+        road_segment = RoadSegments.objects.get()
+        TrafficReadings.objects.filter(road_segment_id=road_segment).first().delete()
+        
+        response = self.client.get(reverse('all-road-segments'))
+        self.assertEqual(response.data['results'][0]['traffic_readings_count'], 1)
+        self.assertEqual(SegmentCurrentState.objects.get(road_segment=road_segment).readings_count, 1)
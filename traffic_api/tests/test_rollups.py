@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.models import RoadSegments, TrafficReadings, SegmentSpeedRollups
+from io import StringIO
+
+
+def at(hour, minute=0):
+    return datetime(2023, 11, 20, hour, minute, tzinfo=timezone.utc)
+
+class RollupsTestCase(APITestCase):
+    def setUp(self):
+        self.road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        for speed, recorded_at in [(10, at(10, 1)), (30, at(10, 3)), (None, at(10, 7)), (60, at(11, 30))]:
+            TrafficReadings.objects.create(speed=speed, road_segment_id=self.road_segment, recorded_at=recorded_at)
+    
+    def rollups(self, bucket):
+        return list(SegmentSpeedRollups.objects.filter(road_segment=self.road_segment, bucket=bucket).order_by('bucket_start').values_list(
+            'bucket_start', 'readings_count', 'speed_sum', 'speed_min', 'speed_max', 'high_count', 'medium_count', 'low_count'))
+
+## Tests for the speed rollups
+# Test 1 - Are the rollups updated as the readings arrive?
+class TestIncrementalRollups(RollupsTestCase):
+    def test_incremental_rollups(self):
+        self.assertEqual(self.rollups('5m'), [(at(10, 0), 2, 40, 10, 30, 1, 1, 0), (at(10, 5), 1, 0, None, None, 0, 0, 0),
+                                              (at(11, 30), 1, 60, 60, 60, 0, 0, 1)])
+        self.assertEqual(self.rollups('1h'), [(at(10), 3, 40, 10, 30, 1, 1, 0), (at(11), 1, 60, 60, 60, 0, 0, 1)])
+        self.assertEqual(self.rollups('1d'), [(at(0), 4, 100, 10, 60, 1, 1, 1)])
+
+# Test 2 - Are the rollups kept right when readings are updated, moved in time or deleted, and does the rebuild give the same result?
+class TestRollupsRecompute(RollupsTestCase):
+    def test_update_delete_and_rebuild(self):
+        reading = TrafficReadings.objects.get(speed=10)
+        reading.speed = 15
+        reading.recorded_at = at(11, 45)
+        reading.save()
+        TrafficReadings.objects.get(speed=60).delete()
+        
+        expected = [(at(10), 2, 30, 30, 30, 0, 1, 0), (at(11), 1, 15, 15, 15, 1, 0, 0)]
+        self.assertEqual(self.rollups('1h'), expected)
+        
+        SegmentSpeedRollups.objects.all().delete()
+        call_command('compact_rollups', stdout=StringIO())
+        self.assertEqual(self.rollups('1h'), expected)
+
+# Test 3 - Is the history served from the rollups?
+class TestHistoryEndpoint(RollupsTestCase):
+    def test_history_endpoint(self):
+        url = reverse('road-segment-history', args=[self.road_segment.id])
+        response = self.client.get(url + '?bucket=1h&from=2023-11-20T00:00:00Z&to=2023-11-21T00:00:00Z')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['average_speed'] for row in response.data], [20, 60])
+        self.assertEqual(response.data[0]['intensity_share'], {'high': 1 / 3, 'medium': 1 / 3, 'low': 0, 'no_data': 1 / 3})
+        
+        self.assertEqual(self.client.get(url + '?bucket=1w').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url + '?bucket=5m&from=2000-01-01T00:00:00Z').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url + '?from=2023-11-21T00:00:00Z&to=2023-11-20T00:00:00Z').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('road-segment-history', args=[self.road_segment.id + 1])).status_code,
+                         status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,74 @@
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+from rest_framework.generics import ListAPIView
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APIRequestFactory
+from traffic_api.caching import bump_versions
+from traffic_api.models import RoadSegments, TrafficReadings, Sensors, Cars, SensorReadings, SegmentCurrentState
+from traffic_api.renderers import FastJSONRenderer
+from traffic_api.views import TrafficReadingsView, HighIntensityTrafficReadingsView, RoadSegmentsView, SensorsView, SensorReadingsView, CarsView
+
+
+# The same view serialized by its ModelSerializer and rendered by the DRF JSONRenderer, as before the row serializers
+def get_reference_view(view_class):
+    return type(f'Reference{view_class.__name__}', (view_class,), {'get': ListAPIView.get, 'list': ListAPIView.list, 'renderer_classes': [JSONRenderer]})
+
+
+class RowSerializersTestCase(APITestCase):
+    def setUp(self):
+        self.segment = RoadSegments.objects.create(long_start=104.061, lat_start=30.6, long_end=104.07, lat_end=30.61, length=1000)
+        other_segment = RoadSegments.objects.create(long_start=104.1, lat_start=30.7, long_end=104.2, lat_end=30.8, length=12.5)
+        SegmentCurrentState.objects.filter(road_segment=other_segment).delete()
+        
+        recorded_at = datetime(2023, 11, 20, 10, 0, 0, 123456, tzinfo=dt_timezone.utc)
+        for speed in [12.5, None, 45.0, 80.25, 1e-07]:
+            TrafficReadings.objects.create(speed=speed, road_segment_id=self.segment, recorded_at=recorded_at)
+        
+        sensor = Sensors.objects.create(name="Capteur é   \"north\"", uuid="270e4cc0-d454-4b42-8682-80e87c3d163c")
+        Sensors.objects.create(name="Sensor 2", uuid="270e4cc0-d454-4b42-8682-80e87c3d163d")
+        for plate in ["AA11AA", "BB22BB"]:
+            car = Cars.objects.create(car_license_plate=plate, created_at=datetime(2023, 11, 20, 10, tzinfo=dt_timezone.utc))
+            for second in [0, 30]:
+                SensorReadings.objects.create(road_segment_id=self.segment, car_license_plate=car, sensor_uuid=sensor,
+                                              timestamp=datetime(2023, 11, 20, 10, 0, second, tzinfo=dt_timezone.utc))
+    
+    # The response cache is invalidated first, so both views serialize the rows
+    def render(self, view_class, params):
+        bump_versions()
+        request = APIRequestFactory().get('/list/', params, HTTP_ACCEPT='application/json')
+        response = view_class.as_view()(request)
+        response.render()
+        return response.content
+
+## Tests for the read-optimized serialization of the list views
+# Test 1 - Are the list responses the same bytes as the ones of the ModelSerializers and the DRF JSONRenderer?
+class TestRowSerializersOutput(RowSerializersTestCase):
+    def test_row_serializers_output(self):
+        for view_class in [TrafficReadingsView, HighIntensityTrafficReadingsView, RoadSegmentsView, SensorsView, SensorReadingsView, CarsView]:
+            for params in [{}, {'page_size': 2}]:
+                with self.subTest(view=view_class.__name__, params=params):
+                    content = self.render(view_class, params)
+                    self.assertEqual(content, self.render(get_reference_view(view_class), params))
+                    self.assertIn(b'"results":[{', content)
+
+# Test 2 - Does the renderer give the output of the DRF JSONRenderer with and without orjson?
+class TestFastJSONRenderer(RowSerializersTestCase):
+    def test_fast_json_renderer(self):
+        data = {'name': 'é    ', 'recorded_at': datetime(2023, 11, 20, 10, tzinfo=dt_timezone.utc), 'speed': 45.5,
+                'small': 1e-07, 'big': 2 ** 70, 'items': [1, None, True]}
+        for value in [data, dict(data, small=0.5, big=1)]:
+            expected = JSONRenderer().render(value)
+            self.assertEqual(FastJSONRenderer().render(value), expected)
+            with mock.patch('traffic_api.renderers.orjson', None):
+                self.assertEqual(FastJSONRenderer().render(value), expected)
+        
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json; indent=4'), JSONRenderer().render(data, 'application/json; indent=4'))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+    
+    # Assert that only the numbers in exponent notation fall back to the DRF JSONRenderer, not the strings that look like one
+    def test_exponent_fallback(self):
+        for value, falls_back in [({'uuid': '270e4cc0-d454-4b42-8682-80e87c3d163c', 'speed': 45.5}, False),
+                                  ({'name': '1e5'}, False), ({'small': 1e-07}, True), ({'items': [-2.5e+30]}, True)]:
+            with mock.patch.object(JSONRenderer, 'render', return_value=b'slow') as slow_render:
+                FastJSONRenderer().render(value)
+            self.assertEqual(slow_render.called, falls_back, value)
\ No newline at end of file
@@ -0,0 +1,90 @@
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.models import RoadSegments, TrafficReadings, SegmentCurrentState
+from io import StringIO
+
+
+class SegmentStateTestCase(APITestCase):
+    def setUp(self):
+        self.road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        self.other_road_segment = RoadSegments.objects.create(long_start=1, lat_start=1, long_end=2, lat_end=2, length=10)
+    
+    def state(self, road_segment):
+        return SegmentCurrentState.objects.get(road_segment=road_segment)
+
+## Tests for the current state of the road segments
+# Test 1 - Does a new road segment start without data?
+class TestNewSegmentState(SegmentStateTestCase):
+    def test_new_road_segment_has_no_data(self):
+        self.assertEqual(self.state(self.road_segment).intensity, 'No Data')
+        self.assertIsNone(self.state(self.road_segment).latest_reading_id)
+
+# Test 2 - Does the state follow the latest reading when readings are created, updated and deleted?
+class TestSegmentStateUpdates(SegmentStateTestCase):
+    def test_state_follows_latest_reading(self):
+        first_reading = TrafficReadings.objects.create(speed=10, road_segment_id=self.road_segment)
+        latest_reading = TrafficReadings.objects.create(speed=60, road_segment_id=self.road_segment)
+        self.assertEqual(self.state(self.road_segment).latest_reading_id, latest_reading.id)
+        self.assertEqual(self.state(self.road_segment).intensity, 'Low')
+        
+        # Updating the latest reading changes the intensity
+        latest_reading.speed = 30
+        latest_reading.save()
+        self.assertEqual(self.state(self.road_segment).intensity, 'Medium')
+        
+        # Moving the latest reading to another segment makes the previous one the latest again
+        latest_reading.road_segment_id = self.other_road_segment
+        latest_reading.save()
+        self.assertEqual(self.state(self.road_segment).latest_reading_id, first_reading.id)
+        self.assertEqual(self.state(self.other_road_segment).latest_reading_id, latest_reading.id)
+        
+        # Deleting the only reading leaves the segment without data
+        first_reading.delete()
+        self.assertEqual(self.state(self.road_segment).intensity, 'No Data')
+    
+    # Moving a reading that is not the latest one updates the counts of both segments
+    def test_move_older_reading(self):
+        first_reading = TrafficReadings.objects.create(speed=10, road_segment_id=self.road_segment)
+        TrafficReadings.objects.create(speed=60, road_segment_id=self.road_segment)
+        
+        first_reading = TrafficReadings.objects.get(id=first_reading.id)
+        first_reading.road_segment_id = self.other_road_segment
+        first_reading.save()
+        self.assertEqual(self.state(self.road_segment).readings_count, 1)
+        self.assertEqual(self.state(self.other_road_segment).readings_count, 1)
+
+# Test 3 - Can a road segment with readings be deleted?
+class TestSegmentDelete(SegmentStateTestCase):
+    def test_delete_road_segment_with_readings(self):
+        TrafficReadings.objects.create(speed=10, road_segment_id=self.road_segment)
+        self.road_segment.delete()
+        self.assertFalse(SegmentCurrentState.objects.filter(road_segment_id=self.road_segment.id).exists())
+
+# Test 4 - Does the rebuild command restore the state table?
+class TestRebuildSegmentState(SegmentStateTestCase):
+    def test_rebuild_segment_state(self):
+        latest_reading = TrafficReadings.objects.create(speed=10, road_segment_id=self.road_segment)
+        SegmentCurrentState.objects.all().delete()
+        call_command('rebuild_segment_state', stdout=StringIO())
+        
+        self.assertEqual(self.state(self.road_segment).latest_reading_id, latest_reading.id)
+        self.assertEqual(self.state(self.other_road_segment).intensity, 'No Data')
+
+# Test 5 - Do the intensity views only return the segments whose latest reading has that intensity?
+class TestIntensityRoadSegmentsViews(SegmentStateTestCase):
+    def test_intensity_road_segments_views(self):
+        TrafficReadings.objects.create(speed=60, road_segment_id=self.road_segment)
+        TrafficReadings.objects.create(speed=10, road_segment_id=self.road_segment)
+        TrafficReadings.objects.create(speed=10, road_segment_id=self.other_road_segment)
+        TrafficReadings.objects.create(speed=35, road_segment_id=self.other_road_segment)
+        
+        high_ids = [segment['id'] for segment in self.client.get(reverse('high-intensity-road-segments')).data['results']]
+        medium_ids = [segment['id'] for segment in self.client.get(reverse('medium-intensity-road-segments')).data['results']]
+        low_response = self.client.get(reverse('low-intensity-road-segments'))
+        
+        self.assertEqual(high_ids, [self.road_segment.id])
+        self.assertEqual(medium_ids, [self.other_road_segment.id])
+        self.assertEqual(low_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(low_response.data['results'], [])
@@ -0,0 +1,78 @@
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.authentication import create_api_key, revoke_api_keys, api_key_cache
+from traffic_api.deduplication import recent_passes
+from traffic_api.models import RoadSegments, Sensors, SensorReadings, SensorApiKeys
+
+
+class SensorApiKeysTestCase(APITestCase):
+    def setUp(self):
+        api_key_cache.invalidate()
+        recent_passes.clear()
+        self.road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        self.sensor = Sensors.objects.create(name="Test Sensor", uuid="270e4cc0-d454-4b42-8682-80e87c3d163c")
+        self.other_sensor = Sensors.objects.create(name="Other Sensor", uuid="270e4cc0-d454-4b42-8682-80e87c3d163d")
+        self.key = create_api_key(self.sensor)
+        self.url = reverse('bulk-create-sensor-readings')
+    
+    def reading(self, car_license_plate, **fields):
+        return dict({"car_license_plate": car_license_plate, "timestamp": "2023-11-20T10:00:00Z", "road_segment_id": self.road_segment.id}, **fields)
+    
+    def post(self, readings, key):
+        return self.client.post(self.url, readings, format="json", HTTP_X_API_KEY=key)
+
+## Tests for the per-sensor API keys
+# Test 1 - Can a sensor send readings with its key, without repeating its sensor_uuid?
+class TestSensorKeyBulkCreate(SensorApiKeysTestCase):
+    def test_sensor_key_bulk_create(self):
+        response = self.post([self.reading("AA11AA"), self.reading("BB22BB", sensor_uuid=self.sensor.id)], self.key)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SensorReadings.objects.filter(sensor_uuid=self.sensor).count(), 2)
+        
+        # Assert that the key is stored hashed
+        self.assertFalse(SensorApiKeys.objects.filter(key_hash=self.key).exists())
+
+# Test 2 - Are the readings of another sensor rejected?
+class TestSensorKeyOtherSensor(SensorApiKeysTestCase):
+    def test_sensor_key_other_sensor(self):
+        response = self.post([self.reading("AA11AA", sensor_uuid=self.other_sensor.id)], self.key)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('sensor_uuid', response.data['errors'][0]['errors'])
+        self.assertEqual(SensorReadings.objects.count(), 0)
+
+# Test 3 - Is a known key verified without a database query?
+class TestSensorKeyCached(SensorApiKeysTestCase):
+    def test_sensor_key_cached(self):
+        self.post([self.reading("AA11AA")], self.key)
+        
+        # A new pass of the same car, minus the key lookup: segment and sensor lookups, car lookup, readings insert and the savepoints
+        with self.assertNumQueries(6):
+            self.post([self.reading("AA11AA", timestamp="2023-11-20T10:05:00Z")], self.key)
+
+# Test 4 - Is a revoked or rotated key refused right away?
+class TestSensorKeyRevoked(SensorApiKeysTestCase):
+    def test_sensor_key_revoked(self):
+        self.post([self.reading("AA11AA")], self.key)
+        revoke_api_keys(self.sensor.api_keys.all())
+        response = self.post([self.reading("AA11AA")], self.key)
+        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
+        
+        # Assert that the command rotates the key, and that only the new key is accepted
+        new_key = create_api_key(self.sensor)
+        out = StringIO()
+        call_command('create_sensor_api_key', self.sensor.id, '--revoke-existing', stdout=out)
+        rotated_key = out.getvalue().strip().splitlines()[-1]
+        self.assertIn(self.post([self.reading("AA11AA")], new_key).status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
+        self.assertEqual(self.post([self.reading("AA11AA")], rotated_key).status_code, status.HTTP_201_CREATED)
+
+# Test 5 - Is an unknown key refused, and a request without a key still refused for an anonymous user?
+class TestSensorKeyInvalid(SensorApiKeysTestCase):
+    def test_sensor_key_invalid(self):
+        self.assertIn(self.post([self.reading("AA11AA")], "not-a-key").status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
+        response = self.client.post(self.url, [self.reading("AA11AA", sensor_uuid=self.sensor.id)], format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
@@ -0,0 +1,80 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from traffic_api.caching import bump_versions
+from traffic_api.models import RoadSegments, TrafficReadings
+
+
+class SparseFieldsTestCase(APITestCase):
+    def setUp(self):
+        self.road_segments = []
+        for index in range(3):
+            road_segment = RoadSegments.objects.create(long_start=104.0 + index, lat_start=30.6, long_end=104.1 + index, lat_end=30.7, length=100)
+            for speed in [10, 30, 60, 90]:
+                TrafficReadings.objects.create(speed=speed, road_segment_id=road_segment)
+            self.road_segments.append(road_segment)
+    
+    def get(self, url, params):
+        bump_versions()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        return response, [query['sql'] for query in context.captured_queries]
+
+## Tests for the ?fields= and ?expand= query parameters
+# Test 1 - Do the lists return and read only the fields that are asked for?
+class TestSparseFields(SparseFieldsTestCase):
+    def test_sparse_fields(self):
+        response, queries = self.get(reverse('all-road-segments'), {'fields': 'long_start,intensity'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{'long_start': 104.0 + index, 'intensity': 'Low'} for index in range(3)])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"length"', queries[0])
+        self.assertNotIn('readings_count', queries[0])
+        
+        # The cursor of the next page still works without the id in the response
+        response, _ = self.get(reverse('all-road-segments'), {'fields': 'length', 'page_size': 2})
+        self.assertEqual(response.data['results'], [{'length': 100}, {'length': 100}])
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 1)
+        
+        response, _ = self.get(reverse('sensors-readings'), {'fields': 'car_license_plate'})
+        self.assertEqual(response.status_code, 200)
+        
+        response, _ = self.get(reverse('all-road-segments'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', str(response.data['fields']))
+
+# Test 2 - Are the latest readings of every segment of the page nested with ?expand=, in a single extra query?
+class TestExpandTrafficReadings(SparseFieldsTestCase):
+    def test_expand_traffic_readings(self):
+        response, queries = self.get(reverse('all-road-segments'), {'expand': 'traffic_readings', 'expand_limit': 2, 'fields': 'id'})
+        self.assertEqual(len(queries), 2)
+        for road_segment, result in zip(self.road_segments, response.data['results']):
+            self.assertEqual(result['id'], road_segment.id)
+            self.assertEqual([reading['speed'] for reading in result['traffic_readings']], [90, 60])
+            self.assertEqual(result['traffic_readings'][0]['intensity'], 'Low')
+        
+        response, _ = self.get(reverse('all-road-segments'), {})
+        self.assertNotIn('traffic_readings', response.data['results'][0])
+        
+        for params in [{'expand': 'sensors'}, {'expand': 'traffic_readings', 'expand_limit': 5000}, {'expand': 'traffic_readings', 'expand_limit': '-1'}]:
+            response, _ = self.get(reverse('all-road-segments'), params)
+            self.assertEqual(response.status_code, 400)
+        response, _ = self.get(reverse('all-cars'), {'expand': 'traffic_readings'})
+        self.assertEqual(response.status_code, 400)
+
+# Test 3 - Does the individual road segment get a bounded number of readings and the fields that are asked for?
+class TestRoadSegmentDetail(SparseFieldsTestCase):
+    def test_road_segment_detail(self):
+        url = reverse('individual-road-segment', args=[self.road_segments[0].id])
+        response, queries = self.get(url, {'fields': 'id,intensity', 'expand_limit': 3})
+        self.assertEqual(response.data['road_segment'], {'id': self.road_segments[0].id, 'intensity': 'Low'})
+        self.assertEqual([reading['speed'] for reading in response.data['traffic_readings']], [90, 60, 30])
+        self.assertEqual(len(queries), 2)
+        
+        response, _ = self.get(url, {})
+        self.assertEqual(response.data['road_segment']['traffic_readings_count'], 4)
+        self.assertEqual(len(response.data['traffic_readings']), 4)
+        
+        response, _ = self.get(reverse('individual-road-segment', args=[self.road_segments[-1].id + 1]), {})
+        self.assertEqual(response.status_code, 404)
\ No newline at end of file
@@ -0,0 +1,66 @@
+from unittest import mock
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.models import RoadSegments, TrafficReadings
+from traffic_api.spatial import SegmentGridIndex, distance_to_segment, invalidate_segment_index
+import random
+
+
+## Tests for the spatial index
+# Test 1 - Does the grid index give the same answers as checking every segment?
+class TestSegmentGridIndex(SimpleTestCase):
+    def test_matches_brute_force(self):
+        generator = random.Random(7)
+        segments = []
+        for segment_id in range(500):
+            lon, lat = generator.uniform(103.9, 104.2), generator.uniform(30.5, 30.8)
+            segments.append((segment_id, lon, lat, lon + generator.uniform(-0.02, 0.02), lat + generator.uniform(-0.02, 0.02)))
+        index = SegmentGridIndex(segments, cell_size=0.01)
+        
+        for _ in range(20):
+            lon, lat = generator.uniform(103.9, 104.2), generator.uniform(30.5, 30.8)
+            bbox = (lon, lat, lon + 0.03, lat + 0.02)
+            expected = {segment[0] for segment in segments
+                        if min(segment[1], segment[3]) <= bbox[2] and max(segment[1], segment[3]) >= bbox[0]
+                        and min(segment[2], segment[4]) <= bbox[3] and max(segment[2], segment[4]) >= bbox[1]}
+            self.assertEqual(index.query_bbox(*bbox), expected)
+            
+            expected_nearest = sorted((distance_to_segment(lon, lat, *segment[1:]), segment[0]) for segment in segments)[:3]
+            self.assertEqual(index.nearest(lon, lat, limit=3), expected_nearest)
+
+# Test 2 - Can the road segments be filtered by bounding box and intensity, and is the nearest segment found?
+class TestSpatialEndpoints(APITestCase):
+    def setUp(self):
+        invalidate_segment_index()
+        self.near = RoadSegments.objects.create(long_start=104.00, lat_start=30.70, long_end=104.01, lat_end=30.70, length=10)
+        self.far = RoadSegments.objects.create(long_start=104.50, lat_start=30.20, long_end=104.51, lat_end=30.21, length=10)
+        TrafficReadings.objects.create(speed=10, road_segment_id=self.near)
+    
+    def test_bbox_filter(self):
+        url = reverse('all-road-segments')
+        response = self.client.get(url + '?bbox=103.99,30.69,104.02,30.71')
+        self.assertEqual([segment['id'] for segment in response.data['results']], [self.near.id])
+        
+        response = self.client.get(url + '?bbox=103.99,30.69,104.02,30.71&intensity=low')
+        self.assertEqual(response.data['results'], [])
+        
+        # A segment created after the index was built shows up in the next query
+        new = RoadSegments.objects.create(long_start=104.015, lat_start=30.705, long_end=104.1, lat_end=30.8, length=10)
+        response = self.client.get(url + '?bbox=103.99,30.69,104.02,30.71')
+        self.assertEqual([segment['id'] for segment in response.data['results']], [self.near.id, new.id])
+        
+        self.assertEqual(self.client.get(url + '?bbox=1,2,3').status_code, status.HTTP_400_BAD_REQUEST)
+    
+    # Assert that an area with more segments than SPATIAL_FILTER_MAX_IDS is filtered by coordinates, with the same result
+    def test_large_bbox_filter(self):
+        url = reverse('all-road-segments') + '?bbox=103.9,30.6,104.1,30.8'
+        with mock.patch('traffic_api.spatial.SPATIAL_FILTER_MAX_IDS', 0):
+            response = self.client.get(url)
+        self.assertEqual([segment['id'] for segment in response.data['results']], [self.near.id])
+    
+    def test_nearest_road_segments(self):
+        response = self.client.get(reverse('nearest-road-segments') + '?lon=104.5&lat=30.2&limit=2')
+        self.assertEqual([segment['id'] for segment in response.data], [self.far.id, self.near.id])
+        self.assertLess(response.data[0]['distance'], 1)
@@ -0,0 +1,129 @@
+import bisect
+import random
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api import rollups
+from traffic_api.models import RoadSegments, TrafficReadings, SegmentSpeedRollups
+from traffic_api.sketches import SpeedSketch, merge_sketches
+
+
+def at(hour, minute=0):
+    return datetime(2023, 11, 20, hour, minute, tzinfo=timezone.utc)
+
+class SpeedStatsTestCase(APITestCase):
+    def setUp(self):
+        self.road_segment = RoadSegments.objects.create(long_start=0, lat_start=0, long_end=1, lat_end=1, length=10)
+        self.other_segment = RoadSegments.objects.create(long_start=1, lat_start=1, long_end=2, lat_end=2, length=10)
+        for speed, recorded_at in [(10, at(10, 1)), (30, at(10, 3)), (None, at(10, 7)), (60, at(11, 30))]:
+            TrafficReadings.objects.create(speed=speed, road_segment_id=self.road_segment, recorded_at=recorded_at)
+        TrafficReadings.objects.create(speed=100, road_segment_id=self.other_segment, recorded_at=at(12))
+    
+    def get_stats(self, road_segment, params=''):
+        return self.client.get(reverse('road-segment-stats', args=[road_segment.id]) + params)
+
+## Tests for the speed sketches and the statistics endpoints
+# Test 1 - Are the percentiles of a sketch close to the exact ones (in rank), after a round trip through bytes and a merge?
+class TestSpeedSketch(APITestCase):
+    def test_speed_sketch(self):
+        generator = random.Random(7)
+        speeds = [generator.lognormvariate(3, 0.5) for _ in range(20000)]
+        parts = [SpeedSketch() for _ in range(4)]
+        for index, speed in enumerate(speeds):
+            parts[index % 4].add(speed)
+        sketch = merge_sketches(SpeedSketch.from_bytes(part.to_bytes()) for part in parts)
+        
+        speeds.sort()
+        for quantile in [0.01, 0.5, 0.85, 0.95, 0.99]:
+            rank = bisect.bisect(speeds, sketch.get_quantile(quantile)) / len(speeds)
+            self.assertAlmostEqual(rank, quantile, delta=0.005)
+        self.assertEqual((sketch.count, sketch.get_quantile(0), sketch.get_quantile(1)), (20000, speeds[0], speeds[-1]))
+        self.assertAlmostEqual(sketch.mean, sum(speeds) / len(speeds))
+        self.assertLess(len(sketch.to_bytes()), 2000)
+        self.assertEqual(SpeedSketch().to_bytes(), b'')
+
+# Test 2 - Are the sketches kept up to date as readings are created, updated and deleted, and does the rebuild give the same result?
+class TestSketchUpdates(SpeedStatsTestCase):
+    def test_sketch_updates(self):
+        response = self.get_stats(self.road_segment)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['speed_count'], 3)
+        self.assertEqual((response.data['average_speed'], response.data['speed_min'], response.data['speed_max']), (100 / 3, 10, 60))
+        self.assertAlmostEqual(response.data['stddev_speed'], 25.1661, places=4)
+        self.assertEqual(response.data['percentiles']['p50'], 30)
+        
+        # The buckets of a time range are merged
+        response = self.get_stats(self.road_segment, '?bucket=1h&from=2023-11-20T10:00:00Z&to=2023-11-20T11:00:00Z&percentiles=0,100')
+        self.assertEqual((response.data['speed_count'], response.data['percentiles']), (2, {'p0': 10, 'p100': 30}))
+        
+        reading = TrafficReadings.objects.get(speed=10)
+        reading.speed = 90
+        reading.save()
+        TrafficReadings.objects.get(speed=60).delete()
+        
+        # Assert that the all time sketch is stale (no statistics) until it is rebuilt, while the time buckets are up to date
+        self.assertEqual(self.get_stats(self.road_segment).data['speed_count'], None)
+        response = self.client.get(reverse('road-segments-stats'), {'ids': self.road_segment.id, 'combined': 'true'})
+        self.assertEqual((response.data['results'][0]['average_speed'], response.data['combined']['average_speed']), (None, None))
+        response = self.get_stats(self.road_segment, '?bucket=1h&from=2023-11-20T10:00:00Z&to=2023-11-20T11:00:00Z&percentiles=0,100')
+        self.assertEqual((response.data['speed_count'], response.data['percentiles']), (2, {'p0': 30, 'p100': 90}))
+        
+
+        # A new reading does not make the stale sketch look up to date (like the buckets that existed before the sketches)
+        TrafficReadings.objects.create(speed=50, road_segment_id=self.road_segment, recorded_at=at(13))
+        self.assertEqual(self.get_stats(self.road_segment).data['speed_count'], None)
+        
+        call_command('compact_rollups', '--stale-sketches', stdout=StringIO())
+        expected = self.get_stats(self.road_segment).data
+        self.assertEqual((expected['speed_count'], expected['speed_min'], expected['speed_max']), (3, 30, 90))
+        
+        SegmentSpeedRollups.objects.all().delete()
+        call_command('compact_rollups', stdout=StringIO())
+        self.assertEqual(self.get_stats(self.road_segment).data, expected)
+        
+        self.assertEqual(self.get_stats(self.road_segment, '?percentiles=101').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('road-segment-stats', args=[self.other_segment.id + 1])).status_code, status.HTTP_404_NOT_FOUND)
+
+# Test 3 - Does the bulk endpoint give the statistics of each road segment, and of all of them together?
+class TestBulkStats(SpeedStatsTestCase):
+    def test_bulk_stats(self):
+        empty_segment = RoadSegments.objects.create(long_start=2, lat_start=2, long_end=3, lat_end=3, length=10)
+        ids = [self.road_segment.id, self.other_segment.id, empty_segment.id, empty_segment.id + 1]
+        response = self.client.get(reverse('road-segments-stats'), {'ids': ','.join(map(str, ids)), 'combined': 'true', 'percentiles': '50'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['road_segment_id'] for result in results], ids[:3])
+        self.assertEqual([result['speed_count'] for result in results], [3, 1, 0])
+        self.assertEqual(results[1]['percentiles'], {'p50': 100})
+        self.assertEqual(results[2]['percentiles'], {'p50': None})
+        self.assertEqual((response.data['combined']['speed_count'], response.data['combined']['average_speed']), (4, 50))
+        
+        for ids in ['', '1,a', ','.join(map(str, range(1, 1100)))]:
+            self.assertEqual(self.client.get(reverse('road-segments-stats'), {'ids': ids}).status_code, status.HTTP_400_BAD_REQUEST)
+        
+        # Assert that the number of sketches merged by a request is bounded (1000 road segments x 288 buckets of 5 minutes)
+        ids = ','.join(map(str, range(1, 1001)))
+        self.assertEqual(self.client.get(reverse('road-segments-stats'), {'ids': ids, 'bucket': '5m'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('road-segments-stats'), {'ids': ids}).status_code, status.HTTP_200_OK)
+
+# Test 4 - Do two first readings of a new bucket both end up in its sketch, when their updates interleave?
+class TestInterleavedFirstReadings(SpeedStatsTestCase):
+    def test_interleaved_first_readings(self):
+        add_speed_to_sketches = rollups.add_speed_to_sketches
+        
+        # The second reading is counted (and added to the sketches) after the first one is counted, before its sketches are updated
+        def add_second_reading_first(in_keys, speed):
+            with mock.patch('traffic_api.rollups.add_speed_to_sketches', add_speed_to_sketches):
+                TrafficReadings.objects.create(speed=20, road_segment_id=self.other_segment, recorded_at=at(15, 2))
+            add_speed_to_sketches(in_keys, speed)
+        
+        with mock.patch('traffic_api.rollups.add_speed_to_sketches', add_second_reading_first):
+            TrafficReadings.objects.create(speed=40, road_segment_id=self.other_segment, recorded_at=at(15, 1))
+        
+        response = self.get_stats(self.other_segment, '?bucket=5m&from=2023-11-20T15:00:00Z&to=2023-11-20T15:05:00Z&percentiles=0,100')
+        self.assertEqual((response.data['speed_count'], response.data['percentiles']), (2, {'p0': 20, 'p100': 40}))
\ No newline at end of file
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from traffic_api.models import RoadSegments, Sensors, Cars, SensorReadings, SegmentTransitions, SegmentTravelTimes, TrajectoryWatermarks
+from traffic_api.trajectories import update_trajectories, rebuild_trajectories
+
+
+class TrajectoriesTestCase(APITestCase):
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+        # Three road segments of about 111 meters in a row, going north
+        self.segments = [RoadSegments.objects.create(long_start=104.0, lat_start=30.0 + index * 0.001, long_end=104.0,
+                                                     lat_end=30.001 + index * 0.001, length=111) for index in range(3)]
+        self.sensor = Sensors.objects.create(name="Test Sensor", uuid="270e4cc0-d454-4b42-8682-80e87c3d163c")
+        self.car = Cars.objects.create(car_license_plate="AA11AA", created_at=self.now)
+        self.other_car = Cars.objects.create(car_license_plate="BB22BB", created_at=self.now)
+    
+    def add_pass(self, car, segment_index, seconds_ago):
+        return SensorReadings.objects.create(road_segment_id=self.segments[segment_index], car_license_plate=car, sensor_uuid=self.sensor,
+                                             timestamp=self.now - timedelta(seconds=seconds_ago))
+
+## Tests for the trajectory engine
+# Test 1 - Are the consecutive passes of each car turned into transitions, with the trip gaps and repeated segments left out?
+class TestUpdateTrajectories(TrajectoriesTestCase):
+    def test_update_trajectories(self):
+        self.add_pass(self.car, 0, 3000)
+        self.add_pass(self.other_car, 2, 2950)
+        self.add_pass(self.car, 1, 2990)
+        self.add_pass(self.car, 1, 2985)
+        self.add_pass(self.car, 2, 2980)
+        self.add_pass(self.other_car, 1, 2940)
+        # A new trip, long after the previous pass
+        self.add_pass(self.car, 0, 10)
+        
+        totals = update_trajectories(batch_size=3)
+        
+        self.assertEqual(totals['readings'], 7)
+        self.assertEqual(totals['batches'], 3)
+        transitions = list(self.car.transitions.order_by('departed_at').values_list('from_segment', 'to_segment', 'travel_seconds'))
+        self.assertEqual(transitions, [(self.segments[0].id, self.segments[1].id, 10.0), (self.segments[1].id, self.segments[2].id, 5.0)])
+        self.assertEqual(self.other_car.transitions.count(), 1)
+        
+        transition = self.car.transitions.order_by('departed_at').first()
+        self.assertAlmostEqual(transition.distance, 111, delta=1)
+        self.assertAlmostEqual(transition.speed, 111 / 10 * 3.6, delta=0.5)
+        
+        # Assert that the next run continues from the saved state of the car
+        self.add_pass(self.car, 1, 0)
+        self.assertEqual(update_trajectories()['transitions'], 1)
+        self.assertEqual(SegmentTransitions.objects.count(), 4)
+
+# Test 2 - Are the travel time statistics of a pair of road segments aggregated across batches and kept on a rebuild?
+class TestSegmentTravelTimes(TrajectoriesTestCase):
+    def test_segment_travel_times(self):
+        self.add_pass(self.car, 0, 100)
+        self.add_pass(self.car, 1, 90)
+        update_trajectories()
+        self.add_pass(self.other_car, 0, 50)
+        self.add_pass(self.other_car, 1, 20)
+        update_trajectories()
+        
+        response = self.client.get(reverse('road-segment-travel-times', kwargs={'pk': self.segments[0].id}))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['to_segment'], self.segments[1].id)
+        self.assertEqual(response.data[0]['transitions_count'], 2)
+        self.assertEqual(response.data[0]['average_seconds'], 20.0)
+        self.assertEqual(response.data[0]['stddev_seconds'], 10.0)
+        self.assertEqual((response.data[0]['seconds_min'], response.data[0]['seconds_max']), (10.0, 30.0))
+        
+        incoming = self.client.get(reverse('road-segment-travel-times', kwargs={'pk': self.segments[1].id}), {'direction': 'incoming'})
+        self.assertEqual([row['from_segment'] for row in incoming.data], [self.segments[0].id])
+        self.assertEqual(self.client.get(reverse('road-segment-travel-times', kwargs={'pk': self.segments[1].id}), {'direction': 'up'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        
+        # Assert that a rebuild gives the same statistics
+        rebuild_trajectories()
+        travel_time = SegmentTravelTimes.objects.get()
+        self.assertEqual((travel_time.transitions_count, travel_time.seconds_sum), (2, 40.0))
+
+# Test 3 - Is a reading that arrives after a later pass of its car was processed (or commits after a higher id) counted as late?
+class TestLateReadings(TrajectoriesTestCase):
+    def test_late_readings(self):
+        self.add_pass(self.car, 0, 100)
+        self.add_pass(self.car, 2, 50)
+        update_trajectories()
+        self.add_pass(self.car, 1, 75)
+        
+        totals = update_trajectories()
+        
+        self.assertEqual((totals['readings'], totals['late'], totals['transitions']), (1, 1, 0))
+        self.assertEqual(SegmentTransitions.objects.count(), 1)
+        
+        # Assert that a lower id committed after a higher one was processed is still looked up, and found late
+        self.add_pass(self.other_car, 0, 30)
+        second = self.add_pass(self.other_car, 1, 20)
+        self.add_pass(self.other_car, 2, 10)
+        second_id = second.id
+        second.delete()
+        update_trajectories()
+        self.assertEqual(TrajectoryWatermarks.objects.get().pending_ids[0][:2], [second_id, second_id])
+        
+        second.id = second_id
+        second.save()
+        totals = update_trajectories()
+        self.assertEqual((totals['readings'], totals['late']), (1, 1))
+        self.assertEqual(TrajectoryWatermarks.objects.get().pending_ids, [])
+        self.assertEqual(self.other_car.transitions.count(), 1)
+
+# Test 4 - Does the trajectory endpoint return the transitions of the car within the time window?
+class TestCarTrajectory(TrajectoriesTestCase):
+    def test_car_trajectory(self):
+        self.add_pass(self.car, 0, 3 * 3600)
+        self.add_pass(self.car, 1, 3 * 3600 - 30)
+        self.add_pass(self.car, 1, 60)
+        self.add_pass(self.car, 2, 30)
+        output = StringIO()
+        call_command('update_trajectories', stdout=output)
+        self.assertIn('2 transition(s)', output.getvalue())
+        
+        response = self.client.get(reverse('car-trajectory', kwargs={'car_license_plate': 'AA11AA'}), {'hours': 1})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['car']['car_license_plate'], 'AA11AA')
+        self.assertEqual([(row['from_segment'], row['to_segment']) for row in response.data['transitions']], [(self.segments[1].id, self.segments[2].id)])
+        self.assertEqual(len(self.client.get(reverse('car-trajectory', kwargs={'car_license_plate': 'AA11AA'}), {'hours': 4}).data['transitions']), 2)
+        self.assertEqual(self.client.get(reverse('car-trajectory', kwargs={'car_license_plate': 'ZZ99ZZ'})).status_code, status.HTTP_404_NOT_FOUND)
\ No newline at end of file
@@ -1,5 +1,20 @@
 # Not sure how would the threshold changes would be made in the future so I established them as env variables in settings.py
 from traffic_monitoring_api.settings import LOW_SPEED_THRESHOLD, HIGH_SPEED_THRESHOLD
+from django.core.management.color import no_style
+from django.db import connections
+from django.db.models import Q, Case, When, Value, CharField
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+# NumPy is optional, it is only used to classify large in-memory batches of speeds faster
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+INTENSITY_LEVELS = ['High', 'Medium', 'Low']
+NO_DATA = 'No Data'
 
 def get_intensity(speed):
     if speed is not None:
@@ -11,4 +26,81 @@ def get_intensity(speed):
             intensity = "Low"
         return intensity
     else:
-        return 'No Data'
\ No newline at end of file
+        return 'No Data'
+
+
+# Same classification as get_intensity, computed by the database, so querysets can filter, group and count by intensity
+# e.g. TrafficReadings.objects.annotate(intensity_level=intensity_case()).values('intensity_level').annotate(total=Count('id'))
+def intensity_case(speed_field='speed'):
+    return Case(
+        When(**{f'{speed_field}__lte': LOW_SPEED_THRESHOLD}, then=Value('High')),
+        When(**{f'{speed_field}__lte': HIGH_SPEED_THRESHOLD}, then=Value('Medium')),
+        When(**{f'{speed_field}__gt': HIGH_SPEED_THRESHOLD}, then=Value('Low')),
+        default=Value(NO_DATA),
+        output_field=CharField(),
+    )
+
+
+# Filter for the given intensity levels written as ranges on the speed, so the database can use an index on the speed column
+def intensity_filter(levels, speed_field='speed'):
+    conditions = {
+        'High': Q(**{f'{speed_field}__lte': LOW_SPEED_THRESHOLD}),
+        'Medium': Q(**{f'{speed_field}__gt': LOW_SPEED_THRESHOLD, f'{speed_field}__lte': HIGH_SPEED_THRESHOLD}),
+        'Low': Q(**{f'{speed_field}__gt': HIGH_SPEED_THRESHOLD}),
+        NO_DATA: Q(**{f'{speed_field}__isnull': True}),
+    }
+    query = Q()
+    for level in levels:
+        query |= conditions[level]
+    return query
+
+
+# Classify a batch of speeds at once (e.g. the rows of a bulk import), with NumPy when it is installed
+def classify_speeds(speeds):
+    if numpy is None or len(speeds) < 64:
+        return [get_intensity(speed) for speed in speeds]
+    
+    # Missing speeds become NaN, which fails every comparison and falls through to the default
+    values = numpy.array(speeds, dtype=float)
+    labels = numpy.select([values <= LOW_SPEED_THRESHOLD, values <= HIGH_SPEED_THRESHOLD, values > HIGH_SPEED_THRESHOLD],
+                          INTENSITY_LEVELS, default=NO_DATA)
+    return labels.tolist()
+
+
+# Parse the ?intensity= query parameter (e.g. "high,medium") into intensity levels
+def parse_intensity_levels(value):
+    levels_by_name = {level.lower(): level for level in INTENSITY_LEVELS}
+    levels_by_name['no-data'] = NO_DATA
+    
+    levels = []
+    for name in value.split(','):
+        name = name.strip().lower()
+        if name not in levels_by_name:
+            raise ValidationError({'intensity': f'Unknown intensity "{name}", expected a comma separated list of high, medium, low or no-data.'})
+        levels.append(levels_by_name[name])
+    return levels
+
+
+# Parse a date and time query parameter (e.g. ?from=2023-11-20T10:00:00Z), naive values are taken in the current time zone
+def parse_datetime_parameter(parameter, value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({parameter: 'Expected an ISO 8601 date and time, e.g. 2023-11-20T10:00:00Z.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+# A ?from= later than ?to= is refused instead of returning nothing
+def check_time_range(start, end):
+    if start is not None and end is not None and start > end:
+        raise ValidationError({'from': 'Expected a date and time before "to".'})
+
+
+# Move the id sequences of the given models past the highest id in their tables (needed after loading rows with explicit ids)
+def resync_sequences(models, using='default'):
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    return statements
@@ -0,0 +1,183 @@
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import Lag
+from django.utils import timezone
+from traffic_monitoring_api.settings import TRAJECTORY_BATCH_SIZE, TRAJECTORY_MAX_GAP_SECONDS, TRAJECTORY_PENDING_ID_SECONDS
+from .models import RoadSegments, SensorReadings, SegmentTransitions, SegmentTravelTimes, CarTrajectoryStates, TrajectoryWatermarks
+from .spatial import get_distance
+
+WATERMARK = 'sensor-readings'
+
+
+## TRAJECTORY ENGINE ------------------------------------------------------------------------------------------------
+# The sensor readings are processed incrementally in batches of ids after the watermark. A single windowed query orders the
+# passes of every car in the batch by time and gives each pass the previous one (LAG), and the first pass of a car in the
+# batch continues from the state saved for it by the previous batch. Two consecutive passes on different road segments
+# within TRAJECTORY_MAX_GAP_SECONDS are a transition, with its travel time and the speed implied by the distance between the
+# middles of the two segments.
+# A reading older than the saved state of its car arrived too late to be placed in its trajectory, so it is skipped. Run
+# 'python manage.py update_trajectories --rebuild' to recompute everything from the stored readings.
+# The readings are written by several transactions at once (the API and the ingestion thread), so a lower id can commit
+# after a higher one was processed. The ids the watermark moved past while they were missing are kept as pending ranges,
+# looked up again by the next batches for TRAJECTORY_PENDING_ID_SECONDS (an id that never appears was rolled back).
+
+# 1 - PROCESS THE NEXT BATCHES OF SENSOR READINGS
+def update_trajectories(batch_size=TRAJECTORY_BATCH_SIZE, max_batches=None):
+    totals = {'readings': 0, 'transitions': 0, 'late': 0, 'batches': 0}
+    while max_batches is None or totals['batches'] < max_batches:
+        batch = process_next_batch(batch_size)
+        if batch is None:
+            break
+        for key in ['readings', 'transitions', 'late']:
+            totals[key] += batch[key]
+        totals['batches'] += 1
+    return totals
+
+def process_next_batch(batch_size):
+    with transaction.atomic():
+        # Locked, so only one process updates the trajectories at a time
+        watermark, _ = TrajectoryWatermarks.objects.select_for_update().get_or_create(name=WATERMARK)
+        now = timezone.now()
+        pending_ids = [ids for ids in watermark.pending_ids if ids[2] > now.timestamp() - TRAJECTORY_PENDING_ID_SECONDS]
+        committed_ids = get_committed_ids(pending_ids)
+        ids = list(SensorReadings.objects.filter(id__gt=watermark.last_reading_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids and not committed_ids:
+            if pending_ids != watermark.pending_ids:
+                watermark.pending_ids = pending_ids
+                watermark.save()
+            return None
+        
+        last_id = ids[-1] if ids else watermark.last_reading_id
+        passes = list(get_batch_passes(watermark.last_reading_id, last_id, committed_ids))
+        transitions, states = get_transitions(passes)
+        save_transitions(transitions)
+        CarTrajectoryStates.objects.bulk_create(states, update_conflicts=True, unique_fields=['car'],
+                                                update_fields=['reading_id', 'road_segment', 'timestamp'])
+        
+        watermark.pending_ids = remove_ids(pending_ids, committed_ids) + get_missing_ids(watermark.last_reading_id, ids, now.timestamp())
+        watermark.last_reading_id = last_id
+        watermark.updated_at = now
+        watermark.save()
+    
+    total = len(ids) + len(committed_ids)
+    return {'readings': total, 'transitions': len(transitions), 'late': total - len(passes)}
+
+# Ranges [first id, last id, seen at] of the ids missing between the watermark and the ids of the batch
+def get_missing_ids(after_id, ids, seen_at):
+    ranges = []
+    previous_id = after_id
+    for reading_id in ids:
+        if reading_id > previous_id + 1:
+            ranges.append([previous_id + 1, reading_id - 1, seen_at])
+        previous_id = reading_id
+    return ranges
+
+# The pending ids that were committed since
+def get_committed_ids(pending_ids):
+    if not pending_ids:
+        return []
+    in_ranges = Q()
+    for first_id, last_id, _ in pending_ids:
+        in_ranges |= Q(id__gte=first_id, id__lte=last_id)
+    return list(SensorReadings.objects.filter(in_ranges).order_by('id').values_list('id', flat=True))
+
+def remove_ids(pending_ids, found_ids):
+    remaining = []
+    for first_id, last_id, seen_at in pending_ids:
+        for reading_id in found_ids:
+            if first_id <= reading_id <= last_id:
+                if reading_id > first_id:
+                    remaining.append([first_id, reading_id - 1, seen_at])
+                first_id = reading_id + 1
+        if first_id <= last_id:
+            remaining.append([first_id, last_id, seen_at])
+    return remaining
+
+# The passes of the batch (and of the pending ids that were committed since) ordered by car and time, each with the
+# previous pass of its car in the batch and the saved state of the car
+def get_batch_passes(after_id, last_id, committed_ids=()):
+    car_order = {'partition_by': [F('car_license_plate')], 'order_by': [F('timestamp').asc(), F('id').asc()]}
+    return (SensorReadings.objects
+            .filter(Q(id__gt=after_id, id__lte=last_id) | Q(id__in=committed_ids))
+            .filter(Q(car_license_plate__trajectory_state__isnull=True) | Q(timestamp__gte=F('car_license_plate__trajectory_state__timestamp')))
+            .annotate(previous_id=Window(Lag('id'), **car_order),
+                      previous_segment_id=Window(Lag('road_segment_id'), **car_order),
+                      previous_timestamp=Window(Lag('timestamp'), **car_order))
+            .order_by('car_license_plate', 'timestamp', 'id')
+            .values('id', 'car_license_plate_id', 'road_segment_id_id', 'timestamp', 'previous_id', 'previous_segment_id', 'previous_timestamp',
+                    'car_license_plate__trajectory_state__reading_id', 'car_license_plate__trajectory_state__road_segment_id',
+                    'car_license_plate__trajectory_state__timestamp'))
+
+def get_transitions(passes):
+    segment_ids = {row['road_segment_id_id'] for row in passes} | {row['car_license_plate__trajectory_state__road_segment_id'] for row in passes}
+    middles = {segment_id: ((long_start + long_end) / 2, (lat_start + lat_end) / 2) for segment_id, long_start, lat_start, long_end, lat_end in
+               RoadSegments.objects.filter(id__in=segment_ids - {None}).values_list('id', 'long_start', 'lat_start', 'long_end', 'lat_end')}
+    
+    transitions, states = [], {}
+    for row in passes:
+        if row['previous_id'] is not None:
+            previous = (row['previous_id'], row['previous_segment_id'], row['previous_timestamp'])
+        else:
+            previous = (row['car_license_plate__trajectory_state__reading_id'], row['car_license_plate__trajectory_state__road_segment_id'],
+                        row['car_license_plate__trajectory_state__timestamp'])
+        
+        previous_id, previous_segment_id, previous_timestamp = previous
+        if previous_id is not None and previous_segment_id != row['road_segment_id_id'] and previous_segment_id in middles:
+            seconds = (row['timestamp'] - previous_timestamp).total_seconds()
+            if 0 < seconds <= TRAJECTORY_MAX_GAP_SECONDS:
+                distance = get_distance(*middles[previous_segment_id], *middles[row['road_segment_id_id']])
+                transitions.append(SegmentTransitions(
+                    car_id=row['car_license_plate_id'], from_segment_id=previous_segment_id, to_segment_id=row['road_segment_id_id'],
+                    from_reading_id=previous_id, to_reading_id=row['id'], departed_at=previous_timestamp, arrived_at=row['timestamp'],
+                    travel_seconds=seconds, distance=round(distance, 1), speed=round(distance / seconds * 3.6, 2)))
+        
+        # The passes are ordered by time, so the last one of each car is its new state
+        states[row['car_license_plate_id']] = CarTrajectoryStates(car_id=row['car_license_plate_id'], reading_id=row['id'],
+                                                                  road_segment_id=row['road_segment_id_id'], timestamp=row['timestamp'])
+    return transitions, list(states.values())
+
+# 2 - ADD THE TRANSITIONS TO THE TRAVEL TIME STATISTICS OF THEIR PAIRS OF ROAD SEGMENTS
+def save_transitions(transitions):
+    if not transitions:
+        return
+    SegmentTransitions.objects.bulk_create(transitions, batch_size=1000, ignore_conflicts=True)
+    
+    pairs = defaultdict(list)
+    for transition in transitions:
+        pairs[(transition.from_segment_id, transition.to_segment_id)].append(transition)
+    
+    existing = {(travel_time.from_segment_id, travel_time.to_segment_id): travel_time for travel_time in
+                SegmentTravelTimes.objects.filter(from_segment_id__in={pair[0] for pair in pairs}, to_segment_id__in={pair[1] for pair in pairs})
+                if (travel_time.from_segment_id, travel_time.to_segment_id) in pairs}
+    
+    now = timezone.now()
+    new_travel_times = []
+    for pair, pair_transitions in pairs.items():
+        travel_time = existing.get(pair)
+        if travel_time is None:
+            travel_time = SegmentTravelTimes(from_segment_id=pair[0], to_segment_id=pair[1])
+            new_travel_times.append(travel_time)
+        for transition in pair_transitions:
+            add_transition(travel_time, transition)
+        travel_time.updated_at = now
+    
+    SegmentTravelTimes.objects.bulk_update(existing.values(), ['transitions_count', 'seconds_sum', 'seconds_squares_sum', 'seconds_min',
+                                                               'seconds_max', 'speed_sum', 'updated_at'], batch_size=1000)
+    SegmentTravelTimes.objects.bulk_create(new_travel_times, batch_size=1000)
+
+def add_transition(travel_time, transition):
+    seconds = transition.travel_seconds
+    travel_time.transitions_count += 1
+    travel_time.seconds_sum += seconds
+    travel_time.seconds_squares_sum += seconds ** 2
+    travel_time.seconds_min = seconds if travel_time.seconds_min is None else min(travel_time.seconds_min, seconds)
+    travel_time.seconds_max = seconds if travel_time.seconds_max is None else max(travel_time.seconds_max, seconds)
+    travel_time.speed_sum += transition.speed
+
+# 3 - RECOMPUTE EVERY TRAJECTORY FROM THE STORED SENSOR READINGS
+def rebuild_trajectories(batch_size=TRAJECTORY_BATCH_SIZE):
+    with transaction.atomic():
+        for model in [SegmentTransitions, SegmentTravelTimes, CarTrajectoryStates, TrajectoryWatermarks]:
+            model.objects.all().delete()
+        return update_trajectories(batch_size=batch_size)
\ No newline at end of file
@@ -1,10 +1,11 @@
-from django.urls import path
+from django.urls import path, re_path
 from .views import (TrafficReadingsView, TrafficReadingsUpdateView, CreateTrafficReadingView,
                     HighIntensityTrafficReadingsView, MediumIntensityTrafficReadingsView, LowIntensityTrafficReadingsView,
                     RoadSegmentsView, RoadSegmentsUpdateView, CreateRoadSegmentView,
-                    HighIntensityRoadSegmentsView, MediumIntensityRoadSegmentsView, LowIntensityRoadSegmentsView,
-                    SensorsView, SensorsUpdateView, SensorReadingsView, CreateSensorReadingView, SensorReadingsUpdateView,
-                    CarsView, CarDetailsView)
+                    HighIntensityRoadSegmentsView, MediumIntensityRoadSegmentsView, LowIntensityRoadSegmentsView, RoadSegmentHistoryView, NearestRoadSegmentsView,
+                    RoadSegmentTravelTimesView, IntensityStreamView, RoadSegmentStatsView, RoadSegmentsStatsView,
+                    SensorsView, SensorsUpdateView, SensorReadingsView, CreateSensorReadingView, BulkCreateSensorReadingView, IngestSensorReadingsView, SensorReadingsUpdateView,
+                    CarsView, CarDetailsView, CarTrajectoryView, ExportView, ResponseCacheStatsView, MetricsView)
 
 
 urlpatterns = [
@@ -22,6 +23,12 @@ urlpatterns = [
     # Road Segments
     path('road-segments/', RoadSegmentsView.as_view(), name='all-road-segments'),
     path('road-segments/<int:pk>/', RoadSegmentsUpdateView.as_view(), name='individual-road-segment'),
+    path('road-segments/intensity-stream/', IntensityStreamView.as_view(), name='road-segments-intensity-stream'),
+    path('road-segments/nearest/', NearestRoadSegmentsView.as_view(), name='nearest-road-segments'),
+    path('road-segments/<int:pk>/history/', RoadSegmentHistoryView.as_view(), name='road-segment-history'),
+    path('road-segments/<int:pk>/travel-times/', RoadSegmentTravelTimesView.as_view(), name='road-segment-travel-times'),
+    path('road-segments/<int:pk>/stats/', RoadSegmentStatsView.as_view(), name='road-segment-stats'),
+    path('road-segments/stats/', RoadSegmentsStatsView.as_view(), name='road-segments-stats'),
     path('road-segments/high-intensity/', HighIntensityRoadSegmentsView.as_view(), name='high-intensity-road-segments'),
     path('road-segments/medium-intensity/', MediumIntensityRoadSegmentsView.as_view(), name='medium-intensity-road-segments'),
     path('road-segments/low-intensity/', LowIntensityRoadSegmentsView.as_view(), name='low-intensity-road-segments'),
@@ -33,8 +40,20 @@ urlpatterns = [
     path('sensors-readings/', SensorReadingsView.as_view(), name='sensors-readings'),
     path('sensors-readings/<int:pk>/', SensorReadingsUpdateView.as_view(), name='individual-sensor-readings'),
     path('create-sensor-reading/', CreateSensorReadingView.as_view(), name='create-sensor-reading'),
+    path('create-sensor-readings/bulk/', BulkCreateSensorReadingView.as_view(), name='bulk-create-sensor-readings'),
+    path('ingest/sensor-readings/', IngestSensorReadingsView.as_view(), name='ingest-sensor-readings'),
     
     # Cars
     path('cars/', CarsView.as_view(), name='all-cars'),
     path('cars/<str:car_license_plate>/', CarDetailsView.as_view(), name='individual-car'),
+    path('cars/<str:car_license_plate>/trajectory/', CarTrajectoryView.as_view(), name='car-trajectory'),
+    
+    # Exports
+    re_path(r'^export/(?P<resource>[a-z-]+)\.(?P<file_format>ndjson|csv)$', ExportView.as_view(), name='export'),
+    
+    # Response cache
+    path('cache-stats/', ResponseCacheStatsView.as_view(), name='cache-stats'),
+    
+    # Metrics
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
@@ -1,24 +1,73 @@
 from rest_framework import status
-from rest_framework.generics import ListAPIView, RetrieveUpdateDestroyAPIView, CreateAPIView, RetrieveAPIView
+from rest_framework.generics import ListAPIView, RetrieveUpdateDestroyAPIView, CreateAPIView, RetrieveAPIView, get_object_or_404
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.settings import api_settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.views import View
+from asgiref.sync import sync_to_async
 from django.utils import timezone
-from django.db.models import Q, OuterRef, Subquery, F
 from datetime import timedelta
-from traffic_monitoring_api.settings import LOW_SPEED_THRESHOLD, HIGH_SPEED_THRESHOLD
-from .permissions import IsAdminOrReadOnly, IsAnonymousReadOnly, HasAPIKey
-from .models import TrafficReadings, RoadSegments, Sensors, SensorReadings, Cars
+import math
+from traffic_monitoring_api.settings import (SENSOR_READINGS_BULK_MAX_ROWS, HISTORY_MAX_BUCKETS, STREAM_RETRY_MILLISECONDS, ROAD_SEGMENT_READINGS_LIMIT,
+                                             STATS_DEFAULT_PERCENTILES, STATS_MAX_SEGMENTS, STATS_MAX_SKETCHES)
+from .parsers import NDJSONParser
+from .ingestion import bulk_create_sensor_readings
+from .ingestion_queue import get_ingestion_writer, IngestionQueueFull
+from .idempotency import idempotent
+from .exports import get_export_rows, EXPORT_FORMATS, ExportContentNegotiation
+from .pagination import TimestampCursorPagination
+from .caching import CachedResponseMixin, get_cache_stats
+from .row_serializers import (RowListMixin, TrafficReadingRows, RoadSegmentRows, SensorRows, SensorReadingRows, CarRows,
+                              get_requested_fields, get_expand_limit, get_latest_traffic_readings)
+from .metrics import metrics_registry
+from .routers import get_read_database
+from .streaming import get_intensity_hub, get_snapshot_event, stream_events, TooManySubscribers
+from .renderers import PrometheusRenderer
+from .traffic_api_helpers import intensity_case, intensity_filter, parse_intensity_levels, parse_datetime_parameter, check_time_range
+from .rollups import ROLLUP_BUCKETS, ALL_TIME_BUCKET
+from .sketches import SpeedSketch, merge_sketches, get_sketch_stats
+from .spatial import get_segment_index, get_bbox_filter, parse_bbox
+from .authentication import SensorApiKeyAuthentication
+from .permissions import IsAdminOrReadOnly, IsAnonymousReadOnly, HasAPIKey, HasMetricsToken
+from .models import TrafficReadings, RoadSegments, Sensors, SensorReadings, Cars, SegmentSpeedRollups
 from .serializers import (TrafficReadingsSerializer, CreateTrafficReadingSerializer,
                         RoadSegmentsSerializer, CreateRoadSegmentSerializer,
-                        SensorsSerializer, SensorReadingsSerializer, CreateSensorReadingSerializer,
-                        CarsSerializer)
+                        SensorsSerializer, SensorReadingsSerializer, CreateSensorReadingSerializer, BulkSensorReadingRowSerializer,
+                        SegmentSpeedHistorySerializer, CarsSerializer, SegmentTransitionsSerializer, SegmentTravelTimesSerializer)
 
 
 
 ## TRAFFIC READINGS ---------------------------------------------------------------------------------------------
-# 1 - ALL TRAFFIC READINGS
-class TrafficReadingsView(ListAPIView):
-    queryset = TrafficReadings.objects.all()
+# Filter for the list views by intensity, either fixed by the view or chosen with ?intensity=high,medium
+class IntensityFilterMixin:
+    intensity_levels = None
+    
+    def get_intensity_levels(self):
+        if self.intensity_levels is not None:
+            return self.intensity_levels
+        
+        value = self.request.query_params.get('intensity')
+        if value:
+            return parse_intensity_levels(value)
+        return None
+
+# 1 - ALL TRAFFIC READINGS (the intensity is classified by the database, and the responses are cached until the next write)
+class TrafficReadingsView(CachedResponseMixin, IntensityFilterMixin, RowListMixin, ListAPIView):
     serializer_class = TrafficReadingsSerializer
+    row_serializer_class = TrafficReadingRows
+    
+    def get_queryset(self):
+        queryset = TrafficReadings.objects.annotate(intensity_level=intensity_case())
+        
+        intensity_levels = self.get_intensity_levels()
+        if intensity_levels:
+            queryset = queryset.filter(intensity_filter(intensity_levels))
+        return queryset
 
 # 2 - UPDATE OR DELETE INDIVIDUAL TRAFFIC READINGS (only for admin use)
 class TrafficReadingsUpdateView(RetrieveUpdateDestroyAPIView):
@@ -30,20 +79,17 @@ class TrafficReadingsUpdateView(RetrieveUpdateDestroyAPIView):
     queryset = TrafficReadings.objects.all()
     serializer_class = TrafficReadingsSerializer
 
-# 3 - HIGH INTENSITY TRAFFIC READINGS
-class HighIntensityTrafficReadingsView(ListAPIView):
-    queryset = TrafficReadings.objects.filter(speed__lte = LOW_SPEED_THRESHOLD)
-    serializer_class = TrafficReadingsSerializer
+# 3 - HIGH INTENSITY TRAFFIC READINGS (same as /traffic-readings/?intensity=high)
+class HighIntensityTrafficReadingsView(TrafficReadingsView):
+    intensity_levels = ['High']
 
-# 4 - MEDIUM INTENSITY TRAFFIC READINGS
-class MediumIntensityTrafficReadingsView(ListAPIView):
-    queryset = TrafficReadings.objects.filter(speed__gt = LOW_SPEED_THRESHOLD, speed__lte = HIGH_SPEED_THRESHOLD)
-    serializer_class = TrafficReadingsSerializer
+# 4 - MEDIUM INTENSITY TRAFFIC READINGS (same as /traffic-readings/?intensity=medium)
+class MediumIntensityTrafficReadingsView(TrafficReadingsView):
+    intensity_levels = ['Medium']
 
-# 5 - LOW INTENSITY TRAFFIC READINGS
-class LowIntensityTrafficReadingsView(ListAPIView):
-    queryset = TrafficReadings.objects.filter(speed__gt = HIGH_SPEED_THRESHOLD)
-    serializer_class = TrafficReadingsSerializer
+# 5 - LOW INTENSITY TRAFFIC READINGS (same as /traffic-readings/?intensity=low)
+class LowIntensityTrafficReadingsView(TrafficReadingsView):
+    intensity_levels = ['Low']
 
 # 6 - CREATE TRAFFIC READING (only for admin use)
 class CreateTrafficReadingView(CreateAPIView):
@@ -58,85 +104,57 @@ class CreateTrafficReadingView(CreateAPIView):
 
 
 ## ROAD SEGMENTS ------------------------------------------------------------------------------------------------
-# 7 - ALL ROAD SEGMENTS
-class RoadSegmentsView(ListAPIView):
-    queryset = RoadSegments.objects.all()
+# 7 - ALL ROAD SEGMENTS (filtered by the intensity of their latest reading with ?intensity=high,medium,
+# and by the visible area of the map with ?bbox=minlon,minlat,maxlon,maxlat), cached until the next write. The map asks for
+# ?fields=id,long_start,lat_start,long_end,lat_end,intensity, and ?expand=traffic_readings&expand_limit= adds the latest readings.
+class RoadSegmentsView(CachedResponseMixin, IntensityFilterMixin, RowListMixin, ListAPIView):
     serializer_class = RoadSegmentsSerializer
+    row_serializer_class = RoadSegmentRows
+    expandable_fields = {'traffic_readings': get_latest_traffic_readings}
+    
+    def get_queryset(self):
+        queryset = RoadSegments.objects.select_related('current_state')
+        
+        intensity_levels = self.get_intensity_levels()
+        if intensity_levels:
+            queryset = queryset.filter(current_state__intensity__in=intensity_levels)
+        
+        bbox = self.request.query_params.get('bbox')
+        if bbox:
+            queryset = queryset.filter(get_bbox_filter(*parse_bbox(bbox)))
+        return queryset
 
-# 8 - UPDATE OR DELETE INDIVIDUAL ROAD SEGMENTS (only for admin use)
+# 8 - UPDATE OR DELETE INDIVIDUAL ROAD SEGMENTS (only for admin use). The segment is read with the fields of ?fields=, and
+# with its latest ROAD_SEGMENT_READINGS_LIMIT readings, newest first (or ?expand_limit=, the full history is in the exports).
 class RoadSegmentsUpdateView(RetrieveUpdateDestroyAPIView):
-    queryset = RoadSegments.objects.all()
+    queryset = RoadSegments.objects.select_related('current_state')
     serializer_class = RoadSegmentsSerializer
     
     def get(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        traffic_readings = instance.trafficreadings_set.all()
-        traffic_readings_serializer = TrafficReadingsSerializer(traffic_readings, many=True)
+        row_serializer = RoadSegmentRows(get_requested_fields(request))
+        limit = get_expand_limit(request, ROAD_SEGMENT_READINGS_LIMIT)
+        road_segment = get_object_or_404(row_serializer.get_values(self.get_queryset().filter(pk=kwargs['pk']), ['id']))
+        traffic_readings = get_latest_traffic_readings([road_segment['id']], limit)
         
-        return Response({'road_segment': serializer.data, 'traffic_readings': traffic_readings_serializer.data})
+        return Response({'road_segment': row_serializer.to_representation([road_segment])[0],
+                         'traffic_readings': traffic_readings.get(road_segment['id'], [])})
     
     def get_permissions(self):
         if self.request.user.is_staff:
             return [IsAdminOrReadOnly()]
         return [IsAnonymousReadOnly()]
 
-# 9 - HIGH INTENSITY ROAD SEGMENTS
-class HighIntensityRoadSegmentsView(ListAPIView):
-    def get_queryset(self):
-        # Get the latest TrafficReading for each RoadSegment
-        latest_readings = TrafficReadings.objects.filter(id=OuterRef('pk')).order_by('-id')
-        
-        # Get all road segments where the latest traffic reading has high intensity
-        high_intensity_road_segments = RoadSegments.objects.annotate(latest_reading_id=Subquery(latest_readings.values('id')[:1])
-        ).filter(Q(trafficreadings__id=F('latest_reading_id')) & Q(trafficreadings__speed__lte=LOW_SPEED_THRESHOLD))
-        
-        return high_intensity_road_segments
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        
-        # Serialize the road segments
-        serializer = RoadSegmentsSerializer(queryset, many=True)
-        return Response(serializer.data)
+# 9 - HIGH INTENSITY ROAD SEGMENTS (same as /road-segments/?intensity=high)
+class HighIntensityRoadSegmentsView(RoadSegmentsView):
+    intensity_levels = ['High']
 
-# 10 - MEDIUM INTENSITY ROAD SEGMENTS
-class MediumIntensityRoadSegmentsView(ListAPIView):
-    def get_queryset(self):
-        # Get the latest TrafficReading for each RoadSegment
-        latest_readings = TrafficReadings.objects.filter(id=OuterRef('pk')).order_by('-id')
-        
-        # Get all road segments where the latest traffic reading has medium intensity
-        medium_intensity_road_segments = RoadSegments.objects.annotate(latest_reading_id=Subquery(latest_readings.values('id')[:1])
-        ).filter(Q(trafficreadings__id=F('latest_reading_id')) & Q(trafficreadings__speed__gt = LOW_SPEED_THRESHOLD, trafficreadings__speed__lte = HIGH_SPEED_THRESHOLD))
-        
-        return medium_intensity_road_segments
+# 10 - MEDIUM INTENSITY ROAD SEGMENTS (same as /road-segments/?intensity=medium)
+class MediumIntensityRoadSegmentsView(RoadSegmentsView):
+    intensity_levels = ['Medium']
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        
-        # Serialize the road segments
-        serializer = RoadSegmentsSerializer(queryset, many=True)
-        return Response(serializer.data)
-
-# 11 - LOW INTENSITY ROAD SEGMENTS
-class LowIntensityRoadSegmentsView(ListAPIView):
-    def get_queryset(self):
-        # Get the latest TrafficReading for each RoadSegment
-        latest_readings = TrafficReadings.objects.filter(id=OuterRef('pk')).order_by('-id')
-        
-        # Get all road segments where the latest traffic reading has low intensity
-        low_intensity_road_segments = RoadSegments.objects.annotate(latest_reading_id=Subquery(latest_readings.values('id')[:1])
-        ).filter(Q(trafficreadings__id=F('latest_reading_id')) & Q(trafficreadings__speed__gt = HIGH_SPEED_THRESHOLD))
-        
-        return low_intensity_road_segments
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        
-        # Serialize the road segments
-        serializer = RoadSegmentsSerializer(queryset, many=True)
-        return Response(serializer.data)
+# 11 - LOW INTENSITY ROAD SEGMENTS (same as /road-segments/?intensity=low)
+class LowIntensityRoadSegmentsView(RoadSegmentsView):
+    intensity_levels = ['Low']
 
 # 12 - CREATE ROAD SEGMENT (only for admin use)
 class CreateRoadSegmentView(CreateAPIView):
@@ -149,14 +167,81 @@ class CreateRoadSegmentView(CreateAPIView):
         return [IsAnonymousReadOnly()]
 
 
+# 13 - ROAD SEGMENTS NEAREST TO A POINT (?lon=&lat=&limit=, with the distance in meters)
+class NearestRoadSegmentsView(APIView):
+    max_limit = 50
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            lon, lat = float(request.query_params['lon']), float(request.query_params['lat'])
+            limit = int(request.query_params.get('limit', 1))
+        except (KeyError, ValueError):
+            raise ValidationError({'detail': 'Expected the numbers ?lon=, ?lat= and optionally ?limit=.'})
+        if not 1 <= limit <= self.max_limit:
+            raise ValidationError({'limit': f'Expected a limit between 1 and {self.max_limit}.'})
+        
+        nearest = get_segment_index().nearest(lon, lat, limit=limit)
+        road_segments = RoadSegments.objects.select_related('current_state').in_bulk([segment_id for _, segment_id in nearest])
+        
+        results = []
+        for distance, segment_id in nearest:
+            if segment_id in road_segments:
+                results.append(dict(RoadSegmentsSerializer(road_segments[segment_id]).data, distance=distance))
+        return Response(results)
+
+# Rollup buckets chosen with ?bucket=5m|1h|1d&from=&to=, for the history and the speed statistics
+class BucketRangeMixin:
+    # Time range shown when ?from= is not given
+    default_ranges = {'5m': timedelta(days=1), '1h': timedelta(days=7), '1d': timedelta(days=90)}
+    
+    def get_bucket_range(self):
+        query_params = self.request.query_params
+        bucket = query_params.get('bucket', '1h')
+        if bucket not in ROLLUP_BUCKETS:
+            raise ValidationError({'bucket': f'Expected one of: {", ".join(ROLLUP_BUCKETS)}.'})
+        
+        end = parse_datetime_parameter('to', query_params['to']) if 'to' in query_params else timezone.now()
+        start = parse_datetime_parameter('from', query_params['from']) if 'from' in query_params else end - self.default_ranges[bucket]
+        check_time_range(start, end)
+        if (end - start) / ROLLUP_BUCKETS[bucket] > HISTORY_MAX_BUCKETS:
+            raise ValidationError({'from': f'The time range can have at most {HISTORY_MAX_BUCKETS} buckets of {bucket}.'})
+        return bucket, start, end
+
+# 14 - SPEED HISTORY OF A ROAD SEGMENT (?bucket=5m|1h|1d&from=&to=, served from the rollup tables)
+class RoadSegmentHistoryView(BucketRangeMixin, ListAPIView):
+    serializer_class = SegmentSpeedHistorySerializer
+    pagination_class = None
+    
+    def get_queryset(self):
+        road_segment = get_object_or_404(RoadSegments, pk=self.kwargs['pk'])
+        bucket, start, end = self.get_bucket_range()
+        return SegmentSpeedRollups.objects.filter(road_segment=road_segment, bucket=bucket, bucket_start__gte=start,
+                                                  bucket_start__lt=end).order_by('bucket_start')
+
+# 15 - TRAVEL TIMES FROM A ROAD SEGMENT TO THE NEXT ONES (or from the previous ones with ?direction=incoming), observed from the cars
+class RoadSegmentTravelTimesView(ListAPIView):
+    serializer_class = SegmentTravelTimesSerializer
+    pagination_class = None
+    
+    def get_queryset(self):
+        road_segment = get_object_or_404(RoadSegments, pk=self.kwargs['pk'])
+        
+        direction = self.request.query_params.get('direction', 'outgoing')
+        if direction not in ('outgoing', 'incoming'):
+            raise ValidationError({'direction': 'Expected one of: outgoing, incoming.'})
+        
+        travel_times = road_segment.outgoing_travel_times if direction == 'outgoing' else road_segment.incoming_travel_times
+        return travel_times.order_by('-transitions_count', 'id')
+
 
 ## SENSORS ------------------------------------------------------------------------------------------------------
-# 13 - ALL SENSORS
-class SensorsView(ListAPIView):
+# 16 - ALL SENSORS
+class SensorsView(RowListMixin, ListAPIView):
     queryset = Sensors.objects.all()
     serializer_class = SensorsSerializer
+    row_serializer_class = SensorRows
 
-# 14 - UPDATE OR DELETE INDIVIDUAL SENSORS (only for admin use)
+# 17 - UPDATE OR DELETE INDIVIDUAL SENSORS (only for admin use)
 class SensorsUpdateView(RetrieveUpdateDestroyAPIView):
     def get_permissions(self):
         if self.request.user.is_staff:
@@ -166,12 +251,14 @@ class SensorsUpdateView(RetrieveUpdateDestroyAPIView):
     queryset = Sensors.objects.all()
     serializer_class = SensorsSerializer
 
-# 15 - ALL SENSOR READINGS
-class SensorReadingsView(ListAPIView):
+# 18 - ALL SENSOR READINGS
+class SensorReadingsView(RowListMixin, ListAPIView):
     queryset = SensorReadings.objects.all()
     serializer_class = SensorReadingsSerializer
+    row_serializer_class = SensorReadingRows
+    pagination_class = TimestampCursorPagination
 
-# 16 - UPDATE OR DELETE INDIVIDUAL SENSOR READINGS (only for admin use)
+# 19 - UPDATE OR DELETE INDIVIDUAL SENSOR READINGS (only for admin use)
 class SensorReadingsUpdateView(RetrieveUpdateDestroyAPIView):
     def get_permissions(self):
         if self.request.user.is_staff:
@@ -181,22 +268,133 @@ class SensorReadingsUpdateView(RetrieveUpdateDestroyAPIView):
     queryset = SensorReadings.objects.all()
     serializer_class = SensorReadingsSerializer
 
-# 17 - CREATE NEW SENSOR READING (for admin use only)
+# 20 - CREATE NEW SENSOR READING (for admin use only, and safe to retry with an Idempotency-Key header)
 class CreateSensorReadingView(CreateAPIView):
     query_set = SensorReadings.objects.all()
     serializer_class = CreateSensorReadingSerializer
     permission_classes = [IsAdminOrReadOnly]
+    
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+    
+    # A pass that was already recorded (e.g. sent again after a timeout) gets the stored reading back, with 200 OK
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        if serializer.recorded_reading is not None:
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(serializer.data))
+
+# Validation of the rows sent to the bulk and queued ingestion views, by an admin or by a sensor with its API key.
+# A sensor can leave out sensor_uuid, and can only send its own readings.
+class SensorReadingRowsMixin:
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES + [SensorApiKeyAuthentication]
+    parser_classes = [JSONParser, NDJSONParser]
+    
+    def validate_rows(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            raise ValidationError({'detail': 'Expected a list of sensor readings.'})
+        if len(rows) > SENSOR_READINGS_BULK_MAX_ROWS:
+            raise ValidationError({'detail': f'A batch can have at most {SENSOR_READINGS_BULK_MAX_ROWS} sensor readings.'})
+        
+        # Validate every row on its own, so an invalid row does not abort the rest of the batch
+        sensor = getattr(request, 'sensor', None)
+        errors = {}
+        valid_rows = []
+        for index, row in enumerate(rows):
+            if sensor is not None and isinstance(row, dict):
+                row = dict(row, sensor_uuid=row.get('sensor_uuid', sensor.id))
+            
+            serializer = BulkSensorReadingRowSerializer(data=row)
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+            elif sensor is not None and serializer.validated_data['sensor_uuid'] != sensor.id:
+                errors[index] = {'sensor_uuid': ['A sensor can only send its own readings.']}
+            else:
+                valid_rows.append((index, serializer.validated_data))
+        return valid_rows, errors
+    
+    def get_errors_list(self, errors):
+        return [{'index': index, 'errors': errors[index]} for index in sorted(errors)]
+
+# 21 - BULK CREATE SENSOR READINGS (for admin use, or for a sensor with its API key, and safe to retry with an Idempotency-Key header)
+class BulkCreateSensorReadingView(SensorReadingRowsMixin, APIView):
+    permission_classes = [IsAdminOrReadOnly | HasAPIKey]
+    
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        valid_rows, errors = self.validate_rows(request)
+        
+        created, bulk_errors = bulk_create_sensor_readings(valid_rows)
+        errors.update(bulk_errors)
+        
+        # The passes that were already recorded (even by another process during the insert) are neither created nor errors
+        duplicates = len(valid_rows) - len(created) - len(bulk_errors)
+        response_status = status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST
+        return Response({'created': len(created), 'duplicates': duplicates, 'errors': self.get_errors_list(errors)}, status=response_status)
+
+# 22 - QUEUED INGESTION OF SENSOR READINGS (for admin use, or for a sensor with its API key, and safe to retry with an Idempotency-Key header)
+# The rows are validated and acknowledged right away, and written in batches by the background writer. The references to
+# road segments and sensors are checked when the batch is written, so only the shape of the rows is reported here.
+class IngestSensorReadingsView(SensorReadingRowsMixin, APIView):
+    permission_classes = [IsAdminUser | HasAPIKey]
+    
+    def get(self, request, *args, **kwargs):
+        return Response(get_ingestion_writer().get_stats())
+    
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        valid_rows, errors = self.validate_rows(request)
+        
+        try:
+            get_ingestion_writer().submit([row for _, row in valid_rows])
+        except IngestionQueueFull:
+            return Response({'detail': 'The ingestion queue is full, try again later.'},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': '1'})
+        
+        response_status = status.HTTP_202_ACCEPTED if valid_rows or not errors else status.HTTP_400_BAD_REQUEST
+        return Response({'accepted': len(valid_rows), 'errors': self.get_errors_list(errors)}, status=response_status)
 
 
 
 ## CARS ---------------------------------------------------------------------------------------------------------
-# 18 - ALL CARS
-class CarsView(ListAPIView):
-    queryset = Cars.objects.all()
+# 23 - ALL CARS (looked up by plate with ?plate= for an exact match, ?plate_prefix= or ?search= for a partial match)
+class CarsView(RowListMixin, ListAPIView):
     serializer_class = CarsSerializer
-
-# 19 - INDIVIDUAL CARS
-class CarDetailsView(RetrieveAPIView):
+    row_serializer_class = CarRows
+    
+    def get_queryset(self):
+        queryset = Cars.objects.all()
+        query_params = self.request.query_params
+        
+        if 'plate' in query_params:
+            queryset = queryset.filter(car_license_plate=query_params['plate'])
+        if 'plate_prefix' in query_params:
+            queryset = queryset.filter(car_license_plate__startswith=query_params['plate_prefix'])
+        
+        # Uses the trigram index on PostgreSQL when the pg_trgm extension is available
+        if 'search' in query_params:
+            queryset = queryset.filter(car_license_plate__icontains=query_params['search'])
+        return queryset
+
+# Time window of the car views (the last ?hours=, 24 by default)
+class CarTimeWindowMixin:
+    max_hours = 24 * 365
+    
+    def get_cutoff_time(self, request):
+        try:
+            hours = int(request.query_params.get('hours', 24))
+        except ValueError:
+            hours = 0
+        if not 1 <= hours <= self.max_hours:
+            raise ValidationError({'hours': f'Expected a whole number of hours between 1 and {self.max_hours}.'})
+        return timezone.now() - timedelta(hours=hours)
+
+# 24 - INDIVIDUAL CARS (with the sensor readings of the last ?hours=, 24 by default)
+class CarDetailsView(CarTimeWindowMixin, RetrieveAPIView):
     queryset = Cars.objects.all()
     serializer_class = CarsSerializer
     
@@ -206,26 +404,20 @@ class CarDetailsView(RetrieveAPIView):
         return [IsAnonymousReadOnly()]
     
     def get(self, request, car_license_plate, *args, **kwargs):
-        license_plate = car_license_plate
-        cars = Cars.objects.filter(Q(car_license_plate__icontains=license_plate))
-        serializer = CarsSerializer(cars, many=True)
-        
-        car_instance = cars.first()
+        cutoff_time = self.get_cutoff_time(request)
+        car_instance = get_object_or_404(Cars, car_license_plate=car_license_plate)
+        serializer = CarsSerializer([car_instance], many=True)
         
-        # Filter sensor readings for the last 24 hours
-        cutoff_time = timezone.now() - timedelta(hours=24)
-        sensor_readings = car_instance.sensorreadings_set.filter(timestamp__gte=cutoff_time)
+        # Get the sensor readings of the time window together with their road segments and sensors, in a single query
+        sensor_readings = list(car_instance.sensorreadings_set.filter(timestamp__gte=cutoff_time)
+                               .select_related('road_segment_id__current_state', 'sensor_uuid').order_by('timestamp', 'id'))
         sensor_readings_serializer = SensorReadingsSerializer(sensor_readings, many=True)
-
-        # Extract road segment and sensor IDs from the filtered sensor readings
-        road_segment_ids = sensor_readings.values_list('road_segment_id', flat=True).distinct()
-        sensor_ids = sensor_readings.values_list('sensor_uuid', flat=True).distinct()
-
-        # Retrieve related road segments and sensors for the last 24 hours
-        road_segments_data = RoadSegments.objects.filter(id__in=road_segment_ids)
+        
+        # Extract the distinct road segments and sensors from the readings
+        road_segments_data = sorted({reading.road_segment_id.id: reading.road_segment_id for reading in sensor_readings}.values(), key=lambda segment: segment.id)
         road_segments_serializer = RoadSegmentsSerializer(road_segments_data, many=True)
-
-        sensors_data = Sensors.objects.filter(id__in=sensor_ids)
+        
+        sensors_data = sorted({reading.sensor_uuid.id: reading.sensor_uuid for reading in sensor_readings}.values(), key=lambda sensor: sensor.id)
         sensors_serializer = SensorsSerializer(sensors_data, many=True)
         
         return Response({
@@ -233,4 +425,153 @@ class CarDetailsView(RetrieveAPIView):
             'sensor_readings': sensor_readings_serializer.data,
             'sensors': sensors_serializer.data,
             'road_segments': road_segments_serializer.data,
-        })
\ No newline at end of file
+        })
+
+
+# 25 - TRAJECTORY OF A CAR (its transitions between road segments over the last ?hours=, 24 by default, see trajectories.py)
+class CarTrajectoryView(CarTimeWindowMixin, APIView):
+    def get(self, request, car_license_plate, *args, **kwargs):
+        cutoff_time = self.get_cutoff_time(request)
+        car_instance = get_object_or_404(Cars, car_license_plate=car_license_plate)
+        transitions = car_instance.transitions.filter(departed_at__gte=cutoff_time).order_by('departed_at', 'id')
+        
+        return Response({
+            'car': CarsSerializer(car_instance).data,
+            'transitions': SegmentTransitionsSerializer(transitions, many=True).data,
+        })
+
+
+
+## EXPORTS ------------------------------------------------------------------------------------------------------
+# 26 - STREAMING EXPORT OF A WHOLE TABLE (as NDJSON or CSV)
+class ExportView(APIView):
+    content_negotiation_class = ExportContentNegotiation
+    
+    def get(self, request, resource, file_format, *args, **kwargs):
+        columns, rows = get_export_rows(resource, request.query_params, using=get_read_database())
+        stream, content_type = EXPORT_FORMATS[file_format]
+        
+        response = StreamingHttpResponse(stream(columns, rows), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{file_format}"'
+        return response
+
+
+
+## RESPONSE CACHE -----------------------------------------------------------------------------------------------
+# 27 - HIT AND MISS COUNTERS OF THE RESPONSE CACHE (only for admin use)
+class ResponseCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request, *args, **kwargs):
+        return Response(get_cache_stats())
+
+
+
+## METRICS ------------------------------------------------------------------------------------------------------
+# 28 - REQUEST METRICS OF THIS PROCESS IN THE PROMETHEUS TEXT FORMAT (for admin users or the METRICS_TOKEN bearer token)
+class MetricsView(APIView):
+    permission_classes = [HasMetricsToken]
+    renderer_classes = [PrometheusRenderer]
+    pagination_class = None
+    
+    def get(self, request, *args, **kwargs):
+        return Response(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+
+## INTENSITY STREAM ---------------------------------------------------------------------------------------------
+# 29 - SERVER-SENT EVENTS WITH THE ROAD SEGMENTS WHOSE INTENSITY CHANGED (after a snapshot of every road segment, see streaming.py)
+# A Django async view, since the DRF views are synchronous. Under WSGI an open stream would hold a worker thread, so the
+# response only has the snapshot and the browser polls it again after the retry delay.
+class IntensityStreamView(View):
+    async def get(self, request, *args, **kwargs):
+        hub = get_intensity_hub()
+        if isinstance(request, ASGIRequest):
+            try:
+                subscriber = hub.subscribe()
+            except TooManySubscribers:
+                response = JsonResponse({'detail': 'Too many open streams, try again later.'}, status=503)
+                response['Retry-After'] = STREAM_RETRY_MILLISECONDS // 1000
+                return response
+            response = StreamingHttpResponse(stream_events(hub, subscriber), content_type='text/event-stream')
+        else:
+            snapshot = await sync_to_async(get_snapshot_event)(hub)
+            response = HttpResponse(f'retry: {STREAM_RETRY_MILLISECONDS}\n\n{snapshot}', content_type='text/event-stream')
+        
+        # Keeps the proxies from caching or buffering the events
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+
+## SPEED STATISTICS ---------------------------------------------------------------------------------------------
+# Speed sketches of road segments: the one of their 'all' rollup bucket (a single row per segment, whatever the number of
+# readings), or with ?bucket=&from=&to= the sketches of those buckets merged together, see sketches.py
+class SpeedStatsMixin(BucketRangeMixin):
+    def get_sketches(self, segment_ids):
+        rollups = SegmentSpeedRollups.objects.filter(road_segment_id__in=segment_ids)
+        if 'bucket' in self.request.query_params:
+            bucket, start, end = self.get_bucket_range()
+            rollups = rollups.filter(bucket=bucket, bucket_start__gte=start, bucket_start__lt=end)
+        else:
+            rollups = rollups.filter(bucket=ALL_TIME_BUCKET)
+        
+        # A segment with a stale sketch (null while the bucket has speeds) gets None
+        sketches = {segment_id: SpeedSketch() for segment_id in segment_ids}
+        for segment_id, speed_count, data in rollups.values_list('road_segment_id', 'speed_count', 'speed_sketch'):
+            if data is None and speed_count:
+                sketches[segment_id] = None
+            elif sketches[segment_id] is not None:
+                sketches[segment_id].merge(SpeedSketch.from_bytes(data))
+        return sketches
+    
+    # The all time sketches cost one merge per road segment, a time range one per bucket of each road segment
+    def check_sketch_count(self, segment_count):
+        if 'bucket' not in self.request.query_params:
+            return
+        bucket, start, end = self.get_bucket_range()
+        if segment_count * math.ceil((end - start) / ROLLUP_BUCKETS[bucket]) > STATS_MAX_SKETCHES:
+            raise ValidationError({'bucket': f'Expected at most {STATS_MAX_SKETCHES} buckets in total (road segments x buckets of the '
+                                             f'time range), ask for a larger bucket, a shorter range or fewer road segments.'})
+    
+    # ?percentiles=50,85,99.9 (STATS_DEFAULT_PERCENTILES when not given)
+    def get_percentiles(self):
+        value = self.request.query_params.get('percentiles')
+        if value is None:
+            return STATS_DEFAULT_PERCENTILES
+        try:
+            percentiles = [float(percentile) for percentile in value.split(',')]
+        except ValueError:
+            percentiles = [-1]
+        if not all(0 <= percentile <= 100 for percentile in percentiles):
+            raise ValidationError({'percentiles': 'Expected a comma separated list of numbers between 0 and 100.'})
+        return percentiles
+
+# 30 - SPEED STATISTICS OF A ROAD SEGMENT (number of speeds, average, standard deviation, min, max and percentiles)
+class RoadSegmentStatsView(SpeedStatsMixin, APIView):
+    def get(self, request, pk, *args, **kwargs):
+        road_segment = get_object_or_404(RoadSegments.objects.only('id'), pk=pk)
+        percentiles = self.get_percentiles()
+        sketch = self.get_sketches([road_segment.id])[road_segment.id]
+        return Response({'road_segment_id': road_segment.id, **get_sketch_stats(sketch, percentiles)})
+
+# 31 - SPEED STATISTICS OF SEVERAL ROAD SEGMENTS (?ids=1,2,3, and with ?combined=true the statistics of all their readings together)
+class RoadSegmentsStatsView(SpeedStatsMixin, APIView):
+    def get(self, request, *args, **kwargs):
+        ids = request.query_params.get('ids', '')
+        if not ids or not all(segment_id.strip().isdigit() for segment_id in ids.split(',')):
+            raise ValidationError({'ids': 'Expected a comma separated list of road segment ids.'})
+        segment_ids = sorted({int(segment_id) for segment_id in ids.split(',')})
+        if len(segment_ids) > STATS_MAX_SEGMENTS:
+            raise ValidationError({'ids': f'Expected at most {STATS_MAX_SEGMENTS} road segment ids.'})
+        self.check_sketch_count(len(segment_ids))
+        
+        percentiles = self.get_percentiles()
+        segment_ids = list(RoadSegments.objects.filter(id__in=segment_ids).order_by('id').values_list('id', flat=True))
+        sketches = self.get_sketches(segment_ids)
+        data = {'results': [{'road_segment_id': segment_id, **get_sketch_stats(sketches[segment_id], percentiles)} for segment_id in segment_ids]}
+        if request.query_params.get('combined') == 'true':
+            stale = any(sketch is None for sketch in sketches.values())
+            data['combined'] = get_sketch_stats(None if stale else merge_sketches(sketches.values()), percentiles)
+        return Response(data)
\ No newline at end of file
@@ -13,4 +13,5 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "traffic_monitoring_api.settings")
 
+# Serves the streaming endpoints, like /road-segments/intensity-stream/ (uvicorn traffic_monitoring_api.asgi:application)
 application = get_asgi_application()
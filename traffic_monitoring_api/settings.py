@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "traffic_api.metrics.MetricsMiddleware",
+    "traffic_api.routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -84,6 +86,9 @@ DATABASES = {
         "USER": "postgres",
         "PASSWORD": "password",
         "HOST": "localhost",
+        # Connections kept open between requests, and checked before they are used again
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
     },
     'test': {
         "ENGINE": "django.db.backends.postgresql",
@@ -91,6 +96,30 @@ DATABASES = {
         "USER": "postgres",
         "PASSWORD": "password",
         "HOST": "localhost",
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
+    }
+}
+
+# Read replicas of the default database, by alias (see traffic_api/routers.py). Each one is added to DATABASES like the
+# default database, with "TEST": {"MIRROR": "default"} so the tests use the default database for it. The GET requests
+# read from them in turn, a replica that can not be reached is skipped for DATABASE_REPLICA_RETRY_SECONDS, and the cached
+# list endpoints read from the primary for DATABASE_REPLICA_LAG_SECONDS after a write (the replicas may not have it yet).
+DATABASE_ROUTERS = ["traffic_api.routers.ReplicaRouter"]
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_RETRY_SECONDS = 30
+DATABASE_REPLICA_LAG_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The local-memory cache is private to each process, so deployments running several processes should use a shared backend
+# (for example django.core.cache.backends.filebased.FileBasedCache) for the cached responses to see the writes of every process
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "traffic-monitoring-api",
     }
 }
 
@@ -136,12 +165,23 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Django Rest Framework settings (every list endpoint is paginated with a cursor, see traffic_api/pagination.py)
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'traffic_api.pagination.IdCursorPagination',
+    'PAGE_SIZE': 100,
+    # Renders with orjson when it is installed (pip install orjson), with the same output as the DRF JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': [
+        'traffic_api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
 # Swagger settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'api_key': {
             'type': 'apiKey',
-            'name': 'API_KEY',
+            'name': 'X-API-KEY',
             'in': 'header',
         },
     },
@@ -160,4 +200,99 @@ SWAGGER_SETTINGS = {
 
 # Environmental Variables
 LOW_SPEED_THRESHOLD = 20
-HIGH_SPEED_THRESHOLD = 50
\ No newline at end of file
+HIGH_SPEED_THRESHOLD = 50
+
+# Largest page size that can be requested from the list endpoints with ?page_size=
+MAX_PAGE_SIZE = 1000
+
+# Maximum number of sensor readings accepted in a single bulk upload
+SENSOR_READINGS_BULK_MAX_ROWS = 10000
+
+# Number of rows fetched from the database (and written to the response) at a time by the export endpoints
+EXPORT_CHUNK_SIZE = 2000
+
+# Maximum number of time buckets returned by the speed history of a road segment
+HISTORY_MAX_BUCKETS = 5000
+
+# Size (in degrees) of the grid cells of the in-memory spatial index of the road segments, and the number of seconds after
+# which a process rebuilds its index to pick up changes made by other processes
+SPATIAL_INDEX_CELL_SIZE = 0.01
+SPATIAL_INDEX_MAX_AGE = 300
+# Largest number of segment ids found by the index that is sent to the database as a list (a larger area is filtered by coordinates)
+SPATIAL_FILTER_MAX_IDS = 500
+
+# Cache (from CACHES) that holds the responses of the polled list endpoints, and the number of seconds they are kept for
+RESPONSE_CACHE_ALIAS = "default"
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Background writer of the ingestion endpoint: maximum number of sensor readings waiting in the queue (above which the
+# requests get a 429), number of rows per bulk INSERT, seconds a batch waits for more rows, and the function that writes them
+INGESTION_QUEUE_MAX_ROWS = 50000
+INGESTION_BATCH_SIZE = 1000
+INGESTION_FLUSH_INTERVAL = 0.2
+INGESTION_WRITER = "traffic_api.ingestion.bulk_create_sensor_readings"
+
+# Number of sensor API key lookups kept in the in-process cache of each process, and the number of seconds they are kept for
+# (the longest a key revoked by another process is still accepted by this one)
+API_KEY_CACHE_SIZE = 1024
+API_KEY_CACHE_TTL = 60
+
+# Request metrics exposed at /metrics: a share of the requests slower than METRICS_SLOW_REQUEST_SECONDS is logged with
+# their slowest queries (to the traffic_api.slow_requests logger), and the METRICS_SLOWEST_QUERIES slowest SQL statements
+# are kept. Without a METRICS_TOKEN (sent by the scraper as a bearer token), only admin users can read the metrics.
+METRICS_SLOW_REQUEST_SECONDS = 1.0
+METRICS_SLOW_REQUEST_SAMPLE_RATE = 0.1
+METRICS_SLOWEST_QUERIES = 20
+METRICS_TOKEN = None
+
+# Sensor readings older than SENSOR_READINGS_RETENTION_DAYS are moved to compressed CSV files in SENSOR_READINGS_ARCHIVE_DIR
+# by 'python manage.py archive_sensor_readings', and 'python manage.py partition_sensor_readings' keeps
+# SENSOR_READINGS_PARTITIONS_AHEAD monthly partitions ready ahead of the current month (PostgreSQL only)
+SENSOR_READINGS_RETENTION_DAYS = 90
+SENSOR_READINGS_ARCHIVE_DIR = BASE_DIR / 'archive'
+SENSOR_READINGS_PARTITIONS_AHEAD = 3
+
+# Trajectory engine (see traffic_api/trajectories.py): number of sensor readings processed per windowed query, the
+# longest time between two passes of a car that still counts as a transition between their road segments (otherwise it
+# is a new trip), and the seconds a missing id below the watermark is waited for (a reading whose transaction had not
+# committed yet when the ids after it were processed)
+TRAJECTORY_BATCH_SIZE = 10000
+TRAJECTORY_MAX_GAP_SECONDS = 1800
+TRAJECTORY_PENDING_ID_SECONDS = 300
+
+# Stream of the intensity changes of the road segments (/road-segments/intensity-stream/, served by the ASGI application,
+# see traffic_api/streaming.py): the broker that carries the new states of the segments between the writes and the streams
+# (traffic_api.streaming.LocalThreadBroker delivers them from a background thread, like an external broker would), the
+# number of events a slow client may fall behind before it gets a new snapshot instead, the seconds between keep-alive
+# comments, the seconds after which a stream is closed (the browser reconnects after STREAM_RETRY_MILLISECONDS), and the
+# number of open streams per process
+STREAM_BROKER = "traffic_api.streaming.InProcessBroker"
+STREAM_CLIENT_BUFFER = 1000
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_MAX_SECONDS = 3600
+STREAM_RETRY_MILLISECONDS = 5000
+STREAM_MAX_SUBSCRIBERS = 10000
+
+# Retries of the sensor uploads: the responses of the requests sent with an Idempotency-Key header are kept for
+# IDEMPOTENCY_KEY_TTL seconds in the cache IDEMPOTENCY_CACHE_ALIAS (a shared backend when there are several processes), and
+# each process remembers the latest SENSOR_READINGS_DEDUP_CAPACITY passes in a Bloom filter with the given false positive
+# rate (about 1.8 MB per million passes at 0.1%, twice that with its previous generation), see traffic_api/deduplication.py
+IDEMPOTENCY_CACHE_ALIAS = "default"
+IDEMPOTENCY_KEY_TTL = 24 * 3600
+SENSOR_READINGS_DEDUP_CAPACITY = 1000000
+SENSOR_READINGS_DEDUP_ERROR_RATE = 0.001
+
+# Nested traffic readings of the road segments: the latest EXPAND_DEFAULT_LIMIT readings of each segment of a list with
+# ?expand=traffic_readings (ROAD_SEGMENT_READINGS_LIMIT for a single segment), or ?expand_limit= up to EXPAND_MAX_LIMIT
+EXPAND_DEFAULT_LIMIT = 10
+EXPAND_MAX_LIMIT = 1000
+ROAD_SEGMENT_READINGS_LIMIT = 100
+
+# Percentiles of the speed of the road segments (/road-segments/<id>/stats/ and /road-segments/stats/?ids=, see
+# traffic_api/sketches.py): the compression of the t-digests (about that many centroids per sketch, more is more accurate
+# and larger), the percentiles given when ?percentiles= is not, the most road segments of a bulk request, and the most
+# sketches merged by a request (road segments x buckets of the time range, a merge takes about 0.1 ms)
+SPEED_SKETCH_COMPRESSION = 100
+STATS_DEFAULT_PERCENTILES = [50, 85, 95]
+STATS_MAX_SEGMENTS = 1000
+STATS_MAX_SKETCHES = 5000
\ No newline at end of file